@@ -0,0 +1,55 @@
+"""Cold import time of fastmqtt, compared to importing it together with the codec and
+connector dependencies it used to import eagerly.
+
+    python benchmarks/import_time.py [runs]
+"""
+
+import importlib.util
+import statistics
+import subprocess
+import sys
+import time
+
+EAGER_MODULES = [
+    "aiomqtt",
+    "paho.mqtt.client",
+    "tenacity",
+    "cbor2",
+    "msgpack",
+    "orjson",
+    "ormsgpack",
+]
+
+
+def measure(statement: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True)
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings)
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    installed = [
+        module
+        for module in EAGER_MODULES
+        if importlib.util.find_spec(module.split(".")[0]) is not None
+    ]
+
+    interpreter = measure("pass", runs)
+    cases = {
+        "import fastmqtt": "import fastmqtt",
+        "import fastmqtt + eager dependencies": f"import fastmqtt, {', '.join(installed)}",
+    }
+
+    print(f"python startup: {interpreter * 1000:.1f} ms (subtracted below), {runs} runs")
+    for name, statement in cases.items():
+        elapsed = measure(statement, runs) - interpreter
+        print(f"{name:<40} {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
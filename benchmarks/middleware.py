@@ -0,0 +1,68 @@
+"""Per-message cost of calling a handler through a chain of no-op middlewares.
+
+python benchmarks/middleware.py [messages]
+"""
+
+import asyncio
+import sys
+import time
+from typing import Any
+
+from fastmqtt import Message, MQTTRouter
+from fastmqtt.encoders import NoneDecoder
+from fastmqtt.handler import Handler
+from fastmqtt.properties import PublishProperties
+from fastmqtt.types import CallbackType, Payload
+
+
+async def noop_middleware(message: Message, call_next: CallbackType) -> Any:
+    return await call_next(message)
+
+
+async def handler(message: Message) -> None:
+    pass
+
+
+def make_handler(middlewares: int) -> Handler:
+    router = MQTTRouter()
+    for _ in range(middlewares):
+        router.add_middleware(noop_middleware)
+
+    subscription = router.register(handler, "bench")
+    compiled = subscription.callbacks[0]
+    assert isinstance(compiled, Handler)  # noqa: S101
+    compiled.compile()
+    return compiled
+
+
+async def measure(compiled: Handler, message: Message, messages: int) -> float:
+    start = time.perf_counter()
+    for _ in range(messages):
+        await compiled(message)
+    return (time.perf_counter() - start) / messages
+
+
+async def main() -> None:
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    message = Message(
+        topic="bench",
+        payload=Payload(b"", NoneDecoder()),
+        qos=0,
+        retain=False,
+        mid=0,
+        properties=PublishProperties(),
+        client=None,  # type: ignore[arg-type]
+    )
+
+    await measure(make_handler(0), message, messages)  # warm up
+    baseline = await measure(make_handler(0), message, messages)
+    print(f"{'middlewares':>11} {'ns/message':>11} {'overhead':>9}")
+    for middlewares in [0, 1, 5]:
+        per_message = await measure(make_handler(middlewares), message, messages)
+        print(
+            f"{middlewares:>11} {per_message * 1e9:>11.0f} {(per_message - baseline) * 1e9:>+9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,25 @@
+from .admission import AdmissionController, ShedPolicy
+from .cache import LastValueCache
+from .chunked import ChunkedReceiver, Transfer
+from .dedup import Deduplicator
+from .dependencies import Depends, State, TopicLevel
 from .exceptions import FastMQTTError
 from .fastmqtt import FastMQTT
+from .health import Health, HealthMonitor
+from .profiler import SlowCallbackProfiler
+from .recording import Recorder, Replayer
 from .router import MQTTRouter
+from .scheduler import PriorityScheduler
+from .supervisor import DrainReport, TaskSupervisor
+from .threadsafe import ThreadSafePublisher
+from .tracing import OpenTelemetryTracer, Tracer
 from .types import (
     CallbackType,
     CleanStart,
     Message,
+    Middleware,
+    OutgoingMessage,
+    PublishMiddleware,
     RetainHandling,
     SubscribeOptions,
     Subscription,
@@ -16,8 +31,31 @@ __all__ = [
     "CallbackType",
     "CleanStart",
     "Message",
+    "Middleware",
+    "OutgoingMessage",
+    "PublishMiddleware",
     "RetainHandling",
     "SubscribeOptions",
     "Subscription",
     "FastMQTTError",
+    "LastValueCache",
+    "SlowCallbackProfiler",
+    "Tracer",
+    "OpenTelemetryTracer",
+    "PriorityScheduler",
+    "ThreadSafePublisher",
+    "Recorder",
+    "Replayer",
+    "Depends",
+    "State",
+    "TopicLevel",
+    "ChunkedReceiver",
+    "Transfer",
+    "Deduplicator",
+    "AdmissionController",
+    "ShedPolicy",
+    "Health",
+    "HealthMonitor",
+    "DrainReport",
+    "TaskSupervisor",
 ]
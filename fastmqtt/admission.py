@@ -0,0 +1,230 @@
+import asyncio
+import enum
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+
+log = logging.getLogger(__name__)
+
+
+class ShedPolicy(str, enum.Enum):
+    # Skip the callback for the message that arrived over the limit
+    DROP_NEWEST = "drop_newest"
+    # Cancel the oldest pending callback of the route to make room for the new one
+    DROP_OLDEST = "drop_oldest"
+    # Keep ``sample_rate`` of the messages of the route, evenly spaced
+    SAMPLE = "sample"
+    # Run the callback, but stop taking messages from the client until the backlog drains
+    BLOCK = "block"
+
+
+@dataclass
+class RouteAdmission:
+    route: str
+    admitted: int = 0
+    dropped_newest: int = 0
+    dropped_oldest: int = 0
+    sampled_out: int = 0
+    blocked: int = 0
+
+    @property
+    def shed(self) -> int:
+        return self.dropped_newest + self.dropped_oldest + self.sampled_out
+
+
+@dataclass(frozen=True)
+class AdmissionStats:
+    pending: int
+    pending_bytes: int
+    paused: bool
+    pauses: int
+    paused_time: float
+    # QoS 0 messages dropped by the client while paused, before reaching any route
+    dropped_backlog: int
+    routes: dict[str, RouteAdmission]
+
+    @property
+    def shed(self) -> int:
+        return self.dropped_backlog + sum(route.shed for route in self.routes.values())
+
+
+class AdmissionController:
+    """Bounds the callbacks waiting to run or running, pass it to
+    ``FastMQTT(admission_controller=)``.
+
+    Below ``max_pending`` callbacks (and ``max_pending_bytes`` of their payloads) every callback
+    runs. Above it each route applies its ``shed_policy``, ``policy`` when it has none. BLOCK
+    routes pause reading until the backlog drops to ``resume_ratio`` of the limits. Meanwhile
+    QoS 1/2 messages are not acknowledged, so the broker stops sending once ``receive_maximum``
+    of them wait in the client, and QoS 0 messages (which the broker does not hold back) are
+    dropped and counted once ``max_backlog`` messages wait.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = 10_000,
+        max_pending_bytes: int | None = None,
+        policy: ShedPolicy | str = ShedPolicy.BLOCK,
+        sample_rate: float = 0.1,
+        resume_ratio: float = 0.8,
+        receive_maximum: int = 1000,
+        max_backlog: int = 1000,
+    ) -> None:
+        self._max_pending = max_pending
+        self._max_pending_bytes = max_pending_bytes
+        self._policy = ShedPolicy(policy)
+        self._sample_rate = sample_rate
+        # Sent in the CONNECT, unless the properties given to FastMQTT have one
+        self.receive_maximum = receive_maximum
+        self._max_backlog = max_backlog
+        self._resume_pending = int(max_pending * resume_ratio)
+        self._resume_bytes = (
+            int(max_pending_bytes * resume_ratio) if max_pending_bytes is not None else None
+        )
+
+        # Pending callbacks per route in arrival order, future -> payload size
+        self._pending: dict[str, OrderedDict[asyncio.Future, int]] = {}
+        self._pending_count = 0
+        self._pending_bytes = 0
+        self._routes: dict[str, RouteAdmission] = {}
+        # Fraction of a message each sampled route has earned
+        self._credit: dict[str, float] = {}
+        # Set while messages may be taken from the client, see BaseConnector.admission_controller
+        self.receiving_event = asyncio.Event()
+        self.receiving_event.set()
+        self._paused_at: float | None = None
+        self._pauses = 0
+        self._paused_time = 0.0
+        self._dropped_backlog = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending_count
+
+    @property
+    def overloaded(self) -> bool:
+        return self._pending_count >= self._max_pending or (
+            self._max_pending_bytes is not None and self._pending_bytes >= self._max_pending_bytes
+        )
+
+    @property
+    def paused(self) -> bool:
+        return self._paused_at is not None
+
+    def admit(self, route: str, policy: ShedPolicy | None, size: int) -> bool:
+        """Whether a callback of ``route`` may run for a message of ``size`` bytes."""
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = self._routes[route] = RouteAdmission(route)
+
+        if not self.overloaded:
+            stats.admitted += 1
+            return True
+
+        policy = policy or self._policy
+        if policy is ShedPolicy.DROP_NEWEST:
+            stats.dropped_newest += 1
+            return False
+
+        if policy is ShedPolicy.SAMPLE:
+            credit = self._credit.get(route, 0.0) + self._sample_rate
+            if credit < 1.0:
+                self._credit[route] = credit
+                stats.sampled_out += 1
+                return False
+            self._credit[route] = credit - 1.0
+            stats.admitted += 1
+            return True
+
+        if policy is ShedPolicy.DROP_OLDEST:
+            pending = self._pending.get(route)
+            if not pending:
+                # Nothing of this route to replace, the backlog belongs to other routes
+                stats.dropped_newest += 1
+                return False
+            future, oldest_size = pending.popitem(last=False)
+            self._pending_count -= 1
+            self._pending_bytes -= oldest_size
+            future.cancel()
+            stats.dropped_oldest += 1
+            stats.admitted += 1
+            return True
+
+        stats.admitted += 1
+        stats.blocked += 1
+        self._pause()
+        return True
+
+    def accept(self, qos: int, backlog: int) -> bool:
+        """Whether the client may queue a message received while ``backlog`` messages wait to
+        be taken. Only QoS 0 messages are refused, the broker holds back the others."""
+        if qos > 0 or self._paused_at is None or backlog < self._max_backlog:
+            return True
+
+        self._dropped_backlog += 1
+        return False
+
+    def track(self, route: str, future: asyncio.Future, size: int) -> None:
+        """Count an admitted callback as pending until ``future`` is done."""
+        pending = self._pending.get(route)
+        if pending is None:
+            pending = self._pending[route] = OrderedDict()
+        pending[future] = size
+        self._pending_count += 1
+        self._pending_bytes += size
+        future.add_done_callback(partial(self._release, route))
+
+    def stats(self) -> AdmissionStats:
+        paused_time = self._paused_time
+        if self._paused_at is not None:
+            paused_time += time.monotonic() - self._paused_at
+
+        return AdmissionStats(
+            pending=self._pending_count,
+            pending_bytes=self._pending_bytes,
+            paused=self.paused,
+            pauses=self._pauses,
+            paused_time=paused_time,
+            dropped_backlog=self._dropped_backlog,
+            routes={route: RouteAdmission(**vars(stats)) for route, stats in self._routes.items()},
+        )
+
+    def _release(self, route: str, future: asyncio.Future) -> None:
+        # Already removed when it was dropped for a newer message
+        size = self._pending[route].pop(future, None)
+        if size is None:
+            return
+
+        self._pending_count -= 1
+        self._pending_bytes -= size
+        if self._paused_at is not None and self._drained():
+            self._resume()
+
+    def _drained(self) -> bool:
+        return self._pending_count <= self._resume_pending and (
+            self._resume_bytes is None or self._pending_bytes <= self._resume_bytes
+        )
+
+    def _pause(self) -> None:
+        if self._paused_at is not None:
+            return
+
+        log.warning(
+            f"Pausing message reception, {self._pending_count} callbacks "
+            f"({self._pending_bytes} bytes) pending"
+        )
+        self._paused_at = time.monotonic()
+        self._pauses += 1
+        self.receiving_event.clear()
+
+    def _resume(self) -> None:
+        if self._paused_at is None:
+            return
+
+        paused_time = time.monotonic() - self._paused_at
+        log.info(f"Resuming message reception after {paused_time:.3f}s")
+        self._paused_time += paused_time
+        self._paused_at = None
+        self.receiving_event.set()
@@ -0,0 +1,298 @@
+import asyncio
+import contextlib
+import importlib
+import logging
+import os
+import random
+import re
+import struct
+import time
+import uuid
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .connectors import BaseConnector, get_connector
+from .encoders import NoneDecoder, NoneEncoder, get_decoder, get_encoder
+from .exceptions import FastMQTTError
+from .fastmqtt import FastMQTT
+from .types import RawMessage, SubscribeOptions
+
+log = logging.getLogger(__name__)
+
+_TEMPLATE_FIELD = re.compile(r"\{[^}]*\}")
+_TIMESTAMP = struct.Struct("<d")
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _topic_filter(topic: str) -> str:
+    # A level with a field anywhere in it (devices/{client}, dev{client}/x) matches any level,
+    # the bench topics are str.format() templates, not fastmqtt.topic templates
+    return "/".join("+" if _TEMPLATE_FIELD.search(level) else level for level in topic.split("/"))
+
+
+@dataclass
+class BenchConfig:
+    hostname: str = "localhost"
+    port: int = 1883
+    username: str | None = None
+    password: str | None = None
+    clients: int = 10
+    # {client} and {seq} are replaced for every message
+    topic: str = "fastmqtt/bench/{client}"
+    rate: float = 1.0
+    duration: float = 10.0
+    qos: int = 0
+    payload_size: int = 64
+    # "raw" or a codec name from fastmqtt.encoders.CODECS
+    codec: str = "raw"
+    receive: bool = True
+    connect_concurrency: int = 100
+    client_id_prefix: str = "fastmqtt-bench"
+    # Run a broker in this process on hostname:port (mqttools, QoS 0 only) instead of
+    # connecting to a running one. It shares the event loop with the clients
+    embedded_broker: bool = False
+
+
+@dataclass
+class LatencyStats:
+    count: int
+    percentiles: dict[float, float]
+    max: float
+
+    @classmethod
+    def from_samples(cls, samples: array) -> "LatencyStats":
+        ordered = sorted(samples)
+        if not ordered:
+            return cls(0, dict.fromkeys(PERCENTILES, 0.0), 0.0)
+
+        return cls(
+            count=len(ordered),
+            percentiles={
+                p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in PERCENTILES
+            },
+            max=ordered[-1],
+        )
+
+
+@dataclass
+class BenchResult:
+    config: BenchConfig
+    elapsed: float
+    sent: int
+    errors: int
+    received: int
+    publish_latency: LatencyStats
+    end_to_end_latency: LatencyStats
+
+    def format(self) -> str:
+        lines = [
+            f"clients {self.config.clients}, qos {self.config.qos}, "
+            f"{self.config.rate} msg/s per client, {self.elapsed:.1f}s",
+            f"sent     {self.sent:>10} ({self.sent / self.elapsed:.0f} msg/s), "
+            f"errors {self.errors}",
+        ]
+        if self.config.receive:
+            lines.append(
+                f"received {self.received:>10} ({self.received / self.elapsed:.0f} msg/s)"
+            )
+
+        header = "".join(f"{'p' + format(p, 'g'):>10}" for p in PERCENTILES) + f"{'max':>10}"
+        lines.append(f"{'latency ms':<16}{header}")
+        stats = [("publish/ack", self.publish_latency)]
+        if self.config.receive:
+            stats.append(("end-to-end", self.end_to_end_latency))
+
+        for name, latency in stats:
+            values = [*latency.percentiles.values(), latency.max]
+            lines.append(f"{name:<16}" + "".join(f"{value * 1000:>10.2f}" for value in values))
+
+        return "\n".join(lines)
+
+
+@dataclass
+class _Counters:
+    sent: int = 0
+    errors: int = 0
+    received: int = 0
+    publish_latency: array = field(default_factory=lambda: array("d"))
+    end_to_end_latency: array = field(default_factory=lambda: array("d"))
+
+
+class FleetBenchmark:
+    """Simulates ``clients`` devices in one process, each publishing ``rate`` messages per
+    second, and a receiver subscribed to all of their topics."""
+
+    def __init__(self, config: BenchConfig) -> None:
+        self._config = config
+        self._counters = _Counters()
+        self._apps: list[FastMQTT] = []
+        self._pending: set[asyncio.Task] = set()
+        # Client ids of concurrent runs must not collide, the broker would disconnect them
+        self._run_id = uuid.uuid4().hex[:8]
+        # Random, but generated once, urandom() in the publish loop would be measured too
+        self._padding = os.urandom(max(0, config.payload_size - _TIMESTAMP.size))
+        self._data = "x" * config.payload_size
+
+        if config.codec == "raw":
+            self._encoder: Callable[[Any], Any] = NoneEncoder()
+            self._decoder: Callable[[bytes], Any] = NoneDecoder()
+        else:
+            self._encoder = get_encoder(config.codec)
+            self._decoder = get_decoder(config.codec)
+
+    async def run(self) -> BenchResult:
+        config = self._config
+        broker = await self._start_broker() if config.embedded_broker else None
+        try:
+            return await self._run()
+        finally:
+            if broker is not None:
+                broker.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await broker
+
+    async def _run(self) -> BenchResult:
+        config = self._config
+        receiver = await self._start_receiver() if config.receive else None
+        try:
+            await self._connect_clients()
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            stop_at = start + config.duration
+            await asyncio.gather(
+                *[self._run_client(app, index, stop_at) for index, app in enumerate(self._apps)]
+            )
+            if self._pending:
+                await asyncio.wait(self._pending)
+            # Let the last messages arrive
+            await asyncio.sleep(0.5 if receiver is not None else 0)
+            elapsed = loop.time() - start
+        finally:
+            await asyncio.gather(*[app.disconnect() for app in self._apps])
+            if receiver is not None:
+                await receiver.disconnect()
+
+        return BenchResult(
+            config=config,
+            elapsed=elapsed,
+            sent=self._counters.sent,
+            errors=self._counters.errors,
+            received=self._counters.received,
+            publish_latency=LatencyStats.from_samples(self._counters.publish_latency),
+            end_to_end_latency=LatencyStats.from_samples(self._counters.end_to_end_latency),
+        )
+
+    def _make_payload(self, client: int, seq: int) -> Any:
+        config = self._config
+        if config.codec == "raw":
+            return _TIMESTAMP.pack(time.time()) + self._padding
+
+        return {"client": client, "seq": seq, "sent": time.time(), "data": self._data}
+
+    def _sent_at(self, payload: bytes) -> float:
+        if self._config.codec == "raw":
+            return _TIMESTAMP.unpack_from(payload)[0]
+        return self._decoder(payload)["sent"]
+
+    async def _start_broker(self) -> asyncio.Task:
+        config = self._config
+        if config.qos > 0:
+            raise FastMQTTError("The embedded broker supports QoS 0 only")
+
+        try:
+            mqttools = importlib.import_module("mqttools")
+        except ImportError as e:
+            raise ImportError(
+                "mqttools is required for the embedded broker, install it with "
+                "`pip install mqttools`"
+            ) from e
+
+        broker = mqttools.Broker((config.hostname, config.port))
+        task = asyncio.create_task(broker.serve_forever())
+        # Listening once the address is known
+        await broker.getsockname()
+        return task
+
+    async def _start_receiver(self) -> BaseConnector:
+        config = self._config
+        connector = get_connector("aiomqtt")(
+            hostname=config.hostname,
+            port=config.port,
+            username=config.username,
+            password=config.password,
+            client_id=f"{config.client_id_prefix}-{self._run_id}-receiver",
+        )
+        connector.add_message_callback(self._on_message)
+        await connector.connect()
+        # Directly on the connector, the receiver does not need subscription identifiers
+        await connector.subscribe(
+            _topic_filter(config.topic), options=SubscribeOptions(qos=config.qos)
+        )
+        return connector
+
+    async def _on_message(self, message: RawMessage) -> None:
+        self._counters.received += 1
+        try:
+            self._counters.end_to_end_latency.append(time.time() - self._sent_at(message.payload))
+        except Exception as e:
+            log.debug(f"Can not read the timestamp of {message.topic}: {e!r}")
+
+    async def _connect_clients(self) -> None:
+        config = self._config
+        semaphore = asyncio.Semaphore(config.connect_concurrency)
+
+        async def connect(index: int) -> None:
+            app = FastMQTT(
+                config.hostname,
+                config.port,
+                username=config.username,
+                password=config.password,
+                client_id=f"{config.client_id_prefix}-{self._run_id}-{index}",
+                payload_encoder=self._encoder,  # type: ignore[arg-type]
+            )
+            async with semaphore:
+                await app.connect()
+            self._apps.append(app)
+
+        await asyncio.gather(*[connect(index) for index in range(config.clients)])
+
+    async def _run_client(self, app: FastMQTT, index: int, stop_at: float) -> None:
+        loop = asyncio.get_running_loop()
+        interval = 1 / self._config.rate
+        # Spread the clients over the first interval instead of publishing in lockstep
+        next_at = loop.time() + random.random() * interval  # noqa: S311
+        seq = 0
+        while next_at < stop_at:
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # Open loop: a slow acknowledgement does not lower the offered rate
+            task = asyncio.create_task(self._publish(app, index, seq))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            next_at += interval
+            seq += 1
+
+    async def _publish(self, app: FastMQTT, index: int, seq: int) -> None:
+        config = self._config
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            await app.publish(
+                config.topic.format(client=index, seq=seq),
+                self._make_payload(index, seq),
+                qos=config.qos,
+            )
+        except Exception as e:
+            self._counters.errors += 1
+            log.debug(f"Publish failed: {e!r}")
+            return
+
+        self._counters.sent += 1
+        self._counters.publish_latency.append(loop.time() - start)
+
+
+async def run_bench(config: BenchConfig) -> BenchResult:
+    return await FleetBenchmark(config).run()
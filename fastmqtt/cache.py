@@ -0,0 +1,161 @@
+import asyncio
+from typing import Iterator
+
+from .topic import strip_shared_prefix, topic_matches
+from .types import Message
+
+
+class _TopicNode:
+    __slots__ = ("children", "message")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TopicNode] = {}
+        self.message: Message | None = None
+
+
+class _SnapshotWaiter:
+    __slots__ = ("topic_filter", "last_update")
+
+    def __init__(self, topic_filter: str, last_update: float) -> None:
+        self.topic_filter = topic_filter
+        self.last_update = last_update
+
+
+class LastValueCache:
+    """Topic-indexed store of the last message received on each topic.
+
+    The cache is a regular callback, feed it by registering it on the topics it should track:
+
+        cache = LastValueCache()
+        fastmqtt.register(cache, "plant/#")
+
+    An empty payload removes the topic from the cache, as it does for retained messages.
+    """
+
+    def __init__(self) -> None:
+        self._messages: dict[str, Message] = {}
+        self._root = _TopicNode()
+        self._waiters: list[_SnapshotWaiter] = []
+
+    async def __call__(self, message: Message) -> None:
+        self.put(message)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __contains__(self, topic: str) -> bool:
+        return topic in self._messages
+
+    def __getitem__(self, topic: str) -> Message:
+        return self._messages[topic]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._messages)
+
+    def get(self, topic: str, /, default: Message | None = None) -> Message | None:
+        return self._messages.get(topic, default)
+
+    def put(self, message: Message) -> None:
+        if not message.payload.raw():
+            self.delete(message.topic)
+        else:
+            node = self._root
+            for level in message.topic.split("/"):
+                node = node.children.setdefault(level, _TopicNode())
+            node.message = message
+            self._messages[message.topic] = message
+
+        if self._waiters:
+            now = asyncio.get_running_loop().time()
+            for waiter in self._waiters:
+                if topic_matches(waiter.topic_filter, message.topic):
+                    waiter.last_update = now
+
+    def delete(self, topic: str) -> None:
+        if self._messages.pop(topic, None) is None:
+            return
+
+        path = [self._root]
+        levels = topic.split("/")
+        for level in levels:
+            path.append(path[-1].children[level])
+
+        path[-1].message = None
+        for level, node, parent in zip(reversed(levels), reversed(path), reversed(path[:-1])):
+            if node.children or node.message is not None:
+                break
+            del parent.children[level]
+
+    def clear(self) -> None:
+        self._messages.clear()
+        self._root = _TopicNode()
+
+    def match(self, topic_filter: str) -> dict[str, Message]:
+        topic_filter = strip_shared_prefix(topic_filter)
+        levels = topic_filter.split("/")
+        if "+" not in levels and "#" not in levels:
+            message = self._messages.get(topic_filter)
+            return {} if message is None else {topic_filter: message}
+
+        result: dict[str, Message] = {}
+        self._collect(self._root, levels, 0, result)
+        return result
+
+    async def snapshot(
+        self,
+        topic_filter: str = "#",
+        quiet_period: float = 0.5,
+        timeout: float | None = None,
+    ) -> dict[str, Message]:
+        """Wait until no message matched ``topic_filter`` for ``quiet_period`` seconds
+        (e.g. the retained burst after subscribing has settled) and return the matching topics.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = _SnapshotWaiter(topic_filter, loop.time())
+        self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(timeout):
+                # Sleeps until the quiet period of the last update ends, updates only move it
+                while True:
+                    delay = waiter.last_update + quiet_period - loop.time()
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+        finally:
+            self._waiters.remove(waiter)
+
+        return self.match(topic_filter)
+
+    def _collect(
+        self,
+        node: _TopicNode,
+        levels: list[str],
+        index: int,
+        result: dict[str, Message],
+    ) -> None:
+        if index == len(levels):
+            if node.message is not None:
+                result[node.message.topic] = node.message
+            return
+
+        level = levels[index]
+        if level == "#":
+            self._collect_all(node, result, skip_system=index == 0)
+        elif level == "+":
+            for child_level, child in node.children.items():
+                if index == 0 and child_level.startswith("$"):
+                    continue
+                self._collect(child, levels, index + 1, result)
+        elif (child := node.children.get(level)) is not None:
+            self._collect(child, levels, index + 1, result)
+
+    def _collect_all(
+        self, node: _TopicNode, result: dict[str, Message], skip_system: bool = False
+    ) -> None:
+        if node.message is not None:
+            result[node.message.topic] = node.message
+
+        for child_level, child in node.children.items():
+            if skip_system and child_level.startswith("$"):
+                continue
+            self._collect_all(child, result)
@@ -0,0 +1,449 @@
+import asyncio
+import dataclasses
+import hashlib
+import logging
+import tempfile
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    BinaryIO,
+    Callable,
+)
+
+from .exceptions import FastMQTTError
+from .properties import PublishProperties
+from .supervisor import TaskSupervisor
+from .types import Message
+
+if TYPE_CHECKING:
+    from .fastmqtt import FastMQTT
+
+log = logging.getLogger(__name__)
+
+# User properties of every chunk, the last one also carries the size and digest of the transfer
+TRANSFER_PROPERTY = "fastmqtt-transfer"
+OFFSET_PROPERTY = "fastmqtt-offset"
+SIZE_PROPERTY = "fastmqtt-size"
+SHA256_PROPERTY = "fastmqtt-sha256"
+_METADATA = {TRANSFER_PROPERTY, OFFSET_PROPERTY, SIZE_PROPERTY, SHA256_PROPERTY}
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Room for the fixed header, topic and properties of a chunk below maximum_packet_size
+_PACKET_OVERHEAD = 1024
+
+ChunkSource = bytes | bytearray | memoryview | str | Path | BinaryIO | AsyncIterable[bytes]
+
+
+async def _read_file(file: BinaryIO, chunk_size: int) -> AsyncIterator[bytes]:
+    # In a thread, a slow disk or a pipe would block the event loop
+    while chunk := await asyncio.to_thread(file.read, chunk_size):
+        yield chunk
+
+
+async def _read_chunks(source: ChunkSource, chunk_size: int) -> AsyncIterator[bytes]:
+    if isinstance(source, bytes | bytearray | memoryview):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield bytes(view[start : start + chunk_size])
+    elif isinstance(source, str | Path):
+        file = await asyncio.to_thread(Path(source).open, "rb")
+        try:
+            async for chunk in _read_file(file, chunk_size):
+                yield chunk
+        finally:
+            file.close()
+    elif hasattr(source, "read"):
+        async for chunk in _read_file(source, chunk_size):  # type: ignore[arg-type]
+            yield chunk
+    else:
+        buffer = bytearray()
+        async for data in source:  # type: ignore[union-attr]
+            buffer += data
+            while len(buffer) >= chunk_size:
+                yield bytes(buffer[:chunk_size])
+                del buffer[:chunk_size]
+        if buffer:
+            yield bytes(buffer)
+
+
+async def _with_last(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[bytes, bool]]:
+    previous: bytes | None = None
+    async for chunk in chunks:
+        if previous is not None:
+            yield previous, False
+        previous = chunk
+    # An empty source is sent as one empty chunk, the receiver still needs the metadata
+    yield previous or b"", True
+
+
+def _chunk_size(fastmqtt: "FastMQTT", topic: str, chunk_size: int | None) -> int:
+    if chunk_size is not None:
+        return chunk_size
+
+    maximum_packet_size = fastmqtt.maximum_packet_size
+    if maximum_packet_size is None:
+        return DEFAULT_CHUNK_SIZE
+    return max(1, min(DEFAULT_CHUNK_SIZE, maximum_packet_size - len(topic) - _PACKET_OVERHEAD))
+
+
+async def publish_chunked(
+    fastmqtt: "FastMQTT",
+    topic: str,
+    source: ChunkSource,
+    qos: int = 1,
+    properties: PublishProperties | None = None,
+    chunk_size: int | None = None,
+    transfer_id: str | None = None,
+    offset: int = 0,
+    retries: int = 5,
+    retry_interval: float = 1.0,
+) -> str:
+    """Publish ``source`` (bytes, a path, a binary file or an async iterable of bytes) as
+    sequenced chunks, holding one chunk in memory at a time.
+
+    Chunks are sent raw, without the payload encoder or publish middlewares. A chunk that fails
+    (e.g. the connection dropped) is published again up to ``retries`` times once the client
+    has reconnected, the receiver drops the duplicates. To resume an interrupted transfer pass
+    its ``transfer_id`` and the ``offset`` the receiver has reached
+    (``ChunkedReceiver.received``), earlier chunks are read for the digest but not sent.
+    Returns the transfer id.
+    """
+    transfer_id = transfer_id or uuid.uuid4().hex
+    chunk_size = _chunk_size(fastmqtt, topic, chunk_size)
+    properties = properties or PublishProperties()
+    digest = hashlib.sha256()
+    position = 0
+
+    async for chunk, last in _with_last(_read_chunks(source, chunk_size)):
+        digest.update(chunk)
+        if position + len(chunk) > offset or last:
+            metadata = [(TRANSFER_PROPERTY, transfer_id), (OFFSET_PROPERTY, str(position))]
+            if last:
+                metadata.append((SIZE_PROPERTY, str(position + len(chunk))))
+                metadata.append((SHA256_PROPERTY, digest.hexdigest()))
+
+            chunk_properties = dataclasses.replace(
+                properties, user_property=[*properties.user_property, *metadata]
+            )
+            await _publish_chunk(
+                fastmqtt, topic, chunk, qos, chunk_properties, retries, retry_interval
+            )
+        position += len(chunk)
+
+    return transfer_id
+
+
+async def _publish_chunk(
+    fastmqtt: "FastMQTT",
+    topic: str,
+    chunk: bytes,
+    qos: int,
+    properties: PublishProperties,
+    retries: int,
+    retry_interval: float,
+) -> None:
+    for attempt in range(retries + 1):
+        try:
+            await fastmqtt._publish_encoded(topic, chunk, qos, False, properties)
+            return
+        except FastMQTTError:
+            raise
+        except Exception as e:
+            if attempt == retries:
+                raise
+            log.warning(f"Failed to publish a chunk to {topic} ({e!r}), retrying")
+            # The publish itself waits for the reconnect
+            await asyncio.sleep(retry_interval)
+
+
+class Transfer:
+    """A chunked transfer being received.
+
+    Iterate it with ``async for chunk in transfer``. In streaming mode chunks are yielded as
+    they arrive and a failed integrity check raises ``FastMQTTError`` at the end, otherwise the
+    callback runs once the transfer is complete and verified and ``file`` holds the content.
+    """
+
+    def __init__(
+        self,
+        message: Message,
+        transfer_id: str,
+        stream: bool,
+        max_memory: int,
+        max_pending: int,
+    ) -> None:
+        self.transfer_id = transfer_id
+        self.topic = message.topic
+        self.properties = dataclasses.replace(
+            message.properties,
+            user_property=[
+                (key, value)
+                for key, value in message.properties.user_property
+                if key not in _METADATA
+            ],
+        )
+        self.size: int | None = None
+        self.received = 0
+        self.file: Any = None
+        if not stream:
+            # Closed by ChunkedReceiver once the callback is done
+            self.file = tempfile.SpooledTemporaryFile(max_size=max_memory)  # noqa: SIM115
+
+        self._digest = hashlib.sha256()
+        self._expected_sha256: str | None = None
+        self._pending: dict[int, bytes] = {}
+        self._max_pending = max_pending
+        self._queue: asyncio.Queue[bytes | BaseException | None] = asyncio.Queue()
+        self._space = asyncio.Semaphore(max_pending)
+        # Chunks are written one at a time, a chunk waiting for space must not let a
+        # redelivered copy of itself pass
+        self._writing = asyncio.Lock()
+        # Write of the spool in a thread, past max_memory it is a file on disk
+        self._spooling: asyncio.Future | None = None
+        self._error: FastMQTTError | None = None
+        self._abandoned = False
+
+    @property
+    def complete(self) -> bool:
+        return self.size is not None and self.received >= self.size
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        if self.file is not None:
+            while chunk := await asyncio.to_thread(self.file.read, DEFAULT_CHUNK_SIZE):
+                yield chunk
+            return
+
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            self._space.release()
+            yield item
+
+    async def read(self) -> bytes:
+        return b"".join([chunk async for chunk in self])
+
+    async def _add(self, offset: int, data: bytes, metadata: dict[str, str]) -> None:
+        if SIZE_PROPERTY in metadata:
+            self.size = int(metadata[SIZE_PROPERTY])
+            self._expected_sha256 = metadata[SHA256_PROPERTY]
+
+        async with self._writing:
+            await self._add_in_order(offset, data)
+
+    async def _add_in_order(self, offset: int, data: bytes) -> None:
+        if offset < self.received and offset + len(data) <= self.received:
+            return  # Redelivered or resent
+        if offset > self.received:
+            if offset not in self._pending and len(self._pending) >= self._max_pending:
+                # Acknowledged already, dropping the chunk would only let the transfer time out
+                raise FastMQTTError(
+                    f"Transfer {self.transfer_id} has more than {self._max_pending} chunks out "
+                    "of order"
+                )
+            self._pending[offset] = data
+            return
+
+        await self._write(data[self.received - offset :])
+        while (data := self._pending.get(self.received)) is not None:
+            offset = self.received
+            await self._write(data)
+            # Kept until written, a cancelled write leaves it for the next chunk
+            del self._pending[offset]
+
+    async def _write(self, data: bytes) -> None:
+        if self.file is not None:
+            # One write at a time. Not cancelled once submitted, so the chunk is counted below
+            if self._spooling is not None:
+                await asyncio.shield(self._spooling)
+            self._spooling = asyncio.get_running_loop().run_in_executor(None, self._spool, data)
+        elif not self._abandoned:
+            await self._space.acquire()
+            self._queue.put_nowait(data)
+
+        # Counted once written, a chunk cancelled while waiting for space is not part of the
+        # transfer and its redelivery is written again
+        self._digest.update(data)
+        self.received += len(data)
+
+    def _spool(self, data: bytes) -> None:
+        # Runs in a thread
+        try:
+            self.file.write(data)
+        except Exception as e:
+            self._error = FastMQTTError(f"Failed to spool transfer {self.transfer_id}: {e!r}")
+
+    async def _spooled(self) -> FastMQTTError | None:
+        """Wait for the spool writes and rewind the file for the callback."""
+        if self._spooling is not None:
+            await self._spooling
+        if self._error is None:
+            self.file.seek(0)
+        return self._error
+
+    def _verify(self) -> FastMQTTError | None:
+        if self.received != self.size:
+            return FastMQTTError(
+                f"Transfer {self.transfer_id} has {self.received} bytes, expected {self.size}"
+            )
+        if self._digest.hexdigest() != self._expected_sha256:
+            return FastMQTTError(f"Transfer {self.transfer_id} failed the sha256 check")
+        return None
+
+    def _finish(self, error: BaseException | None = None) -> None:
+        if self.file is None:
+            self._queue.put_nowait(error)
+        elif error is not None:
+            if self._spooling is not None and not self._spooling.done():
+                self._spooling.add_done_callback(lambda _: self.file.close())
+            else:
+                self.file.close()
+
+    def _abandon(self) -> None:
+        # The consumer stopped iterating, unblock the writer
+        self._abandoned = True
+        while not self._queue.empty():
+            if isinstance(self._queue.get_nowait(), bytes):
+                self._space.release()
+
+
+class ChunkedReceiver:
+    """Reassembles transfers sent with ``publish_chunked``, register it on their topics:
+
+        async def on_firmware(transfer: Transfer) -> None:
+            async for chunk in transfer:
+                ...
+
+        fastmqtt.register(ChunkedReceiver(on_firmware, stream=True), "firmware/+")
+
+    With ``stream=True`` the callback starts with the first chunk and memory is bounded by
+    ``max_pending`` chunks, otherwise the content is spooled to a temporary file (in memory up
+    to ``max_memory`` bytes, written and read in a thread) and the callback runs once it passed
+    the integrity check. Partial transfers survive reconnects, duplicated and out of order
+    chunks are handled. A transfer with more than ``max_pending`` chunks out of order, or
+    without a new chunk for ``timeout`` seconds, is dropped.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Transfer], Awaitable[Any]],
+        stream: bool = False,
+        max_memory: int = 1024 * 1024,
+        max_pending: int = 64,
+        timeout: float = 300.0,
+    ) -> None:
+        self._callback = callback
+        self._stream = stream
+        self._max_memory = max_memory
+        self._max_pending = max_pending
+        self._timeout = timeout
+        self._transfers: dict[str, Transfer] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        # Recently finished transfers, their redelivered chunks must not start a new one
+        self._finished: OrderedDict[str, None] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    def received(self, transfer_id: str) -> int | None:
+        """Bytes received in order so far, the ``offset`` to resume the transfer from."""
+        transfer = self._transfers.get(transfer_id)
+        return None if transfer is None else transfer.received
+
+    async def __call__(self, message: Message) -> None:
+        metadata = dict(message.properties.user_property)
+        transfer_id = metadata.get(TRANSFER_PROPERTY)
+        if transfer_id is None or OFFSET_PROPERTY not in metadata:
+            log.warning(f"Message on {message.topic} is not a chunk of a transfer")
+            return
+        if transfer_id in self._finished:
+            return
+
+        transfer = self._transfers.get(transfer_id)
+        if transfer is None:
+            transfer = self._start(message, transfer_id)
+
+        self._reset_timer(transfer_id)
+        try:
+            await transfer._add(int(metadata[OFFSET_PROPERTY]), message.payload.raw(), metadata)
+        except FastMQTTError as e:
+            log.error(str(e))
+            if self._transfers.get(transfer_id) is transfer:
+                self._drop(transfer_id, e)
+            return
+        if transfer.complete and self._transfers.get(transfer_id) is transfer:
+            self._complete(transfer, message.client.supervisor)
+
+    async def close(self) -> None:
+        for transfer_id in list(self._transfers):
+            self._drop(transfer_id, FastMQTTError(f"Transfer {transfer_id} was interrupted"))
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _start(self, message: Message, transfer_id: str) -> Transfer:
+        transfer = Transfer(
+            message, transfer_id, self._stream, self._max_memory, self._max_pending
+        )
+        self._transfers[transfer_id] = transfer
+        if self._stream:
+            self._run_callback(transfer, message.client.supervisor)
+        return transfer
+
+    def _complete(self, transfer: Transfer, supervisor: TaskSupervisor) -> None:
+        error = transfer._verify()
+        self._drop(transfer.transfer_id, error)
+        if error is not None:
+            log.error(str(error))
+        elif not self._stream:
+            self._run_callback(transfer, supervisor)
+
+    def _drop(self, transfer_id: str, error: BaseException | None = None) -> None:
+        transfer = self._transfers.pop(transfer_id)
+        timer = self._timers.pop(transfer_id, None)
+        if timer is not None:
+            timer.cancel()
+
+        self._finished[transfer_id] = None
+        if len(self._finished) > 1024:
+            self._finished.popitem(last=False)
+        transfer._finish(error)
+
+    def _expire(self, transfer_id: str) -> None:
+        log.warning(f"Transfer {transfer_id} timed out after {self._timeout}s")
+        self._drop(transfer_id, FastMQTTError(f"Transfer {transfer_id} timed out"))
+
+    def _reset_timer(self, transfer_id: str) -> None:
+        timer = self._timers.get(transfer_id)
+        if timer is not None:
+            timer.cancel()
+        self._timers[transfer_id] = asyncio.get_running_loop().call_later(
+            self._timeout, self._expire, transfer_id
+        )
+
+    def _run_callback(self, transfer: Transfer, supervisor: TaskSupervisor) -> None:
+        # Errors are logged by _on_callback_done
+        task = supervisor.spawn(self._deliver(transfer), log_errors=False)
+        self._tasks.add(task)
+        task.add_done_callback(lambda task: self._on_callback_done(transfer, task))
+
+    async def _deliver(self, transfer: Transfer) -> None:
+        if transfer.file is not None and (error := await transfer._spooled()) is not None:
+            log.error(str(error))
+            return
+        await self._callback(transfer)
+
+    def _on_callback_done(self, transfer: Transfer, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if transfer.file is not None:
+            transfer.file.close()
+        elif transfer.transfer_id in self._transfers:
+            transfer._abandon()
+
+        if not task.cancelled() and (exception := task.exception()) is not None:
+            log.error(f"Error in transfer callback {exception!r}", exc_info=exception)
@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import logging
+from typing import Sequence
+
+from .bench import BenchConfig, run_bench
+from .encoders import CODECS
+
+
+def _add_bench_parser(subparsers: argparse._SubParsersAction) -> None:
+    defaults = BenchConfig()
+    parser = subparsers.add_parser(
+        "bench",
+        help="simulate a fleet of clients publishing to a broker",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--host", default=defaults.hostname)
+    parser.add_argument("--port", type=int, default=defaults.port)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("-n", "--clients", type=int, default=defaults.clients)
+    parser.add_argument(
+        "-t", "--topic", default=defaults.topic, help="{client} and {seq} are replaced"
+    )
+    parser.add_argument(
+        "-r", "--rate", type=float, default=defaults.rate, help="messages per second per client"
+    )
+    parser.add_argument("-d", "--duration", type=float, default=defaults.duration)
+    parser.add_argument("-q", "--qos", type=int, choices=[0, 1, 2], default=defaults.qos)
+    parser.add_argument("-s", "--payload-size", type=int, default=defaults.payload_size)
+    parser.add_argument("--codec", choices=["raw", *CODECS], default=defaults.codec)
+    parser.add_argument(
+        "--no-receive", action="store_true", help="do not measure end-to-end latency"
+    )
+    parser.add_argument("--connect-concurrency", type=int, default=defaults.connect_concurrency)
+    parser.add_argument("--client-id-prefix", default=defaults.client_id_prefix)
+    parser.add_argument(
+        "--embedded-broker",
+        action="store_true",
+        help="run a broker on --host/--port in this process (needs mqttools, QoS 0 only)",
+    )
+
+
+def _bench(args: argparse.Namespace) -> None:
+    config = BenchConfig(
+        hostname=args.host,
+        port=args.port,
+        username=args.username,
+        password=args.password,
+        clients=args.clients,
+        topic=args.topic,
+        rate=args.rate,
+        duration=args.duration,
+        qos=args.qos,
+        payload_size=args.payload_size,
+        codec=args.codec,
+        receive=not args.no_receive,
+        connect_concurrency=args.connect_concurrency,
+        client_id_prefix=args.client_id_prefix,
+        embedded_broker=args.embedded_broker,
+    )
+    result = asyncio.run(run_bench(config))
+    print(result.format())
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="fastmqtt")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    _add_bench_parser(subparsers)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    if args.command == "bench":
+        _bench(args)
@@ -1,7 +1,35 @@
-from .aiomqtt.connector import AiomqttConnector
-from .base import BaseConnector
+import importlib
+from typing import TYPE_CHECKING, Any
+
+from .base import BaseConnector, ConnectionStats
+
+if TYPE_CHECKING:
+    from .aiomqtt.connector import AiomqttConnector
+
+# Backends are imported on first use, so `import fastmqtt` does not pull in their dependencies
+CONNECTORS: dict[str, str] = {
+    "aiomqtt": "fastmqtt.connectors.aiomqtt.connector:AiomqttConnector",
+}
+
+
+def get_connector(name: str) -> type[BaseConnector]:
+    if name not in CONNECTORS:
+        raise ValueError(f"Unknown connector: {name}")
+
+    module, attr = CONNECTORS[name].split(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def __getattr__(name: str) -> Any:
+    if name == "AiomqttConnector":
+        return get_connector("aiomqtt")
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "AiomqttConnector",
     "BaseConnector",
+    "ConnectionStats",
+    "get_connector",
 ]
@@ -0,0 +1,64 @@
+"""Private aiomqtt and paho-mqtt attributes the connector relies on, reached from here only.
+
+aiomqtt does not expose its paho client nor its disconnection future, and paho does not report
+the keepalive round trip. Checked against aiomqtt 2.3 to 2.5 with paho-mqtt 2.1: a missing
+attribute the connection needs raises a ``FastMQTTError`` naming the installed versions, the
+optional ping round trip is turned off with a warning.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable
+
+import aiomqtt
+import paho.mqtt.client
+
+from fastmqtt.exceptions import FastMQTTError
+
+logger = logging.getLogger(__name__)
+_ping_unavailable = False
+
+
+def _unsupported(attribute: str) -> FastMQTTError:
+    return FastMQTTError(
+        f"aiomqtt {aiomqtt.__version__} has no {attribute}, fastmqtt supports aiomqtt 2.3 to 2.5"
+    )
+
+
+def paho_client(client: aiomqtt.Client) -> paho.mqtt.client.Client:
+    paho_client = getattr(client, "_client", None)
+    if not isinstance(paho_client, paho.mqtt.client.Client):
+        raise _unsupported("Client._client")
+    return paho_client
+
+
+def disconnected(client: aiomqtt.Client) -> asyncio.Future[None]:
+    """Resolved, or failed, once the connection of ``client`` is lost."""
+    future = getattr(client, "_disconnected", None)
+    if not isinstance(future, asyncio.Future):
+        raise _unsupported("Client._disconnected")
+    return future
+
+
+def hook_ping(client: aiomqtt.Client, callback: Callable[[float], None]) -> bool:
+    """Call ``callback`` with the time between a keepalive PINGREQ and its PINGRESP, False if
+    the installed paho does not allow it."""
+    paho = paho_client(client)
+    handle_pingresp = getattr(paho, "_handle_pingresp", None)
+    if handle_pingresp is None or not hasattr(paho, "_ping_t"):
+        global _ping_unavailable
+        if not _ping_unavailable:
+            _ping_unavailable = True
+            logger.warning("The ping round trip is not available with this version of paho-mqtt")
+        return False
+
+    def _handle_pingresp():
+        # paho stamps the PINGREQ with time.monotonic() and resets it on the PINGRESP
+        sent = paho._ping_t
+        if sent:
+            callback(time.monotonic() - sent)
+        return handle_pingresp()
+
+    paho._handle_pingresp = _handle_pingresp
+    return True
@@ -2,31 +2,48 @@ import asyncio
 import contextlib
 import logging
 import ssl
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from functools import wraps
-from typing import Callable, Iterable, Literal
+from typing import Any, Awaitable, Callable, Iterable, Literal, Sequence
 
 import aiomqtt
 import paho.mqtt.client
 import paho.mqtt.enums
+import paho.mqtt.properties
 from aiomqtt import ProxySettings, TLSParameters, Will
 from aiomqtt.types import SocketOption
-from tenacity import RetryCallState, retry, wait_exponential
+from tenacity import AsyncRetrying, RetryCallState, wait_random_exponential
 
 from fastmqtt.connectors.base import BaseConnector
+from fastmqtt.flow_control import DEFAULT_RECEIVE_MAXIMUM
 from fastmqtt.properties import (
+    ConnackProperties,
     ConnectProperties,
     PublishProperties,
     SubscribeProperties,
     UnsubscribeProperties,
 )
-from fastmqtt.types import CleanStart, PayloadType, SubscribeOptions
+from fastmqtt.types import CleanStart, PayloadType, RawMessage, SubscribeOptions
 
+from . import compat
 from .convertors.message import aiomqtt_to_fastmqtt_message
 from .convertors.options import fastmqtt_to_paho_subscribe_options
-from .convertors.properties import fastmqtt_to_paho_properties
+from .convertors.properties import fastmqtt_to_paho_properties, paho_to_fastmqtt_properties
 
 logger = logging.getLogger(__name__)
 WebSocketHeaders = dict[str, str] | Callable[[dict[str, str]], dict[str, str]]
+Endpoint = tuple[str, int]
+
+# Seconds to wait for the TCP handshake when measuring the latency of an endpoint
+PROBE_TIMEOUT = 5.0
+# Seconds a measured latency is reused, reconnecting in a loop does not probe every endpoint
+LATENCY_TTL = 60.0
+# Messages of the standby kept at most, see standby_buffer
+STANDBY_BUFFER_SIZE = 10_000
+# Shared subscriptions are not mirrored on the standby, it would take its share of the messages
+SHARED_PREFIX = "$share/"
 
 
 def on_reconnect_log(retry_state: RetryCallState) -> None:
@@ -71,6 +88,108 @@ def retry_disconected(max_retries: int = 3):
     return decorator
 
 
+def _fingerprint(topic: str, payload: bytes, properties: Any) -> int:
+    # Of a message received by both connections, from the fields the broker forwards unchanged
+    return hash(
+        (
+            topic,
+            payload,
+            getattr(properties, "CorrelationData", None),
+            tuple(getattr(properties, "UserProperty", ())),
+        )
+    )
+
+
+class _Window:
+    """Items of the last ``duration`` seconds (at most ``maxlen``), taken by fingerprint."""
+
+    def __init__(self, duration: float, maxlen: int = STANDBY_BUFFER_SIZE) -> None:
+        self._duration = duration
+        self._maxlen = maxlen
+        # Sequence number -> (time.monotonic() added, fingerprint, item), oldest first
+        self._items: OrderedDict[int, tuple[float, int, Any]] = OrderedDict()
+        self._sequences: dict[int, deque[int]] = {}
+        self._next = 0
+
+    def add(self, fingerprint: int, item: Any) -> list[Any]:
+        """Add ``item`` and return the items that expired."""
+        now = time.monotonic()
+        self._items[self._next] = (now, fingerprint, item)
+        self._sequences.setdefault(fingerprint, deque()).append(self._next)
+        self._next += 1
+
+        expired = []
+        while True:
+            added, oldest, expired_item = next(iter(self._items.values()))
+            if added >= now - self._duration and len(self._items) <= self._maxlen:
+                return expired
+            self._items.popitem(last=False)
+            self._forget(oldest)
+            expired.append(expired_item)
+
+    def take(self, fingerprint: int) -> Any:
+        """Remove and return the oldest item with ``fingerprint``, None if there is none."""
+        sequences = self._sequences.get(fingerprint)
+        if not sequences:
+            return None
+        _, _, item = self._items.pop(sequences[0])
+        self._forget(fingerprint)
+        return item
+
+    def items(self) -> list[Any]:
+        return [item for _, _, item in self._items.values()]
+
+    def _forget(self, fingerprint: int) -> None:
+        sequences = self._sequences[fingerprint]
+        sequences.popleft()
+        if not sequences:
+            del self._sequences[fingerprint]
+
+
+@dataclass
+class _Connection:
+    client: aiomqtt.Client
+    endpoint: Endpoint
+    identifier: str
+    # Resolved when a standby connection becomes the active one
+    promoted: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+    session_present: bool = False
+    connack_properties: ConnackProperties | None = None
+    # Of a standby: subscribed like the active connection, the topics it subscribed and the
+    # messages it received that the active connection did not, unacknowledged
+    subscribed: bool = False
+    topics: set[str] = field(default_factory=set)
+    buffer: _Window = field(default_factory=lambda: _Window(0.0))
+    reader: asyncio.Task | None = None
+    # Its acknowledgements are sent by _take, the standby holds them until it takes over
+    holds_acks: bool = False
+
+
+def _mirrored(topic: str) -> bool:
+    return not topic.startswith(SHARED_PREFIX)
+
+
+def _format(endpoint: Endpoint | None) -> str:
+    return "-" if endpoint is None else f"{endpoint[0]}:{endpoint[1]}"
+
+
+async def _measure_latency(endpoint: Endpoint) -> float | None:
+    start = time.monotonic()
+    try:
+        async with asyncio.timeout(PROBE_TIMEOUT):
+            _, writer = await asyncio.open_connection(*endpoint)
+    except (OSError, TimeoutError):
+        return None
+
+    latency = time.monotonic() - start
+    writer.close()
+    with contextlib.suppress(OSError):
+        await writer.wait_closed()
+    return latency
+
+
 class AiomqttConnector(BaseConnector):
     def __init__(
         self,
@@ -98,6 +217,14 @@ class AiomqttConnector(BaseConnector):
         socket_options: Iterable[SocketOption] | None = None,
         websocket_path: str | None = None,
         websocket_headers: WebSocketHeaders | None = None,
+        manual_ack: bool = False,
+        reconnect_base_delay: float = 0.5,
+        reconnect_max_delay: float = 30,
+        failover_brokers: Sequence[Endpoint] | None = None,
+        standby: bool = False,
+        latency_tolerance: float = 0.05,
+        failover_penalty: float = 30.0,
+        standby_buffer: float = 5.0,
     ):
         self._aiomqtt_kwargs = {
             "hostname": hostname,
@@ -114,7 +241,9 @@ class AiomqttConnector(BaseConnector):
             "bind_port": bind_port,
             "max_queued_incoming_messages": max_queued_incoming_messages,
             "max_queued_outgoing_messages": max_queued_outgoing_messages,
-            "max_inflight_messages": max_inflight_messages,
+            # In-flight publishes are limited to the broker's receive_maximum by fastmqtt's
+            # flow control, paho can not change its limit once connected
+            "max_inflight_messages": max_inflight_messages or DEFAULT_RECEIVE_MAXIMUM,
             "max_concurrent_outgoing_calls": max_concurrent_outgoing_calls,
             "properties": properties and fastmqtt_to_paho_properties(properties),
             "tls_context": tls_context,
@@ -127,8 +256,36 @@ class AiomqttConnector(BaseConnector):
         }
         self._aiomqtt_kwargs = {k: v for k, v in self._aiomqtt_kwargs.items() if v is not None}
         self._aiomqtt_client: aiomqtt.Client | None = None
+        # Messages of the current connection waiting for a manual acknowledgement
+        self._unacked: dict[int, RawMessage] = {}
 
         self._maintain_connection_task: asyncio.Task | None = None
+        # Full jitter, so a fleet of clients does not reconnect in lockstep after a broker restart
+        self._reconnect_wait = wait_random_exponential(
+            multiplier=reconnect_base_delay, max=reconnect_max_delay
+        )
+        self._reconnect_max_delay = reconnect_max_delay
+
+        # In order of preference, see _select_endpoint
+        self._endpoints: list[Endpoint] = [(hostname, port), *(failover_brokers or [])]
+        self._latency_tolerance = latency_tolerance
+        self._failover_penalty = failover_penalty
+        # Endpoints that failed recently, until when they are avoided
+        self._penalized: dict[Endpoint, float] = {}
+        # Measured latency of each endpoint, (time.monotonic() measured, latency)
+        self._latencies: dict[Endpoint, tuple[float, float | None]] = {}
+        self._standby = standby
+        self._standby_buffer = standby_buffer
+        self._standby_connection: _Connection | None = None
+        self._offline_since: float | None = None
+        # Broker-side subscriptions, topic -> paho options and properties, replayed on the standby
+        self._subscriptions: dict[
+            str,
+            tuple[paho.mqtt.client.SubscribeOptions, paho.mqtt.properties.Properties | None],
+        ] = {}
+        self._subscriptions_version = 0
+        # Fingerprints of the messages of the active connection the standby has not received
+        self._received = _Window(standby_buffer)
 
         super().__init__(
             hostname=hostname,
@@ -140,19 +297,98 @@ class AiomqttConnector(BaseConnector):
             keepalive=keepalive,
             properties=properties,
             clean_start=clean_start,
+            manual_ack=manual_ack,
         )
+        # After a takeover the identifier of the standby, whose session is the clean one it
+        # started. The standby never uses the client_id, it would clear its session
+        self._active_identifier = self._client_id
+
+    def _on_connect(self, reconnect: bool, endpoint: Endpoint) -> None:
+        stats = self.connection_stats
+        if self._offline_since is not None:
+            offline = time.monotonic() - self._offline_since
+            self._offline_since = None
+            stats.last_offline = offline
+            stats.total_offline += offline
+            stats.max_offline = max(stats.max_offline, offline)
+            logger.info("Back online after %.3fs", offline)
+        if stats.endpoint is not None and stats.endpoint != endpoint:
+            stats.failovers += 1
+        stats.endpoint = endpoint
+        stats.connections += 1
 
-    def _on_connect(self) -> None:
         self.connected_event.set()
         self.disconnected_event.clear()
         self.reconnect_event.set()
         self.reconnect_event.clear()
-        asyncio.gather(*[cb() for cb in self._connect_callbacks])
+        callbacks = self._connect_callbacks
+        if reconnect:
+            callbacks = callbacks + self._reconnect_callbacks
+        for callback in callbacks:
+            self.supervisor.spawn(callback())
+
+    def _hook_connack(self, connection: _Connection) -> None:
+        # Kept on the connection, a standby connects while another one is active
+        paho_client = compat.paho_client(connection.client)
+        aiomqtt_on_connect = paho_client.on_connect
+
+        def on_connect(paho_client, userdata, flags, reason_code, properties=None):
+            connection.session_present = bool(flags.session_present)
+            connection.connack_properties = None
+            try:
+                if properties is not None:
+                    connack_properties = paho_to_fastmqtt_properties(properties)
+                    if isinstance(connack_properties, ConnackProperties):
+                        connection.connack_properties = connack_properties
+            except Exception:
+                logger.exception("Failed to convert CONNACK properties")
+
+            aiomqtt_on_connect(paho_client, userdata, flags, reason_code, properties)
+
+        paho_client.on_connect = on_connect
+
+    def _hook_backlog(self, client: aiomqtt.Client) -> None:
+        paho_client = compat.paho_client(client)
+        aiomqtt_on_message = paho_client.on_message
+
+        def on_message(paho_client, userdata, message):
+            if self._standby and client is self._aiomqtt_client:
+                self._on_active_message(message.topic, message.payload, message.properties)
+            # aiomqtt queues every message while the message loop is paused, QoS 0 ones are
+            # not held back by the broker and are dropped here instead
+            admission_controller = self.admission_controller
+            if admission_controller is not None and not admission_controller.accept(
+                message.qos, len(client.messages)
+            ):
+                return
+            aiomqtt_on_message(paho_client, userdata, message)
+
+        paho_client.on_message = on_message
+
+    def _on_active_message(self, topic: str, payload: bytes, properties: Any) -> None:
+        # Received by the standby first, it is not dispatched again on takeover
+        fingerprint = _fingerprint(topic, payload, properties)
+        connection = self._standby_connection
+        if connection is not None:
+            message = connection.buffer.take(fingerprint)
+            if message is not None:
+                self._ack(connection.client, message)
+                return
+        self._received.add(fingerprint, True)
+
+    def _ack(self, client: aiomqtt.Client, message: RawMessage) -> None:
+        if message.qos > 0:
+            compat.paho_client(client).ack(message.mid, message.qos)
+
+    def _on_ping_round_trip(self, round_trip: float) -> None:
+        self.ping_round_trip = round_trip
 
     def _on_disconnect(self) -> None:
+        self._offline_since = time.monotonic()
         self.connected_event.clear()
         self.disconnected_event.set()
-        asyncio.gather(*[cb() for cb in self._disconnect_callbacks])
+        for callback in self._disconnect_callbacks:
+            self.supervisor.spawn(callback())
 
     async def _get_client(self) -> aiomqtt.Client:
         await self.connected_event.wait()
@@ -181,6 +417,9 @@ class AiomqttConnector(BaseConnector):
             options=paho_options,
             properties=paho_properties,
         )
+        self._track_subscribe(
+            [(topic, paho_options or paho.mqtt.client.SubscribeOptions())], paho_properties
+        )
 
     @retry_disconected()
     async def subscribe_multiple(
@@ -200,6 +439,7 @@ class AiomqttConnector(BaseConnector):
             topic=paho_topics,
             properties=paho_properties,
         )
+        self._track_subscribe(paho_topics, paho_properties)
 
     @retry_disconected()
     async def unsubscribe(
@@ -213,6 +453,7 @@ class AiomqttConnector(BaseConnector):
 
         client = await self._get_client()
         await client.unsubscribe(topic=topic, properties=paho_properties)
+        self._track_unsubscribe([topic], paho_properties)
 
     @retry_disconected()
     async def unsubscribe_multiple(
@@ -226,6 +467,45 @@ class AiomqttConnector(BaseConnector):
 
         client = await self._get_client()
         await client.unsubscribe(topic=topics, properties=paho_properties)
+        self._track_unsubscribe(topics, paho_properties)
+
+    def _track_subscribe(
+        self,
+        topics: list[tuple[str, paho.mqtt.client.SubscribeOptions]],
+        properties: paho.mqtt.properties.Properties | None,
+    ) -> None:
+        for topic, options in topics:
+            self._subscriptions[topic] = (options, properties)
+        self._subscriptions_version += 1
+
+        topics = [(topic, options) for topic, options in topics if _mirrored(topic)]
+        connection = self._standby_connection
+        if connection is not None and topics:
+            connection.topics.update(topic for topic, _ in topics)
+            subscribe = connection.client.subscribe(topics, properties=properties)
+            self.supervisor.spawn(self._update_standby(connection, subscribe))
+
+    def _track_unsubscribe(
+        self, topics: list[str], properties: paho.mqtt.properties.Properties | None
+    ) -> None:
+        for topic in topics:
+            self._subscriptions.pop(topic, None)
+        self._subscriptions_version += 1
+
+        connection = self._standby_connection
+        topics = [topic for topic in topics if _mirrored(topic)]
+        if connection is not None and topics:
+            connection.topics.difference_update(topics)
+            unsubscribe = connection.client.unsubscribe(topics, properties=properties)
+            self.supervisor.spawn(self._update_standby(connection, unsubscribe))
+
+    async def _update_standby(self, connection: _Connection, call: Awaitable[object]) -> None:
+        try:
+            await call
+        except Exception as e:
+            # Subscribed again by FastMQTT if it takes over
+            logger.warning("Failed to update the subscriptions of the standby: %r", e)
+            connection.subscribed = False
 
     @retry_disconected()
     async def publish(
@@ -249,7 +529,51 @@ class AiomqttConnector(BaseConnector):
             properties=paho_properties,
         )
 
+    def prepare_properties(self, properties: PublishProperties) -> paho.mqtt.properties.Properties:
+        return fastmqtt_to_paho_properties(properties)
+
+    @retry_disconected()
+    async def publish_prepared(
+        self,
+        topic: str,
+        payload: PayloadType,
+        qos: int,
+        retain: bool,
+        properties: paho.mqtt.properties.Properties | None,
+    ) -> None:
+        client = await self._get_client()
+        await client.publish(
+            topic=topic,
+            payload=payload,
+            qos=qos,
+            retain=retain,
+            properties=properties,
+        )
+
+    def ack(self, message: RawMessage) -> None:
+        # Only messages of the current connection, after a reconnect the mid may
+        # belong to another message
+        if self._unacked.get(message.mid) is not message or self._aiomqtt_client is None:
+            return
+
+        del self._unacked[message.mid]
+        compat.paho_client(self._aiomqtt_client).ack(message.mid, message.qos)
+
+    async def reconnect(self) -> None:
+        client = self._aiomqtt_client
+        if client is None:
+            return
+
+        logger.warning("Dropping the connection to %s", _format(self.connection_stats.endpoint))
+        # Ends the message iteration, _maintain_connection then connects again
+        rc = compat.paho_client(client).disconnect()
+        disconnected = compat.disconnected(client)
+        if rc != paho.mqtt.client.MQTT_ERR_SUCCESS and not disconnected.done():
+            disconnected.set_exception(aiomqtt.MqttError("Reconnect requested"))
+        await self.disconnected_event.wait()
+
     async def connect(self) -> None:
+        self._offline_since = None
         self._maintain_connection_task = asyncio.create_task(self._maintain_connection())
         await self.connected_event.wait()
 
@@ -261,39 +585,324 @@ class AiomqttConnector(BaseConnector):
 
         await self.disconnected_event.wait()
 
-    @retry(
-        wait=wait_exponential(multiplier=0.1, max=5, exp_base=2.5), before_sleep=on_reconnect_log
-    )
     async def _maintain_connection(self) -> None:
-        clean_start = self._clean_start == CleanStart.ALWAYS or (
-            self._first_connect and self._clean_start == CleanStart.FIRST_ONLY
+        standby_task = asyncio.create_task(self._maintain_standby()) if self._standby else None
+        try:
+            async for attempt in AsyncRetrying(
+                wait=self._wait_reconnect, before_sleep=on_reconnect_log
+            ):
+                with attempt:
+                    await self._run_connection()
+        finally:
+            if standby_task is not None:
+                standby_task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await standby_task
+
+    def _wait_reconnect(self, retry_state: RetryCallState) -> float:
+        # A connected standby takes over right away
+        if self._standby_connection is not None:
+            return 0.0
+        return self._reconnect_wait(retry_state)
+
+    async def _run_connection(self) -> None:
+        connection = self._take_standby()
+        if connection is None:
+            clean_start = self._clean_start == CleanStart.ALWAYS or (
+                self._first_connect and self._clean_start == CleanStart.FIRST_ONLY
+            )
+            endpoint = await self._select_endpoint()
+            connection = await self._open_connection(
+                endpoint, self._active_identifier, clean_start=clean_start
+            )
+        else:
+            self.connection_stats.standby_takeovers += 1
+            logger.warning("Standby connection to %s takes over", _format(connection.endpoint))
+            await self._promote(connection)
+
+        client = connection.client
+        self._active_identifier = connection.identifier
+        self.session_present = connection.session_present
+        self.connack_properties = connection.connack_properties
+        compat.hook_ping(client, self._on_ping_round_trip)
+        self._unacked.clear()
+        self._received = _Window(self._standby_buffer)
+        try:
+            reconnect = not self._first_connect
+            if not reconnect:
+                logger.info(
+                    "Connected to %s as %s",
+                    _format(connection.endpoint),
+                    connection.identifier,
+                )
+            else:
+                logger.info(
+                    "Connection established to %s as %s (session present: %s)",
+                    _format(connection.endpoint),
+                    connection.identifier,
+                    self.session_present,
+                )
+
+            self._first_connect = False
+            self._aiomqtt_client = client
+            self._on_connect(reconnect, connection.endpoint)
+            # Received by the standby only, the lost connection did not deliver them
+            for message in connection.buffer.items():
+                self._take(client, message, holds_acks=True)
+            connection.buffer = _Window(0.0)
+            await self._process_messages(client, connection.holds_acks or self._holds_acks)
+
+        except Exception:
+            self._penalize(connection.endpoint)
+            raise
+
+        finally:
+            self._aiomqtt_client = None
+            self._on_disconnect()
+            await client.__aexit__(None, None, None)
+
+    async def _open_connection(
+        self, endpoint: Endpoint, identifier: str, clean_start: bool, standby: bool = False
+    ) -> _Connection:
+        kwargs = {**self._aiomqtt_kwargs, "hostname": endpoint[0], "port": endpoint[1]}
+        kwargs["identifier"] = identifier
+        if standby:
+            # The will belongs to the active connection, losing the standby is not an outage
+            kwargs.pop("will", None)
+
+        client = aiomqtt.Client(clean_start=clean_start, **kwargs)
+        # A standby acknowledges a message once the active connection received it too, or
+        # dispatches it when it takes over
+        compat.paho_client(client).manual_ack_set(standby or self._holds_acks)
+        connection = _Connection(client, endpoint, identifier, holds_acks=standby)
+        if standby:
+            connection.buffer = _Window(self._standby_buffer)
+        self._hook_connack(connection)
+        self._hook_backlog(client)
+        try:
+            await client.__aenter__()
+        except Exception:
+            self._penalize(endpoint)
+            raise
+        return connection
+
+    @property
+    def _holds_acks(self) -> bool:
+        # With admission control messages are acknowledged once taken, see _process_messages
+        return self._manual_ack or self.admission_controller is not None
+
+    async def _select_endpoint(self, exclude: Endpoint | None = None) -> Endpoint:
+        """The first endpoint, in the configured order, with a TCP handshake at most
+        ``latency_tolerance`` slower than the fastest one."""
+        endpoints = [endpoint for endpoint in self._endpoints if endpoint != exclude]
+        now = time.monotonic()
+        # Endpoints that failed recently are only tried when all of them did
+        endpoints = (
+            [endpoint for endpoint in endpoints if self._penalized.get(endpoint, 0.0) <= now]
+            or endpoints
+            or self._endpoints
+        )
+        if len(endpoints) == 1:
+            return endpoints[0]
+
+        latencies = await self._measure_latencies(endpoints)
+        reachable = [
+            (latency, endpoint)
+            for latency, endpoint in zip(latencies, endpoints)
+            if latency is not None
+        ]
+        if not reachable:
+            return endpoints[0]
+
+        fastest = min(latency for latency, _ in reachable)
+        return next(
+            endpoint
+            for latency, endpoint in reachable
+            if latency <= fastest + self._latency_tolerance
         )
 
-        async with aiomqtt.Client(clean_start=clean_start, **self._aiomqtt_kwargs) as client:
-            try:
-                if self._first_connect:
-                    logger.info(
-                        "Connected to %s as %s",
-                        f"{self._hostname}:{self._port}",
-                        self.identifier,
+    async def _measure_latencies(self, endpoints: list[Endpoint]) -> list[float | None]:
+        now = time.monotonic()
+        stale = [
+            endpoint
+            for endpoint in endpoints
+            if self._latencies.get(endpoint, (-LATENCY_TTL, None))[0] + LATENCY_TTL <= now
+        ]
+        measured = await asyncio.gather(*[_measure_latency(endpoint) for endpoint in stale])
+        for endpoint, latency in zip(stale, measured):
+            self._latencies[endpoint] = (now, latency)
+        return [self._latencies[endpoint][1] for endpoint in endpoints]
+
+    def _penalize(self, endpoint: Endpoint) -> None:
+        if len(self._endpoints) > 1:
+            self._penalized[endpoint] = time.monotonic() + self._failover_penalty
+
+    def _take_standby(self) -> _Connection | None:
+        connection = self._standby_connection
+        if connection is None or compat.disconnected(connection.client).done():
+            return None
+
+        self._standby_connection = None
+        connection.promoted.set_result(None)
+        return connection
+
+    async def _maintain_standby(self) -> None:
+        connection = None
+        try:
+            while True:
+                await self.connected_event.wait()
+                identifier = (
+                    f"{self._client_id}-standby"
+                    if self._active_identifier != f"{self._client_id}-standby"
+                    else f"{self._client_id}-standby-2"
+                )
+                try:
+                    endpoint = await self._select_endpoint(exclude=self.connection_stats.endpoint)
+                    connection = await self._open_connection(
+                        endpoint, identifier, clean_start=True, standby=True
                     )
-                else:
-                    logger.info(
-                        "Connection established to %s as %s",
-                        f"{self._hostname}:{self._port}",
-                        self.identifier,
+                    await self._subscribe_standby(connection)
+                except Exception as e:
+                    logger.warning("Standby connection failed: %r", e)
+                    if connection is not None:
+                        with contextlib.suppress(Exception):
+                            await connection.client.__aexit__(None, None, None)
+                        connection = None
+                    await asyncio.sleep(self._reconnect_max_delay)
+                    continue
+
+                logger.info("Standby connected to %s as %s", _format(endpoint), identifier)
+                connection.reader = asyncio.create_task(self._read_standby(connection))
+                self._standby_connection = connection
+                disconnected = compat.disconnected(connection.client)
+                await asyncio.wait(
+                    [disconnected, connection.promoted], return_when=asyncio.FIRST_COMPLETED
+                )
+                if connection.promoted.done():
+                    connection = None
+                    continue
+
+                logger.warning("Standby connection to %s lost", _format(endpoint))
+                disconnected.exception()  # Retrieved, it is not iterated
+                self._standby_connection = None
+                await self._stop_reader(connection)
+                await connection.client.__aexit__(None, None, None)
+                connection = None
+                await asyncio.sleep(self._reconnect_max_delay)
+        finally:
+            if connection is not None and not connection.promoted.done():
+                self._standby_connection = None
+                await self._stop_reader(connection)
+                with contextlib.suppress(Exception):
+                    await connection.client.__aexit__(None, None, None)
+
+    async def _subscribe_standby(self, connection: _Connection) -> None:
+        # Subscribed like the active connection, so it receives the same messages and takes
+        # over without subscribing first. Again if the subscriptions changed meanwhile
+        client = connection.client
+        while True:
+            version = self._subscriptions_version
+            subscriptions = {
+                topic: subscription
+                for topic, subscription in self._subscriptions.items()
+                if _mirrored(topic)
+            }
+            await self._subscribe_all(client, subscriptions)
+            stale = connection.topics - subscriptions.keys()
+            if stale:
+                await client.unsubscribe(list(stale))
+            connection.topics = set(subscriptions)
+            if version == self._subscriptions_version:
+                break
+
+        connection.subscribed = True
+
+    async def _subscribe_all(
+        self,
+        client: aiomqtt.Client,
+        subscriptions: dict[
+            str,
+            tuple[paho.mqtt.client.SubscribeOptions, paho.mqtt.properties.Properties | None],
+        ],
+    ) -> None:
+        # Topics subscribed together share their properties (subscription identifier)
+        packets: dict[int, tuple[paho.mqtt.properties.Properties | None, list]] = {}
+        for topic, (options, properties) in subscriptions.items():
+            packets.setdefault(id(properties), (properties, []))[1].append((topic, options))
+        for properties, topics in packets.values():
+            await client.subscribe(topics, properties=properties)
+
+    async def _read_standby(self, connection: _Connection) -> None:
+        # Keeps for standby_buffer seconds the messages the active connection has not received
+        # yet, it may have lost them when it fails
+        client = connection.client
+        buffer = connection.buffer
+        with contextlib.suppress(aiomqtt.MqttError):
+            async for aiomqtt_message in client.messages:
+                message = aiomqtt_to_fastmqtt_message(aiomqtt_message)
+                fingerprint = _fingerprint(
+                    message.topic, aiomqtt_message.payload, aiomqtt_message.properties
+                )
+                if self._received.take(fingerprint):
+                    self._ack(client, message)
+                    continue
+
+                expired = buffer.add(fingerprint, message)
+                for message in expired:
+                    self._ack(client, message)
+                if expired:
+                    logger.warning(
+                        "%d messages received by the standby only were dropped", len(expired)
                     )
 
-                self._first_connect = False
-                self._aiomqtt_client = client
-                self._on_connect()
-                await self._process_messages(client)
-
-            finally:
-                self._aiomqtt_client = None
-                self._on_disconnect()
-
-    async def _process_messages(self, client: aiomqtt.Client) -> None:
+    async def _stop_reader(self, connection: _Connection) -> None:
+        if connection.reader is not None:
+            connection.reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await connection.reader
+            connection.reader = None
+
+    async def _promote(self, connection: _Connection) -> None:
+        # The active connection iterates the messages from now on
+        await self._stop_reader(connection)
+        if not connection.subscribed:
+            return
+
+        shared = {
+            topic: subscription
+            for topic, subscription in self._subscriptions.items()
+            if not _mirrored(topic)
+        }
+        try:
+            await self._subscribe_all(connection.client, shared)
+        except aiomqtt.MqttError as e:
+            # Not present then, FastMQTT subscribes everything again
+            logger.warning("Failed to subscribe the shared subscriptions: %r", e)
+            return
+        # The broker has all the subscriptions, as if the session was kept. Messages the broker
+        # queued for the lost session are not received, see the README
+        connection.session_present = True
+
+    async def _process_messages(self, client: aiomqtt.Client, holds_acks: bool) -> None:
+        admission_controller = self.admission_controller
         async for aiomqtt_message in client.messages:
-            fastmqtt_message = aiomqtt_to_fastmqtt_message(aiomqtt_message)
-            asyncio.gather(*[cb(fastmqtt_message) for cb in self._message_callbacks])
+            self._take(client, aiomqtt_to_fastmqtt_message(aiomqtt_message), holds_acks)
+            if admission_controller is not None:
+                # Let the callbacks admit this message before the next one is taken
+                await asyncio.sleep(0)
+                await admission_controller.receiving_event.wait()
+
+    def _take(self, client: aiomqtt.Client, message: RawMessage, holds_acks: bool) -> None:
+        if message.qos > 0:
+            if self._manual_ack:
+                self._unacked[message.mid] = message
+            elif holds_acks:
+                # With admission control the broker sends at most receive_maximum
+                # unacknowledged messages, a paused loop stops it instead of filling the
+                # client's queue
+                self._ack(client, message)
+        self._dispatch(message)
+
+    def _dispatch(self, message: RawMessage) -> None:
+        for callback in self._message_callbacks:
+            self.supervisor.spawn(callback(message))
@@ -1,4 +1,5 @@
-from dataclasses import asdict
+import copy
+from dataclasses import fields
 from typing import Any
 
 import paho.mqtt.properties
@@ -46,6 +47,16 @@ PAHO_PACKET_TYPE_TO_FASTMQTT_TYPE_MAPPING: dict[int, type[BaseProperties]] = {
     packet_type: properties for properties, packet_type in ALL_PROPERTIES
 }
 
+# "Maximum QoS" -> "MaximumQoS" (paho attribute) and "maximum_qos" (fastmqtt field)
+PAHO_TO_FASTMQTT_NAME_MAPPING: dict[str, str] = {
+    name.replace(" ", ""): name.lower().replace(" ", "_")
+    for name in paho.mqtt.properties.Properties(PacketTypes.CONNECT).names
+}
+
+FASTMQTT_TO_PAHO_NAME_MAPPING: dict[str, str] = {
+    snake_case: camel_case for camel_case, snake_case in PAHO_TO_FASTMQTT_NAME_MAPPING.items()
+}
+
 
 def paho_to_fastmqtt_properties(
     paho_properties: paho.mqtt.properties.Properties,
@@ -63,25 +74,38 @@ def paho_to_fastmqtt_properties(
         if attr in private_vars:
             continue
 
-        snake_case_attr = "".join(["_" + c.lower() if c.isupper() else c for c in attr]).lstrip(
-            "_"
-        )
-        dict_properties[snake_case_attr] = value
+        dict_properties[PAHO_TO_FASTMQTT_NAME_MAPPING[attr]] = value
     return fastmqtt_properties_type(**dict_properties)
 
 
+# Properties() builds its name tables on every call, empty instances are copied instead
+_EMPTY_PAHO_PROPERTIES: dict[type[BaseProperties], paho.mqtt.properties.Properties] = {
+    properties: paho.mqtt.properties.Properties(packet_type)
+    for properties, packet_type in ALL_PROPERTIES
+}
+
+# (fastmqtt field, paho attribute) of every properties type, instead of asdict (a deep copy)
+_FIELD_NAMES: dict[type[BaseProperties], list[tuple[str, str]]] = {
+    properties: [
+        (field.name, FASTMQTT_TO_PAHO_NAME_MAPPING[field.name]) for field in fields(properties)
+    ]
+    for properties, _ in ALL_PROPERTIES
+}
+
+
 def fastmqtt_to_paho_properties(
     fastmqtt_properties: BaseProperties,
 ) -> paho.mqtt.properties.Properties:
-    if type(fastmqtt_properties) not in FASTMQTT_TYPE_TO_PAHO_PACKET_TYPE_MAPPING:
+    empty = _EMPTY_PAHO_PROPERTIES.get(type(fastmqtt_properties))
+    if empty is None:
         raise ValueError(f"Unknown properties type: {type(fastmqtt_properties)}")
 
-    packet_type = FASTMQTT_TYPE_TO_PAHO_PACKET_TYPE_MAPPING[type(fastmqtt_properties)]
-    paho_properties = paho.mqtt.properties.Properties(packet_type)
-
-    for attr, value in asdict(fastmqtt_properties).items():
-        if value is not None:
-            camel_case_attr = "".join(word.capitalize() for word in attr.split("_"))
-            setattr(paho_properties, camel_case_attr, value)
+    paho_properties = copy.copy(empty)
+    for name, paho_name in _FIELD_NAMES[type(fastmqtt_properties)]:
+        value = getattr(fastmqtt_properties, name)
+        # An empty list (e.g. no user properties) is not encoded either
+        if value is not None and value != []:
+            # Through paho's __setattr__, which validates the value
+            setattr(paho_properties, paho_name, value)
 
     return paho_properties
@@ -1,16 +1,35 @@
 import asyncio
 import uuid
 from abc import ABC, abstractmethod
-from typing import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
 
 from fastmqtt.properties import (
+    ConnackProperties,
     ConnectProperties,
     PublishProperties,
     SubscribeProperties,
     UnsubscribeProperties,
 )
+from fastmqtt.supervisor import TaskSupervisor
 from fastmqtt.types import CleanStart, PayloadType, RawMessage, SubscribeOptions
 
+if TYPE_CHECKING:
+    from fastmqtt.admission import AdmissionController
+
+
+@dataclass
+class ConnectionStats:
+    endpoint: tuple[str, int] | None = None
+    connections: int = 0
+    # Connections established to another endpoint than the previous one
+    failovers: int = 0
+    standby_takeovers: int = 0
+    # Seconds without a connection, between losing one and establishing the next
+    last_offline: float | None = None
+    total_offline: float = 0.0
+    max_offline: float = 0.0
+
 
 class BaseConnector(ABC):
     def __init__(
@@ -24,6 +43,7 @@ class BaseConnector(ABC):
         keepalive: int = 60,
         properties: ConnectProperties | None = None,
         clean_start: CleanStart = CleanStart.FIRST_ONLY,
+        manual_ack: bool = False,
     ):
         if client_id is None:
             client_id = f"fastmqtt-{uuid.uuid4()}"
@@ -37,14 +57,28 @@ class BaseConnector(ABC):
         self._keepalive = keepalive
         self._properties = properties
         self._clean_start = clean_start
+        self._manual_ack = manual_ack
 
         self.connected_event = asyncio.Event()
         self.disconnected_event = asyncio.Event()
         self.reconnect_event = asyncio.Event()
+        # Set by FastMQTT, messages are then taken from the client only while its receiving_event
+        # is set, QoS 1/2 messages are acknowledged once taken and QoS 0 ones it does not accept
+        # are dropped
+        self.admission_controller: "AdmissionController | None" = None
 
         self._first_connect = True
+        # Filled from the CONNACK of the current connection
+        self.session_present = False
+        self.connack_properties: ConnackProperties | None = None
+        # Seconds between the last keepalive PINGREQ and its PINGRESP, if the client reports it
+        self.ping_round_trip: float | None = None
+        self.connection_stats = ConnectionStats()
+        # Owns the tasks of the callbacks below and of the dispatched messages
+        self.supervisor = TaskSupervisor()
 
         self._connect_callbacks: list[Callable[[], Awaitable[None]]] = []
+        self._reconnect_callbacks: list[Callable[[], Awaitable[None]]] = []
         self._disconnect_callbacks: list[Callable[[], Awaitable[None]]] = []
         self._message_callbacks: list[Callable[[RawMessage], Awaitable[None]]] = []
 
@@ -92,6 +126,31 @@ class BaseConnector(ABC):
     ) -> None:
         raise NotImplementedError
 
+    def prepare_properties(self, properties: PublishProperties) -> Any:
+        """Properties converted once to the client's own type, for ``publish_prepared``."""
+        return properties
+
+    async def publish_prepared(
+        self,
+        topic: str,
+        payload: PayloadType,
+        qos: int,
+        retain: bool,
+        properties: Any,
+    ) -> None:
+        """Publish with properties returned by ``prepare_properties``."""
+        await self.publish(
+            topic=topic, payload=payload, qos=qos, retain=retain, properties=properties
+        )
+
+    def ack(self, message: RawMessage) -> None:
+        """Acknowledge a QoS 1/2 message, only used with ``manual_ack``."""
+        raise NotImplementedError
+
+    async def reconnect(self) -> None:
+        """Drop the current connection, it is established again like after a network error."""
+        raise NotImplementedError
+
     @abstractmethod
     async def connect(self) -> None:
         raise NotImplementedError
@@ -110,6 +169,11 @@ class BaseConnector(ABC):
     def add_connect_callback(self, callback: Callable[[], Awaitable[None]]) -> None:
         self._connect_callbacks.append(callback)
 
+    def add_reconnect_callback(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Called on every connection except the first one, check ``session_present``
+        to see whether the broker kept the session."""
+        self._reconnect_callbacks.append(callback)
+
     def add_disconnect_callback(self, callback: Callable[[], Awaitable[None]]) -> None:
         self._disconnect_callbacks.append(callback)
 
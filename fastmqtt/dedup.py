@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import logging
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+from .types import RawMessage
+
+log = logging.getLogger(__name__)
+
+KeyFunction = Callable[[RawMessage], str | bytes | None]
+
+# key, expiry
+_ENTRY = struct.Struct("<Qd")
+
+
+def user_property_key(name: str = "message-id") -> KeyFunction:
+    """Messages are identified by the user property ``name``, messages without it are not
+    deduplicated."""
+
+    def key(message: RawMessage) -> str | None:
+        for key, value in message.properties.user_property:
+            if key == name:
+                return value
+        return None
+
+    return key
+
+
+def payload_key(message: RawMessage) -> bytes:
+    """Messages are identified by their topic and payload. Opt-in, two distinct messages with
+    the same payload (e.g. a repeated reading) are duplicates then."""
+    return message.topic.encode() + b"\0" + message.payload
+
+
+# Messages without a message-id user property are not deduplicated
+default_key = user_property_key("message-id")
+
+
+@dataclass
+class DeduplicationStats:
+    hits: int = 0
+    misses: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class Deduplicator:
+    """Drops messages seen in the last ``ttl`` seconds, pass it to ``FastMQTT(deduplicator=)``.
+
+    A message is recorded once all of its callbacks succeeded, a duplicate arriving while the
+    first copy is being handled waits for the outcome. Keys are reduced to 64-bit digests and
+    at most ``maxsize`` of them are kept, the oldest are evicted first. With ``path`` the keys
+    are appended to a file every ``flush_interval`` seconds, in a thread, and loaded again on
+    restart. Duplicates are still acknowledged so the broker stops redelivering them.
+    """
+
+    def __init__(
+        self,
+        key: KeyFunction = default_key,
+        ttl: float = 300.0,
+        maxsize: int = 100_000,
+        path: str | Path | None = None,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self._key = key
+        self._ttl = ttl
+        self._maxsize = maxsize
+        # Insertion order is expiry order, the ttl is the same for every key. An OrderedDict
+        # because a dict slows down to a scan when its oldest keys are removed one by one
+        self._expiry: OrderedDict[int, float] = OrderedDict()
+        # Keys being handled, resolved with whether they were handled successfully
+        self._handling: dict[int, asyncio.Future[bool]] = {}
+        self._path = Path(path) if path is not None else None
+        self._flush_interval = flush_interval
+        self._file: BinaryIO | None = None
+        self._compacted = False
+        self._persisted = 0
+        self._buffer: list[bytes] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._writing: asyncio.Future | None = None
+        self.hits = 0
+        self.misses = 0
+
+        if self._path is not None:
+            self._load(self._path)
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def stats(self) -> DeduplicationStats:
+        return DeduplicationStats(self.hits, self.misses, len(self._expiry))
+
+    def key(self, message: RawMessage) -> int | None:
+        key = self._key(message)
+        if key is None:
+            return None
+        if isinstance(key, str):
+            key = key.encode()
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+    async def acquire(self, key: int) -> bool:
+        """Whether the message with ``key`` should be handled, ``release`` it afterwards.
+        False for a duplicate of a handled message, waits while another copy is handled."""
+        while True:
+            expiry = self._expiry.get(key)
+            if expiry is not None and expiry > time.time():
+                self.hits += 1
+                return False
+
+            handling = self._handling.get(key)
+            if handling is None:
+                break
+            await asyncio.shield(handling)
+
+        self.misses += 1
+        self._handling[key] = asyncio.get_running_loop().create_future()
+        return True
+
+    def release(self, key: int, handled: bool) -> None:
+        """Record ``key`` if its message was ``handled``, forget it otherwise so a redelivery
+        is handled again."""
+        handling = self._handling.pop(key, None)
+        if handling is not None:
+            handling.set_result(handled)
+        if not handled:
+            return
+
+        now = time.time()
+        self._evict(now)
+        self._expiry.pop(key, None)
+        expiry = self._expiry[key] = now + self._ttl
+        if self._path is not None:
+            self._buffer.append(_ENTRY.pack(key, expiry))
+            self._schedule_flush()
+
+    def clear(self) -> None:
+        self._expiry.clear()
+        self._buffer.clear()
+        if self._path is not None:
+            self._compacted = False
+            self._schedule_flush()
+
+    async def close(self) -> None:
+        """Write the buffered keys and close the file."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._writing is not None:
+            await asyncio.wait([self._writing])
+        if self._path is not None and (self._buffer or not self._compacted):
+            self._flush()
+            await asyncio.wait([self._writing])  # type: ignore[list-item]
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _evict(self, now: float) -> None:
+        expiry = self._expiry
+        while expiry:
+            key = next(iter(expiry))
+            if expiry[key] > now and len(expiry) < self._maxsize:
+                break
+            expiry.popitem(last=False)
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is None and self._writing is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self._flush_interval, self._flush
+            )
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        # Rewrite the file with the live keys only once it holds too many dead ones, it grows
+        # with every message otherwise. The first flush also drops the expired keys loaded
+        compact = not self._compacted or self._persisted > 2 * max(len(self._expiry), 1024)
+        if compact:
+            data = b"".join(_ENTRY.pack(key, expiry) for key, expiry in self._expiry.items())
+            self._compacted = True
+            self._persisted = len(self._expiry)
+        else:
+            data = b"".join(self._buffer)
+            self._persisted += len(self._buffer)
+        self._buffer.clear()
+
+        # One write at a time, the next flush is scheduled once it is done
+        self._writing = asyncio.get_running_loop().run_in_executor(
+            None, self._write, self._path, data, compact
+        )
+        self._writing.add_done_callback(self._written)
+
+    def _written(self, future: asyncio.Future) -> None:
+        self._writing = None
+        if not future.cancelled() and (exception := future.exception()) is not None:
+            log.error(f"Failed to write deduplication keys: {exception!r}")
+            # Written again in full with the next flush
+            self._compacted = False
+        if self._buffer:
+            self._schedule_flush()
+
+    def _write(self, path: Path, data: bytes, compact: bool) -> None:
+        # Runs in a thread
+        if not compact:
+            self._file.write(data)  # type: ignore[union-attr]
+            return
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(path.suffix + ".tmp")
+        temporary.write_bytes(data)
+        temporary.replace(path)
+        self._file = path.open("ab", buffering=0)
+
+    def _load(self, path: Path) -> None:
+        if not path.exists():
+            return
+
+        now = time.time()
+        data = path.read_bytes()
+        entries = sorted(
+            (expiry, key)
+            for key, expiry in _ENTRY.iter_unpack(data[: len(data) - len(data) % _ENTRY.size])
+            if expiry > now
+        )
+        for expiry, key in entries[-self._maxsize :]:
+            self._expiry.pop(key, None)
+            self._expiry[key] = expiry
+        log.debug(f"Loaded {len(self._expiry)} deduplication keys from {path}")
@@ -0,0 +1,285 @@
+import asyncio
+import inspect
+import typing
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Literal
+
+from .exceptions import FastMQTTError
+from .properties import PublishProperties
+from .singleflight import coalesce
+from .topic import TopicTemplate, split_topic
+from .types import Message, Payload
+
+if TYPE_CHECKING:
+    from .fastmqtt import FastMQTT
+
+# Returns the value of a parameter for a message, or an awaitable of it
+Resolver = Callable[[Message], Any]
+
+
+class Depends:
+    """A parameter resolved by calling ``dependency``, whose own parameters are injected too.
+
+    With ``use_cache`` the result is shared by all callbacks of a message (``scope="message"``)
+    or computed once for the application (``scope="app"``).
+    """
+
+    def __init__(
+        self,
+        dependency: Callable[..., Any],
+        use_cache: bool = True,
+        scope: Literal["message", "app"] = "message",
+    ) -> None:
+        self.dependency = dependency
+        self.use_cache = use_cache
+        self.scope = scope
+
+
+class TopicLevel:
+    """A level of the topic (``sensors/+/temperature`` -> ``TopicLevel(1)``), converted to
+    the type of the parameter."""
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+
+
+class State:
+    """A value of the application state (``fastmqtt[key]``), the parameter name by default."""
+
+    def __init__(self, key: str | None = None) -> None:
+        self.key = key
+
+
+def _resolve_message(message: Message) -> Message:
+    return message
+
+
+def _resolve_payload(message: Message) -> Payload:
+    return message.payload
+
+
+def _resolve_decoded(message: Message) -> Any:
+    # Decoded once for the handlers of the message taking the payload as a parameter, the
+    # handlers calling Payload.decode() get their own copy
+    cache = message.dependency_cache
+    if _resolve_decoded not in cache:
+        cache[_resolve_decoded] = message.payload.decode()
+    return cache[_resolve_decoded]
+
+
+def _resolve_raw(message: Message) -> bytes:
+    return message.payload.raw()
+
+
+def _resolve_text(message: Message) -> str:
+    return message.payload.raw().decode()
+
+
+def _resolve_topic(message: Message) -> str:
+    return message.topic
+
+
+def _resolve_properties(message: Message) -> PublishProperties:
+    return message.properties
+
+
+def _resolve_client(message: Message) -> "FastMQTT":
+    return message.client
+
+
+_BY_NAME: dict[str, Resolver] = {
+    "message": _resolve_message,
+    "payload": _resolve_decoded,
+    "topic": _resolve_topic,
+    "properties": _resolve_properties,
+    "client": _resolve_client,
+}
+_PAYLOAD_BY_TYPE: dict[Any, Resolver] = {bytes: _resolve_raw, str: _resolve_text}
+
+
+def _topic_level_resolver(index: int, annotation: Any) -> Resolver:
+    if annotation in (inspect.Parameter.empty, str, Any):
+        return lambda message: split_topic(message.topic)[index]
+    return lambda message: annotation(split_topic(message.topic)[index])
+
+
+def _template_resolver(template: TopicTemplate, name: str, annotation: Any) -> Resolver:
+    extract = template.extract
+    if annotation in (inspect.Parameter.empty, str, Any):
+        return lambda message: extract(message.topic)[name]
+
+    # Converted values are cached by topic too, int("42") costs as much as the lookup
+    convert = lru_cache(maxsize=template.cache_size)(
+        lambda topic: annotation(extract(topic)[name])
+    )
+    return lambda message: convert(message.topic)
+
+
+def _state_resolver(key: str) -> Resolver:
+    return lambda message: message.client[key]
+
+
+def _dependency_resolver(depends: Depends, template: TopicTemplate | None) -> Resolver:
+    dependency = depends.dependency
+    solve = _compile_call(dependency, template)
+
+    async def resolve_uncached(message: Message) -> Any:
+        value = solve(message)
+        return await value if inspect.isawaitable(value) else value
+
+    if not depends.use_cache:
+        return resolve_uncached
+
+    async def resolve(message: Message) -> Any:
+        cache: dict[Any, asyncio.Future] = (
+            message.client.dependency_cache if depends.scope == "app" else message.dependency_cache
+        )
+        # Stored before awaiting, so concurrent callbacks wait for the same call
+        return await coalesce(cache, dependency, partial(resolve_uncached, message), keep=True)
+
+    return resolve
+
+
+def _get_marker(parameter: inspect.Parameter, annotation: Any) -> Any:
+    if isinstance(parameter.default, (Depends, TopicLevel, State)):
+        return parameter.default
+
+    for metadata in getattr(annotation, "__metadata__", ()):
+        if isinstance(metadata, (Depends, TopicLevel, State)):
+            return metadata
+    return None
+
+
+def _marker_resolver(
+    marker: Any, parameter: inspect.Parameter, annotation: Any, template: TopicTemplate | None
+) -> Resolver | None:
+    if isinstance(marker, Depends):
+        return _dependency_resolver(marker, template)
+    if isinstance(marker, TopicLevel):
+        return _topic_level_resolver(marker.index, annotation)
+    if isinstance(marker, State):
+        return _state_resolver(marker.key or parameter.name)
+    return None
+
+
+def _type_resolver(annotation: Any) -> Resolver | None:
+    if not isinstance(annotation, type):
+        return None
+    if issubclass(annotation, Message):
+        return _resolve_message
+    if issubclass(annotation, Payload):
+        return _resolve_payload
+    if issubclass(annotation, PublishProperties):
+        return _resolve_properties
+    return None
+
+
+def _parameter_resolver(
+    parameter: inspect.Parameter, annotation: Any, template: TopicTemplate | None
+) -> Resolver:
+    marker = _get_marker(parameter, annotation)
+    if typing.get_origin(annotation) is typing.Annotated:
+        annotation = typing.get_args(annotation)[0]
+
+    resolver = _marker_resolver(marker, parameter, annotation, template)
+    if resolver is not None:
+        return resolver
+
+    if template is not None and parameter.name in template.parameters:
+        return _template_resolver(template, parameter.name, annotation)
+
+    resolver = _type_resolver(annotation)
+    if resolver is not None:
+        return resolver
+
+    if parameter.name == "payload":
+        return _PAYLOAD_BY_TYPE.get(annotation, _resolve_decoded)
+
+    resolver = _BY_NAME.get(parameter.name)
+    if resolver is not None:
+        return resolver
+
+    if parameter.default is not inspect.Parameter.empty:
+        default = parameter.default
+        return lambda message: default
+
+    if annotation is inspect.Parameter.empty:
+        return _resolve_message
+
+    raise FastMQTTError(f"Can not resolve parameter {parameter.name!r} of a callback")
+
+
+def _signature_resolvers(
+    func: Callable[..., Any], template: TopicTemplate | None
+) -> tuple[list[Resolver], dict[str, Resolver]] | None:
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        return None
+
+    try:
+        hints = typing.get_type_hints(func, include_extras=True)
+    except Exception:
+        hints = {}
+
+    positional: list[Resolver] = []
+    keyword: dict[str, Resolver] = {}
+    for parameter in signature.parameters.values():
+        if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+
+        resolver = _parameter_resolver(
+            parameter, hints.get(parameter.name, parameter.annotation), template
+        )
+        if parameter.kind == parameter.KEYWORD_ONLY:
+            keyword[parameter.name] = resolver
+        else:
+            positional.append(resolver)
+
+    return positional, keyword
+
+
+def _compile_call(
+    func: Callable[..., Any], template: TopicTemplate | None = None
+) -> Callable[[Message], Any]:
+    resolvers = _signature_resolvers(func, template)
+    if resolvers is None:
+        return func
+
+    positional, keyword = resolvers
+    if not keyword and positional == [_resolve_message]:
+        return func
+
+    if not any(map(inspect.iscoroutinefunction, [*positional, *keyword.values()])):
+
+        def call(message: Message) -> Any:
+            return func(
+                *[resolver(message) for resolver in positional],
+                **{name: resolver(message) for name, resolver in keyword.items()},
+            )
+
+        return call
+
+    async def call_async(message: Message) -> Any:
+        args = []
+        for resolver in positional:
+            value = resolver(message)
+            args.append(await value if inspect.isawaitable(value) else value)
+
+        kwargs = {}
+        for name, resolver in keyword.items():
+            value = resolver(message)
+            kwargs[name] = await value if inspect.isawaitable(value) else value
+
+        result = func(*args, **kwargs)
+        return await result if inspect.isawaitable(result) else result
+
+    return call_async
+
+
+def compile_callback(
+    callback: Callable[..., Awaitable[Any]], template: TopicTemplate | None = None
+) -> Callable[[Message], Any]:
+    """Inspect the signature of ``callback`` once and return a function that calls it
+    with its parameters resolved from a message, and from the topic with a ``template``."""
+    return _compile_call(callback, template)
@@ -1,10 +1,17 @@
+import importlib
 import json
+from types import ModuleType
 from typing import Any, cast
 
-import cbor2
-import msgpack
-import orjson
-import ormsgpack
+
+def _import_codec(module: str, extra: str) -> ModuleType:
+    # Codecs are optional dependencies, imported on first use instead of with fastmqtt
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        raise ImportError(
+            f"{module} is required for this codec, install it with `pip install fastmqtt[{extra}]`"
+        ) from e
 
 
 class BaseEncoder:
@@ -56,40 +63,97 @@ class JsonDecoder(BaseDecoder):
 
 
 class CborEncoder(BaseEncoder):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._dumps = _import_codec("cbor2", "cbor").dumps
+
     def __call__(self, payload: Any) -> bytes:
-        return cbor2.dumps(payload, *self.args, **self.kwargs)
+        return self._dumps(payload, *self.args, **self.kwargs)
 
 
 class CborDecoder(BaseDecoder):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._loads = _import_codec("cbor2", "cbor").loads
+
     def __call__(self, payload: bytes) -> Any:
-        return cbor2.loads(payload, *self.args, **self.kwargs)
+        return self._loads(payload, *self.args, **self.kwargs)
 
 
 class MsgPackEncoder(BaseEncoder):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._packb = _import_codec("msgpack", "msgpack").packb
+
     def __call__(self, payload: Any) -> bytes:
-        return cast(bytes, msgpack.packb(payload, *self.args, **self.kwargs))
+        return cast(bytes, self._packb(payload, *self.args, **self.kwargs))
 
 
 class MsgPackDecoder(BaseDecoder):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._unpackb = _import_codec("msgpack", "msgpack").unpackb
+
     def __call__(self, payload: bytes) -> Any:
-        return msgpack.unpackb(payload, *self.args, **self.kwargs)
+        return self._unpackb(payload, *self.args, **self.kwargs)
 
 
 class OrJsonEncoder(BaseEncoder):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._dumps = _import_codec("orjson", "orjson").dumps
+
     def __call__(self, payload: Any) -> bytes:
-        return orjson.dumps(payload, *self.args, **self.kwargs)
+        return self._dumps(payload, *self.args, **self.kwargs)
 
 
 class OrJsonDecoder(BaseDecoder):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._loads = _import_codec("orjson", "orjson").loads
+
     def __call__(self, payload: bytes) -> Any:
-        return orjson.loads(payload, *self.args, **self.kwargs)
+        return self._loads(payload, *self.args, **self.kwargs)
 
 
 class OrMsgPackEncoder(BaseEncoder):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._packb = _import_codec("ormsgpack", "ormsgpack").packb
+
     def __call__(self, payload: Any) -> bytes:
-        return ormsgpack.packb(payload, *self.args, **self.kwargs)
+        return self._packb(payload, *self.args, **self.kwargs)
 
 
 class OrMsgPackDecoder(BaseDecoder):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._unpackb = _import_codec("ormsgpack", "ormsgpack").unpackb
+
     def __call__(self, payload: bytes) -> Any:
-        return ormsgpack.unpackb(payload, *self.args, **self.kwargs)
+        return self._unpackb(payload, *self.args, **self.kwargs)
+
+
+CODECS: dict[str, tuple[type[BaseEncoder], type[BaseDecoder]]] = {
+    "none": (NoneEncoder, NoneDecoder),
+    "str": (StrEncoder, StrDecoder),
+    "json": (JsonEncoder, JsonDecoder),
+    "cbor": (CborEncoder, CborDecoder),
+    "msgpack": (MsgPackEncoder, MsgPackDecoder),
+    "orjson": (OrJsonEncoder, OrJsonDecoder),
+    "ormsgpack": (OrMsgPackEncoder, OrMsgPackDecoder),
+}
+
+
+def get_encoder(name: str, *args, **kwargs) -> BaseEncoder:
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name}")
+
+    return CODECS[name][0](*args, **kwargs)
+
+
+def get_decoder(name: str, *args, **kwargs) -> BaseDecoder:
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name}")
+
+    return CODECS[name][1](*args, **kwargs)
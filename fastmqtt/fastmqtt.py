@@ -1,17 +1,57 @@
-from typing import Any, Callable, Sequence, Type
+import asyncio
+import dataclasses
+from typing import Any, Awaitable, Callable, Sequence, Type
 
-from .connectors import AiomqttConnector, BaseConnector
-from .encoders import BaseDecoder, BaseEncoder, NoneDecoder, NoneEncoder
+from .admission import AdmissionController, ShedPolicy
+from .chunked import ChunkSource, publish_chunked
+from .connectors import BaseConnector, ConnectionStats, get_connector
+from .dedup import Deduplicator
+from .encoders import (
+    BaseDecoder,
+    BaseEncoder,
+    NoneDecoder,
+    NoneEncoder,
+    get_decoder,
+    get_encoder,
+)
+from .exceptions import FastMQTTError
+from .flow_control import FlowController
+from .handler import Handler
+from .health import HealthMonitor
 from .message_handler import MessageHandler
+from .prepared import PreparedPublisher
+from .profiler import SlowCallbackProfiler
 from .properties import ConnectProperties, PublishProperties
 from .response import ResponseContext
-from .router import MQTTRouter
+from .router import MQTTRouter, merge_subscribe_options
+from .scheduler import PriorityScheduler
+from .singleflight import SingleFlight
 from .subscription_manager import CallbackType, SubscriptionManager
-from .types import RetainHandling, SubscribeOptions, SubscriptionWithId
+from .supervisor import DrainReport, TaskSupervisor
+from .topic import parse_template
+from .tracing import SpanKind, Tracer
+from .types import (
+    Middleware,
+    OutgoingMessage,
+    PayloadType,
+    PublishCallbackType,
+    PublishMiddleware,
+    RawMessage,
+    RetainHandling,
+    SubscribeOptions,
+    Subscription,
+    SubscriptionWithId,
+)
 
 WebSocketHeaders = dict[str, str] | Callable[[dict[str, str]], dict[str, str]]
 
 
+def _bind_publish(
+    middleware: PublishMiddleware, call_next: PublishCallbackType
+) -> PublishCallbackType:
+    return lambda message: middleware(message, call_next)
+
+
 class FastMQTT(MQTTRouter):
     def __init__(
         self,
@@ -23,15 +63,49 @@ class FastMQTT(MQTTRouter):
         will=None,
         keepalive=60,
         properties: ConnectProperties | None = None,
-        connector_type: Type[BaseConnector] = AiomqttConnector,
+        connector_type: Type[BaseConnector] | str = "aiomqtt",
         routers: Sequence[MQTTRouter] | None = None,
         default_subscribe_options: SubscribeOptions | None = None,
-        payload_encoder: BaseEncoder = NoneEncoder(),
-        payload_decoder: BaseDecoder = NoneDecoder(),
+        payload_encoder: BaseEncoder | str = NoneEncoder(),
+        payload_decoder: BaseDecoder | str = NoneDecoder(),
+        subscription_batch_window: float = 0.0,
+        flow_controller: FlowController | None = None,
+        manual_ack: bool = False,
+        handler_timeout: float | None = None,
+        profiler: SlowCallbackProfiler | None = None,
+        tracer: Tracer | None = None,
+        scheduler: PriorityScheduler | None = None,
+        deduplicator: Deduplicator | None = None,
+        admission_controller: AdmissionController | None = None,
+        health_monitor: HealthMonitor | None = None,
+        failover_brokers: Sequence[tuple[str, int]] | None = None,
+        standby: bool = False,
+        drain_timeout: float | None = None,
     ):
         super().__init__(default_subscribe_options=default_subscribe_options)
+        if isinstance(payload_encoder, str):
+            payload_encoder = get_encoder(payload_encoder)
+        if isinstance(payload_decoder, str):
+            payload_decoder = get_decoder(payload_decoder)
+        if isinstance(connector_type, str):
+            connector_type = get_connector(connector_type)
+
         self._payload_encoder = payload_encoder
         self._payload_decoder = payload_decoder
+        if admission_controller is not None and (
+            properties is None or properties.receive_maximum is None
+        ):
+            # Bounds the unacknowledged messages the broker sends while reception is paused
+            properties = dataclasses.replace(
+                properties or ConnectProperties(),
+                receive_maximum=admission_controller.receive_maximum,
+            )
+
+        connector_options: dict[str, Any] = {}
+        if failover_brokers:
+            connector_options["failover_brokers"] = failover_brokers
+        if standby:
+            connector_options["standby"] = standby
 
         self._connector = connector_type(
             hostname=hostname,
@@ -42,14 +116,42 @@ class FastMQTT(MQTTRouter):
             will=will,
             keepalive=keepalive,
             properties=properties,
+            manual_ack=manual_ack,
+            **connector_options,
+        )
+        self._subscription_manager = SubscriptionManager(
+            self._connector, batch_window=subscription_batch_window
         )
-        self._subscription_manager = SubscriptionManager(self._connector)
         self._message_handler = MessageHandler(
-            self, self._connector, self._subscription_manager, self._payload_decoder
+            self,
+            self._connector,
+            self._subscription_manager,
+            self._payload_decoder,
+            manual_ack=manual_ack,
+            handler_timeout=handler_timeout,
+            profiler=profiler,
+            tracer=tracer,
+            scheduler=scheduler,
+            deduplicator=deduplicator,
+            admission_controller=admission_controller,
         )
+        self._profiler = profiler
+        self._tracer = tracer
+        self._scheduler = scheduler
+        self._deduplicator = deduplicator
+        self._admission_controller = admission_controller
+        self._health_monitor = health_monitor
+        self._drain_timeout = drain_timeout
+        self._flow_controller = flow_controller or FlowController()
         self._state: dict[str, Any] = {}
+        self._publish_middlewares: list[PublishMiddleware] = []
+        self._publish_chain: PublishCallbackType | None = None
+        self._subscribed = False
+        # Results of dependencies with scope="app", see fastmqtt.dependencies.Depends
+        self.dependency_cache: dict[Any, Any] = {}
 
-        # self._connector.add_connect_callback(self.subscribe_all)
+        self._connector.add_connect_callback(self._configure_flow_control)
+        self._connector.add_reconnect_callback(self._restore_subscriptions)
         self._routers = routers or []
         for router in self._routers:
             self.include_router(router)
@@ -58,6 +160,59 @@ class FastMQTT(MQTTRouter):
     def client_id(self) -> str:
         return self._connector._client_id
 
+    @property
+    def flow_controller(self) -> FlowController:
+        return self._flow_controller
+
+    @property
+    def profiler(self) -> SlowCallbackProfiler | None:
+        return self._profiler
+
+    @property
+    def tracer(self) -> Tracer | None:
+        return self._tracer
+
+    @property
+    def scheduler(self) -> PriorityScheduler | None:
+        return self._scheduler
+
+    @property
+    def payload_encoder(self) -> BaseEncoder:
+        return self._payload_encoder
+
+    @property
+    def connector(self) -> BaseConnector:
+        return self._connector
+
+    @property
+    def publish_middlewares(self) -> list[PublishMiddleware]:
+        return self._publish_middlewares
+
+    @property
+    def deduplicator(self) -> Deduplicator | None:
+        return self._deduplicator
+
+    @property
+    def admission_controller(self) -> AdmissionController | None:
+        return self._admission_controller
+
+    @property
+    def health_monitor(self) -> HealthMonitor | None:
+        return self._health_monitor
+
+    @property
+    def supervisor(self) -> TaskSupervisor:
+        return self._connector.supervisor
+
+    @property
+    def connection_stats(self) -> ConnectionStats:
+        return self._connector.connection_stats
+
+    @property
+    def maximum_packet_size(self) -> int | None:
+        connack_properties = self._connector.connack_properties
+        return connack_properties and connack_properties.maximum_packet_size
+
     @property
     def is_started(self) -> bool:
         return not self._connector._first_connect
@@ -79,11 +234,33 @@ class FastMQTT(MQTTRouter):
         return self._state.get(key, default)
 
     async def connect(self) -> None:
+        if self._profiler is not None:
+            self._profiler.start()
+        self._message_handler.resume_intake()
         await self._connector.connect()
         await self.subscribe_all()
+        if self._health_monitor is not None:
+            await self._health_monitor.start(self)
+
+    async def disconnect(self, drain_timeout: float | None = None) -> DrainReport | None:
+        """With ``drain_timeout`` (or the one given to the constructor) new messages are no
+        longer handled, the running callbacks and the publishes waiting for an acknowledgement
+        get that many seconds to finish, then the ones left are cancelled and reported."""
+        if drain_timeout is None:
+            drain_timeout = self._drain_timeout
 
-    async def disconnect(self) -> None:
+        if self._health_monitor is not None:
+            await self._health_monitor.stop()
+        report = None
+        if drain_timeout is not None:
+            self._message_handler.stop_intake()
+            report = await self._connector.supervisor.drain(drain_timeout)
         await self._connector.disconnect()
+        if self._profiler is not None:
+            self._profiler.stop()
+        if self._deduplicator is not None:
+            await self._deduplicator.close()
+        return report
 
     async def __aenter__(self):
         await self.connect()
@@ -100,32 +277,99 @@ class FastMQTT(MQTTRouter):
         no_local: bool | None = None,
         retain_as_published: bool | None = None,
         retain_handling: RetainHandling | None = None,
+        timeout: float | None = None,
+        priority: int | None = None,
+        single_flight: SingleFlight | bool = False,
+        shed_policy: ShedPolicy | str | None = None,
     ) -> SubscriptionWithId:
-        subscription = self._register(
+        subscription = self._new_subscription(
             callback=callback,
             topic=topic,
             qos=qos,
             no_local=no_local,
             retain_as_published=retain_as_published,
             retain_handling=retain_handling,
+            timeout=timeout,
+            priority=priority,
+            single_flight=single_flight,
+            shed_policy=shed_policy,
         )
-        if len(subscription.callbacks) == 1:
-            # Only subscribe if it's the first callback
-            await self._connector.connected_event.wait()
-            return await self._subscription_manager.subscribe(subscription)
-
-        # TODO: Refactor it
-        return next(
-            (
-                sub
-                for sub in self._subscription_manager._id_to_subscription.values()
-                if sub.topic == topic and sub.callbacks == subscription.callbacks
-            ),
-        )
+        self._compile_handlers(subscription)
+
+        existing = self._subscription_manager.get_subscription_by_topic(subscription.topic)
+        if existing is not None:
+            merge_subscribe_options(existing.options, subscription.options)
+            existing.callbacks.extend(subscription.callbacks)
+            self._subscription_manager.index_callback(existing, callback)
+            return existing
+
+        await self._connector.connected_event.wait()
+        return await self._subscription_manager.subscribe(subscription)
 
     async def subscribe_all(self) -> list[SubscriptionWithId]:
+        for subscription in self._subscriptions.values():
+            self._compile_handlers(subscription)
+
         self._subscribed = True
-        return await self._subscription_manager.subscribe_multiple(self._subscriptions)
+        return await self._subscription_manager.subscribe_multiple(
+            list(self._subscriptions.values())
+        )
+
+    def _compile_handlers(self, subscription: Subscription) -> None:
+        for callback in subscription.callbacks:
+            if isinstance(callback, Handler):
+                callback.compile()
+
+    def add_middleware(self, middleware: Middleware) -> None:
+        super().add_middleware(middleware)
+        if self._subscribed:
+            for subscription in self._subscriptions.values():
+                self._compile_handlers(subscription)
+
+    def add_publish_middleware(self, middleware: PublishMiddleware) -> None:
+        """Wrap every publish: ``async def middleware(message: OutgoingMessage, call_next)``."""
+        self._publish_middlewares.append(middleware)
+
+        call_next: PublishCallbackType = self._publish_outgoing
+        for publish_middleware in reversed(self._publish_middlewares):
+            call_next = _bind_publish(publish_middleware, call_next)
+        self._publish_chain = call_next
+
+    def subscribe_offline(self) -> list[SubscriptionWithId]:
+        """Give the registered subscriptions identifiers without subscribing on the broker,
+        to dispatch messages into an application that is not connected."""
+        for subscription in self._subscriptions.values():
+            self._compile_handlers(subscription)
+
+        return [
+            self._subscription_manager.add_local(subscription)
+            for subscription in self._subscriptions.values()
+        ]
+
+    def match_subscriptions(self, topic: str) -> list[SubscriptionWithId]:
+        return self._subscription_manager.match(topic)
+
+    def add_message_callback(self, callback: Callable[[RawMessage], Awaitable[None]]) -> None:
+        """Called with every message received from the broker, before dispatch."""
+        self._connector.add_message_callback(callback)
+
+    async def dispatch(self, message: RawMessage, wait: bool = False) -> None:
+        """Run the callbacks for a message as if it was received from the broker, with
+        ``wait`` until they have finished."""
+        await self._message_handler.on_message(message, wait=wait)
+
+    async def _configure_flow_control(self) -> None:
+        connack_properties = self._connector.connack_properties
+        self._flow_controller.configure(
+            connack_properties and connack_properties.receive_maximum,
+        )
+
+    async def _restore_subscriptions(self) -> None:
+        # The broker kept our subscriptions, nothing to do
+        if self._connector.session_present:
+            return
+
+        await self._subscription_manager.resubscribe()
 
     async def unsubscribe(
         self,
@@ -134,9 +378,16 @@ class FastMQTT(MQTTRouter):
         subscription: SubscriptionWithId | None = None,
         callback: CallbackType | None = None,
     ) -> None:
-        await self._subscription_manager.unsubscribe(
+        if topic is not None and (template := parse_template(topic)) is not None:
+            topic = template.filter
+
+        removed = await self._subscription_manager.unsubscribe(
             identifier=identifier, topic=topic, subscription=subscription, callback=callback
         )
+        for sub in removed:
+            registered = self._subscriptions.get(sub.topic)
+            if registered is not None and registered.callbacks is sub.callbacks:
+                del self._subscriptions[sub.topic]
 
     async def publish(
         self,
@@ -146,14 +397,137 @@ class FastMQTT(MQTTRouter):
         retain: bool = False,
         properties: PublishProperties | None = None,
     ) -> None:
-        await self._connector.publish(
-            topic=topic,
-            payload=self._payload_encoder(payload),
-            qos=qos,
-            retain=retain,
-            properties=properties,
+        if self._publish_chain is not None:
+            await self._publish_chain(OutgoingMessage(topic, payload, qos, retain, properties))
+            return
+
+        await self._trace_publish(topic, payload, qos, retain, properties)
+
+    async def _publish_outgoing(self, message: OutgoingMessage) -> None:
+        await self._trace_publish(
+            message.topic, message.payload, message.qos, message.retain, message.properties
         )
 
+    async def _trace_publish(
+        self,
+        topic: str,
+        payload: Any,
+        qos: int,
+        retain: bool,
+        properties: PublishProperties | None,
+    ) -> None:
+        if self._tracer is None:
+            await self._publish(topic, payload, qos, retain, properties)
+            return
+
+        with self._tracer.start_span(
+            f"{topic} publish",
+            kind=SpanKind.PRODUCER,
+            attributes={"messaging.destination.name": topic, "messaging.mqtt.qos": qos},
+        ):
+            properties = self._tracer.inject(properties)
+            await self._publish(topic, payload, qos, retain, properties)
+
+    async def _publish(
+        self,
+        topic: str,
+        payload: Any,
+        qos: int,
+        retain: bool,
+        properties: PublishProperties | None,
+    ) -> None:
+        await self._publish_encoded(topic, self._payload_encoder(payload), qos, retain, properties)
+
+    async def _publish_encoded(
+        self,
+        topic: str,
+        encoded_payload: PayloadType,
+        qos: int,
+        retain: bool,
+        properties: Any,
+        prepared: bool = False,
+    ) -> None:
+        self._check_packet_size(topic, encoded_payload)
+        # Prepared properties were already converted by the connector
+        publish = self._connector.publish_prepared if prepared else self._connector.publish
+
+        if qos == 0:
+            await publish(
+                topic=topic,
+                payload=encoded_payload,
+                qos=qos,
+                retain=retain,
+                properties=properties,
+            )
+            return
+
+        await self._flow_controller.acquire()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        # Held until acknowledged, so disconnect() waits for it. The caller's task is cancelled
+        # by a drain only if the supervisor owns it
+        acknowledged = self._connector.supervisor.hold(f"publish to {topic}")
+        try:
+            await publish(
+                topic=topic,
+                payload=encoded_payload,
+                qos=qos,
+                retain=retain,
+                properties=properties,
+            )
+        except asyncio.CancelledError:
+            self._flow_controller.release()
+            raise
+        except Exception:
+            self._flow_controller.release(failed=True)
+            raise
+        else:
+            self._flow_controller.release(loop.time() - start)
+        finally:
+            if not acknowledged.done():
+                acknowledged.set_result(None)
+
+    def _check_packet_size(self, topic: str, payload: PayloadType) -> None:
+        maximum_packet_size = self.maximum_packet_size
+        if maximum_packet_size is None:
+            return
+
+        size = len(topic.encode())
+        if isinstance(payload, str):
+            size += len(payload.encode())
+        elif isinstance(payload, (bytes, bytearray)):
+            size += len(payload)
+
+        # Topic and payload only, the broker would disconnect us for the whole packet anyway
+        if size > maximum_packet_size:
+            raise FastMQTTError(
+                f"Message on {topic} is larger ({size} bytes) than the broker "
+                f"maximum_packet_size ({maximum_packet_size} bytes)"
+            )
+
+    def prepare(
+        self,
+        topic: str,
+        qos: int = 0,
+        retain: bool = False,
+        properties: PublishProperties | None = None,
+    ) -> PreparedPublisher:
+        """A publisher for a fixed topic and properties, converted once instead of on every
+        publish."""
+        return PreparedPublisher(self, topic, qos, retain, properties)
+
+    async def publish_chunked(
+        self,
+        topic: str,
+        source: ChunkSource,
+        qos: int = 1,
+        properties: PublishProperties | None = None,
+        **kwargs,
+    ) -> str:
+        """Publish ``source`` as a sequence of chunks for a ``ChunkedReceiver``, see
+        ``fastmqtt.chunked.publish_chunked``. Returns the transfer id."""
+        return await publish_chunked(self, topic, source, qos=qos, properties=properties, **kwargs)
+
     def response_context(
         self,
         response_topic: str,
@@ -0,0 +1,177 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# MQTT v5 default when the broker does not send receive_maximum in CONNACK
+DEFAULT_RECEIVE_MAXIMUM = 65535
+# Seconds the lowest latency is kept as the baseline, it is measured again afterwards in case
+# the route to the broker got slower
+BASELINE_TTL = 30.0
+
+
+@dataclass(frozen=True)
+class FlowControlStats:
+    window: int
+    max_window: int
+    in_flight: int
+    queued: int
+    latency: float | None
+    # Lowest latency of the connection and the latency the window is kept below
+    baseline_latency: float | None
+    target_latency: float | None
+    acknowledged: int
+    failed: int
+
+
+class FlowController:
+    """Limits the number of QoS 1/2 publishes waiting for an acknowledgement.
+
+    The window never exceeds the broker's ``receive_maximum``. Within that limit it follows
+    the acknowledgement latency (AIMD): it grows by one after a full window of acknowledgements
+    below the target latency and is halved when the smoothed latency goes above it or a publish
+    fails.
+
+    The target is relative to the round trip of the connection: ``latency_factor`` times the
+    lowest latency measured since connecting (at least ``min_target_latency``), so a distant
+    broker is not mistaken for a congested one. ``target_latency`` sets a fixed target instead.
+    """
+
+    def __init__(
+        self,
+        initial_window: int = 16,
+        min_window: int = 1,
+        max_window: int | None = None,
+        target_latency: float | None = None,
+        latency_factor: float = 2.0,
+        min_target_latency: float = 0.01,
+        smoothing: float = 0.2,
+    ) -> None:
+        self._min_window = min_window
+        self._user_max_window = max_window
+        self._max_window = max_window or DEFAULT_RECEIVE_MAXIMUM
+        self._window = max(min_window, min(initial_window, self._max_window))
+        self._target_latency = target_latency
+        self._latency_factor = latency_factor
+        self._min_target_latency = min_target_latency
+        self._smoothing = smoothing
+
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._latency: float | None = None
+        self._baseline: float | None = None
+        self._baseline_expires = 0.0
+        self._acknowledged = 0
+        self._failed = 0
+        self._acks_until_increase = self._window
+        self._acks_until_decrease = 0
+
+    @property
+    def window(self) -> int:
+        return self._window
+
+    @property
+    def target_latency(self) -> float | None:
+        if self._target_latency is not None:
+            return self._target_latency
+        if self._baseline is None:
+            return None
+        return max(self._min_target_latency, self._baseline * self._latency_factor)
+
+    def configure(self, receive_maximum: int | None) -> None:
+        """Apply the limit negotiated in CONNACK."""
+        # Possibly another broker, its round trip is measured again
+        self._baseline = None
+        self._latency = None
+        receive_maximum = receive_maximum or DEFAULT_RECEIVE_MAXIMUM
+        if self._user_max_window is not None:
+            receive_maximum = min(receive_maximum, self._user_max_window)
+
+        self._max_window = max(self._min_window, receive_maximum)
+        self._window = min(self._window, self._max_window)
+        self._wake_up()
+
+    async def acquire(self) -> None:
+        if self._in_flight < self._window and not self._waiters:
+            self._in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was already handed over to us
+                self._in_flight -= 1
+                self._wake_up()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, latency: float | None = None, failed: bool = False) -> None:
+        """Release a slot, with the acknowledgement latency of the publish if it completed."""
+        self._in_flight -= 1
+        if failed or latency is not None:
+            self._acks_until_decrease -= 1
+
+        if failed:
+            self._failed += 1
+            self._decrease()
+        elif latency is not None:
+            self._acknowledged += 1
+            self._update(latency)
+
+        self._wake_up()
+
+    def stats(self) -> FlowControlStats:
+        return FlowControlStats(
+            window=self._window,
+            max_window=self._max_window,
+            in_flight=self._in_flight,
+            queued=len(self._waiters),
+            latency=self._latency,
+            baseline_latency=self._baseline,
+            target_latency=self.target_latency,
+            acknowledged=self._acknowledged,
+            failed=self._failed,
+        )
+
+    def _update(self, latency: float) -> None:
+        now = time.monotonic()
+        if self._baseline is None or latency <= self._baseline or now > self._baseline_expires:
+            self._baseline = latency
+            self._baseline_expires = now + BASELINE_TTL
+
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += self._smoothing * (latency - self._latency)
+
+        target_latency = self.target_latency
+        if target_latency is not None and self._latency > target_latency:
+            self._decrease()
+            return
+
+        self._acks_until_increase -= 1
+        if self._acks_until_increase <= 0:
+            self._window = min(self._window + 1, self._max_window)
+            self._acks_until_increase = self._window
+
+    def _decrease(self) -> None:
+        # At most once per window, the acknowledgements still in flight were sent
+        # with the old window
+        if self._acks_until_decrease > 0:
+            return
+
+        self._window = max(self._min_window, self._window // 2)
+        self._acks_until_increase = self._window
+        self._acks_until_decrease = self._in_flight + 1
+
+    def _wake_up(self) -> None:
+        while self._waiters and self._in_flight < self._window:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._in_flight += 1
+            waiter.set_result(None)
@@ -0,0 +1,70 @@
+from typing import TYPE_CHECKING, Any
+
+from .admission import ShedPolicy
+from .dependencies import compile_callback
+from .singleflight import SingleFlight
+from .topic import TopicTemplate
+from .types import CallbackType, Message, Middleware
+
+if TYPE_CHECKING:
+    from .router import MQTTRouter
+
+
+def _bind(middleware: Middleware, call_next: CallbackType) -> CallbackType:
+    return lambda message: middleware(message, call_next)
+
+
+class Handler:
+    """A callback registered on a topic together with its per-route options.
+
+    The signature of the callback is compiled once (see fastmqtt.dependencies), parameters
+    named in the topic ``template`` are taken from the topic, and so is the chain of router
+    middlewares around it, by ``compile()``. Compares and
+    hashes equal to the wrapped callback, so callbacks can still be looked up and removed by
+    the original function.
+    """
+
+    def __init__(
+        self,
+        callback: CallbackType,
+        timeout: float | None = None,
+        priority: int = 0,
+        template: TopicTemplate | None = None,
+        single_flight: SingleFlight | None = None,
+        shed_policy: ShedPolicy | str | None = None,
+    ) -> None:
+        self.callback = callback
+        self.timeout = timeout
+        self.priority = priority
+        self.template = template
+        self.single_flight = single_flight
+        self.shed_policy = ShedPolicy(shed_policy) if shed_policy is not None else None
+        self.name = getattr(callback, "__qualname__", repr(callback))
+        self._invoke = compile_callback(callback, template)
+        if single_flight is not None:
+            self._invoke = single_flight.wrap(self._invoke)
+        self._call = self._invoke
+        # Routers the handler was registered on or included into, outermost first
+        self.routers: list["MQTTRouter"] = []
+
+    def __call__(self, message: Message) -> Any:
+        return self._call(message)
+
+    def compile(self) -> None:
+        """Wrap the callback in the middlewares of its routers, once instead of per message."""
+        call = self._invoke
+        middlewares = [middleware for router in self.routers for middleware in router.middlewares]
+        for middleware in reversed(middlewares):
+            call = _bind(middleware, call)
+        self._call = call
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Handler):
+            return self.callback == other.callback
+        return self.callback == other
+
+    def __hash__(self) -> int:
+        return hash(self.callback)
+
+    def __repr__(self) -> str:
+        return f"Handler({self.name})"
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import struct
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable
+
+from .types import Message
+
+if TYPE_CHECKING:
+    from .fastmqtt import FastMQTT
+
+log = logging.getLogger(__name__)
+
+# Sequence number, time.monotonic() when it was published
+_PROBE = struct.Struct("<Qd")
+PERCENTILES = (50, 90, 99)
+
+
+def _percentiles(samples: Iterable[float]) -> dict[float, float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    return {p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in PERCENTILES}
+
+
+@dataclass(frozen=True)
+class Health:
+    connected: bool
+    healthy: bool
+    # Percentile -> seconds, over the last ``window`` probes
+    round_trip: dict[float, float]
+    last_round_trip: float | None
+    probes_sent: int
+    probes_lost: int
+    ping_round_trip: float | None
+    loop_lag: float
+    max_loop_lag: float
+    unhealthy_events: int
+
+
+class HealthMonitor:
+    """Measures the broker round trip, pass it to ``FastMQTT(health_monitor=)``.
+
+    Every ``interval`` seconds a timestamped probe is published to a topic of this client, which
+    is subscribed with ``no_local=False`` so the broker sends it back. The round trip is taken
+    when the callback of the probe subscription runs, slow handlers of other messages do not
+    count, but a ``PriorityScheduler`` or ``AdmissionController`` backlog does. The keepalive
+    PINGRESP time and the event loop lag are reported next to it.
+
+    A probe not back within ``timeout`` or slower than ``max_round_trip`` is a failure. After
+    ``unhealthy_after`` failures in a row ``on_unhealthy`` is awaited with the ``Health``, or
+    with ``reconnect=True`` the connection is dropped and established again.
+    """
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        timeout: float = 5.0,
+        max_round_trip: float | None = None,
+        unhealthy_after: int = 3,
+        reconnect: bool = False,
+        on_unhealthy: Callable[[Health], Awaitable[None]] | None = None,
+        window: int = 100,
+        qos: int = 0,
+        topic_prefix: str = "fastmqtt/health",
+        lag_interval: float = 0.5,
+    ) -> None:
+        self._interval = interval
+        self._timeout = timeout
+        self._max_round_trip = max_round_trip
+        self._unhealthy_after = unhealthy_after
+        self._reconnect = reconnect
+        self._on_unhealthy = on_unhealthy
+        self._qos = qos
+        self._topic_prefix = topic_prefix
+        self._lag_interval = lag_interval
+
+        self._fastmqtt: "FastMQTT | None" = None
+        self._topic: str | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._sequence = 0
+        # Probes waiting to come back, sequence number -> time sent
+        self._pending: dict[int, float] = {}
+        self._round_trips: deque[float] = deque(maxlen=window)
+        self._lags: deque[float] = deque(maxlen=window)
+        self._failures = 0
+        self._probes_sent = 0
+        self._probes_lost = 0
+        self._unhealthy_events = 0
+
+    @property
+    def topic(self) -> str | None:
+        return self._topic
+
+    async def start(self, fastmqtt: "FastMQTT") -> None:
+        if self._fastmqtt is None:
+            self._topic = f"{self._topic_prefix}/{fastmqtt.client_id}"
+            await fastmqtt.subscribe(self._on_probe, self._topic, qos=self._qos, no_local=False)
+            self._fastmqtt = fastmqtt
+
+        # Run until stopped, a drain cancels them instead of waiting for its timeout
+        supervisor = fastmqtt.supervisor
+        self._tasks = [
+            supervisor.spawn(self._run_probes(fastmqtt), on_drain=self._cancel),
+            supervisor.spawn(self._measure_lag(), on_drain=self._cancel),
+        ]
+
+    def _cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    async def stop(self) -> None:
+        self._cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def health(self) -> Health:
+        fastmqtt = self._fastmqtt
+        connected = fastmqtt is not None and fastmqtt.is_connected
+        return Health(
+            connected=connected,
+            healthy=connected and self._failures < self._unhealthy_after,
+            round_trip=_percentiles(self._round_trips),
+            last_round_trip=self._round_trips[-1] if self._round_trips else None,
+            probes_sent=self._probes_sent,
+            probes_lost=self._probes_lost,
+            ping_round_trip=fastmqtt.connector.ping_round_trip if fastmqtt is not None else None,
+            loop_lag=self._lags[-1] if self._lags else 0.0,
+            max_loop_lag=max(self._lags, default=0.0),
+            unhealthy_events=self._unhealthy_events,
+        )
+
+    async def _on_probe(self, message: Message) -> None:
+        payload = message.payload.raw()
+        if len(payload) != _PROBE.size:
+            return
+
+        sequence, _ = _PROBE.unpack(payload)
+        sent = self._pending.pop(sequence, None)
+        if sent is None:
+            return
+
+        round_trip = time.monotonic() - sent
+        self._round_trips.append(round_trip)
+        if self._max_round_trip is not None and round_trip > self._max_round_trip:
+            log.warning(f"Broker round trip {round_trip:.3f}s above {self._max_round_trip}s")
+            self._failures += 1
+        else:
+            self._failures = 0
+
+    async def _run_probes(self, fastmqtt: "FastMQTT") -> None:
+        while True:
+            await self._check(fastmqtt)
+            if fastmqtt.is_connected:
+                await self._send_probe(fastmqtt)
+            await asyncio.sleep(self._interval)
+
+    async def _send_probe(self, fastmqtt: "FastMQTT") -> None:
+        if self._topic is None:
+            return
+
+        self._sequence += 1
+        now = time.monotonic()
+        self._pending[self._sequence] = now
+        self._probes_sent += 1
+        try:
+            async with asyncio.timeout(self._timeout):
+                await fastmqtt._publish_encoded(
+                    self._topic, _PROBE.pack(self._sequence, now), self._qos, False, None
+                )
+        except Exception as e:
+            # Counted as lost by _check
+            log.warning(f"Failed to publish health probe: {e!r}")
+
+    async def _check(self, fastmqtt: "FastMQTT") -> None:
+        if not fastmqtt.is_connected:
+            # Reconnecting already, probes of the old connection will not come back
+            self._pending.clear()
+            self._failures = 0
+            return
+
+        deadline = time.monotonic() - self._timeout
+        for sequence, sent in list(self._pending.items()):
+            if sent < deadline:
+                del self._pending[sequence]
+                self._probes_lost += 1
+                self._failures += 1
+
+        if self._failures < self._unhealthy_after:
+            return
+
+        self._unhealthy_events += 1
+        health = self.health()
+        log.warning(f"Connection unhealthy after {self._failures} failed probes: {health}")
+        self._pending.clear()
+        self._failures = 0
+        try:
+            if self._on_unhealthy is not None:
+                await self._on_unhealthy(health)
+            elif self._reconnect:
+                await fastmqtt.connector.reconnect()
+        except Exception:
+            log.exception("Failed to handle an unhealthy connection")
+
+    async def _measure_lag(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self._lag_interval)
+            self._lags.append(max(0.0, time.monotonic() - start - self._lag_interval))
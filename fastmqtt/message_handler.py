@@ -1,19 +1,28 @@
 import asyncio
 import logging
+from contextlib import nullcontext
+from functools import partial
 from typing import TYPE_CHECKING, Any
 
+from .admission import AdmissionController
 from .connectors import BaseConnector
+from .dedup import Deduplicator
 from .encoders import BaseDecoder
 from .exceptions import FastMQTTError
+from .profiler import SlowCallbackProfiler
 from .properties import PublishProperties
+from .scheduler import PriorityScheduler
 from .subscription_manager import Subscription, SubscriptionManager
-from .types import Message, Payload, RawMessage
+from .tracing import SpanKind, Tracer
+from .types import Acknowledgement, CallbackType, Message, Payload, RawMessage
 
 if TYPE_CHECKING:
     from .fastmqtt import FastMQTT
 
 log = logging.getLogger(__name__)
 
+_TIMED_OUT = object()
+
 
 class MessageHandler:
     def __init__(
@@ -22,29 +31,109 @@ class MessageHandler:
         connector: BaseConnector,
         subscription_manager: SubscriptionManager,
         payload_decoder: BaseDecoder,
+        manual_ack: bool = False,
+        handler_timeout: float | None = None,
+        profiler: SlowCallbackProfiler | None = None,
+        tracer: Tracer | None = None,
+        scheduler: PriorityScheduler | None = None,
+        deduplicator: Deduplicator | None = None,
+        admission_controller: AdmissionController | None = None,
     ) -> None:
         self._fastmqtt = fastmqtt
         self._connector = connector
         self._subscription_manager = subscription_manager
         self._payload_decoder = payload_decoder
+        self._manual_ack = manual_ack
+        self._handler_timeout = handler_timeout
+        self._profiler = profiler
+        self._tracer = tracer
+        self._scheduler = scheduler
+        self._deduplicator = deduplicator
+        self._admission_controller = admission_controller
+        self._supervisor = connector.supervisor
+        # Cleared while draining, messages are then left unhandled (and unacknowledged)
+        self._accepting = True
 
         self._connector.add_message_callback(self.on_message)
+        self._connector.admission_controller = admission_controller
+
+    def stop_intake(self) -> None:
+        self._accepting = False
+
+    def resume_intake(self) -> None:
+        self._accepting = True
+
+    async def on_message(self, raw_message: RawMessage, wait: bool = False) -> None:
+        if not self._accepting:
+            return
+
+        deduplicator = self._deduplicator
+        dedup_key = None
+        if deduplicator is not None:
+            dedup_key = deduplicator.key(raw_message)
+            if dedup_key is not None and not await deduplicator.acquire(dedup_key):
+                # Acknowledged anyway, or the broker would keep redelivering it
+                if self._manual_ack and raw_message.qos > 0:
+                    self._connector.ack(raw_message)
+                return
 
-    async def on_message(self, raw_message: RawMessage) -> None:
-        message = Message(
-            topic=raw_message.topic,
-            payload=Payload(data=raw_message.payload, decoder=self._payload_decoder),
-            qos=raw_message.qos,
-            retain=raw_message.retain,
-            mid=raw_message.mid,
-            properties=raw_message.properties,
-            client=self._fastmqtt,
+        acknowledgement = None
+        if self._manual_ack and raw_message.qos > 0:
+            acknowledgement = Acknowledgement(partial(self._connector.ack, raw_message))
+
+        tracer = self._tracer
+        span = (
+            tracer.start_span(
+                f"{raw_message.topic} receive",
+                kind=SpanKind.CONSUMER,
+                parent=tracer.extract(raw_message.properties),
+                attributes={"messaging.destination.name": raw_message.topic},
+            )
+            if tracer is not None
+            else nullcontext()
         )
+        handled = False
+        try:
+            # Open until the callbacks have finished, their spans are its children
+            with span:
+                message = Message(
+                    topic=raw_message.topic,
+                    payload=Payload(data=raw_message.payload, decoder=self._payload_decoder),
+                    qos=raw_message.qos,
+                    retain=raw_message.retain,
+                    mid=raw_message.mid,
+                    properties=raw_message.properties,
+                    client=self._fastmqtt,
+                    acknowledgement=acknowledgement,
+                    trace_context=tracer.current_context() if tracer is not None else None,
+                )
+                tasks = self._dispatch(message)
+                if tasks and (
+                    wait
+                    or acknowledgement is not None
+                    or tracer is not None
+                    or dedup_key is not None
+                ):
+                    # Acknowledge only after every callback has finished (or failed)
+                    results = await asyncio.gather(*tasks, return_exceptions=True)
+                    handled = all(result is True for result in results)
+        except asyncio.CancelledError:
+            # Cancelled by a drain before the callbacks finished, leave it for redelivery
+            acknowledgement = None
+            raise
+        finally:
+            if deduplicator is not None and dedup_key is not None:
+                # A message that failed is handled again when it is redelivered
+                deduplicator.release(dedup_key, handled)
+            if acknowledgement is not None:
+                acknowledgement()
 
+    def _dispatch(self, message: Message) -> list[asyncio.Future[bool]]:
         if message.properties.subscription_identifier is None:
-            log.warning(f"Message has no subscription_identifier {raw_message}")
-            return
+            log.warning(f"Message has no subscription_identifier {message}")
+            return []
 
+        tasks = []
         for id_ in message.properties.subscription_identifier:
             subscription = self._subscription_manager.get_subscription(id_)
 
@@ -52,7 +141,50 @@ class MessageHandler:
                 log.error(f"Message has unknown subscription_identifier {id_} ({message.topic})")
                 continue
 
-            asyncio.create_task(self._process_message(subscription, message))
+            if self._scheduler is None and self._admission_controller is None:
+                tasks.append(self._supervisor.spawn(self._process_message(subscription, message)))
+                continue
+
+            for callback in subscription.callbacks:
+                task = self._submit(subscription, callback, message)
+                if task is None:
+                    # Shed, the message was not handled
+                    task = asyncio.get_running_loop().create_future()
+                    task.set_result(False)
+                tasks.append(task)
+
+        return tasks
+
+    def _submit(
+        self, subscription: Subscription, callback: CallbackType, message: Message
+    ) -> asyncio.Future | None:
+        admission_controller = self._admission_controller
+        if admission_controller is None:
+            return self._schedule(subscription, callback, message)
+
+        route = f"{subscription.topic} -> {getattr(callback, 'name', callback)}"
+        size = len(message.payload.raw())
+        if not admission_controller.admit(route, getattr(callback, "shed_policy", None), size):
+            return None
+
+        task = self._schedule(subscription, callback, message)
+        admission_controller.track(route, task, size)
+        return task
+
+    def _schedule(
+        self, subscription: Subscription, callback: CallbackType, message: Message
+    ) -> asyncio.Future:
+        if self._scheduler is None:
+            return self._supervisor.spawn(self._process_callback(subscription, callback, message))
+
+        async def run() -> bool:
+            # The job starts once submit() returned, future is assigned by then
+            self._supervisor.enter(future)
+            return await self._process_callback(subscription, callback, message)
+
+        future = self._scheduler.submit(getattr(callback, "priority", 0), run)
+        self._supervisor.track(future)
+        return future
 
     async def _handle_result(self, result: Any, message: Message) -> None:
         if result is None:
@@ -73,15 +205,56 @@ class MessageHandler:
             properties=response_properties,
         )
 
-    async def _process_message(self, subscription: Subscription, message: Message) -> None:
-        callback_tasks = (
-            asyncio.create_task(callback(message)) for callback in subscription.callbacks
+    async def _process_message(self, subscription: Subscription, message: Message) -> bool:
+        results = await asyncio.gather(
+            *[
+                self._process_callback(subscription, callback, message)
+                for callback in subscription.callbacks
+            ]
         )
-        for result in asyncio.as_completed(callback_tasks):
-            try:
-                result = await result
-            except Exception as e:
-                log.exception(f"Error in callback {e}")
-                continue
+        return all(results)
+
+    async def _process_callback(
+        self, subscription: Subscription, callback: CallbackType, message: Message
+    ) -> bool:
+        """Whether the callback succeeded."""
+        try:
+            result = await self._run_callback(subscription, callback, message)
+        except Exception as e:
+            log.exception(f"Error in callback {e}")
+            return False
+
+        if result is _TIMED_OUT:
+            return False
+        await self._handle_result(result, message)
+        return True
 
-            await self._handle_result(result, message)
+    async def _run_callback(
+        self, subscription: Subscription, callback: CallbackType, message: Message
+    ) -> Any:
+        timeout = getattr(callback, "timeout", None) or self._handler_timeout
+        if timeout is None and self._profiler is None and self._tracer is None:
+            return await callback(message)
+
+        route = f"{subscription.topic} -> {getattr(callback, 'name', callback)}"
+        tracker = self._profiler.track(route, message.topic) if self._profiler else nullcontext()
+        span = (
+            self._tracer.start_span(
+                route,
+                parent=message.trace_context,
+                attributes={"messaging.destination.name": message.topic},
+            )
+            if self._tracer is not None
+            else nullcontext()
+        )
+        deadline = asyncio.timeout(timeout)
+        try:
+            with span, tracker:
+                async with deadline:
+                    return await callback(message)
+        except TimeoutError:
+            # Raised by the callback itself
+            if not deadline.expired():
+                raise
+            log.warning(f"Callback {route} timed out after {timeout}s ({message.topic})")
+            return _TIMED_OUT
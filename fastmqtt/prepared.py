@@ -0,0 +1,47 @@
+from typing import TYPE_CHECKING, Any
+
+from .properties import PublishProperties
+
+if TYPE_CHECKING:
+    from .fastmqtt import FastMQTT
+
+
+class PreparedPublisher:
+    """Publishes to a fixed topic with fixed options, see ``FastMQTT.prepare``.
+
+    The properties are converted to the connector's type once, so a publish only encodes the
+    payload. With publish middlewares or a tracer, which change each message, it publishes
+    through ``FastMQTT.publish`` instead.
+    """
+
+    def __init__(
+        self,
+        fastmqtt: "FastMQTT",
+        topic: str,
+        qos: int = 0,
+        retain: bool = False,
+        properties: PublishProperties | None = None,
+    ) -> None:
+        self.topic = topic
+        self.qos = qos
+        self.retain = retain
+        self.properties = properties
+        self._fastmqtt = fastmqtt
+        self._prepared = (
+            fastmqtt.connector.prepare_properties(properties) if properties is not None else None
+        )
+
+    async def publish(self, payload: Any = None) -> None:
+        fastmqtt = self._fastmqtt
+        if fastmqtt.publish_middlewares or fastmqtt.tracer is not None:
+            await fastmqtt.publish(self.topic, payload, self.qos, self.retain, self.properties)
+            return
+
+        await fastmqtt._publish_encoded(
+            self.topic,
+            fastmqtt.payload_encoder(payload),
+            self.qos,
+            self.retain,
+            self._prepared,
+            prepared=True,
+        )
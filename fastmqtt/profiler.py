@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import signal
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class RouteProfile:
+    route: str
+    calls: int = 0
+    slow_calls: int = 0
+    timeouts: int = 0
+    blocked: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    last_topic: str | None = None
+    last_stack: str | None = None
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+@dataclass
+class _RunningCallback:
+    route: str
+    topic: str
+    started: float
+
+
+class SlowCallbackProfiler:
+    """Records how long each route's callbacks take.
+
+    A callback still running after ``threshold`` seconds gets its stack sampled at that point.
+    A watchdog thread checks that the event loop is responsive, when it has not been for
+    ``block_threshold`` seconds the stack of the loop thread is recorded on the route whose
+    callback is running (a blocking call in an ``async`` callback).
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.1,
+        block_threshold: float = 0.05,
+        stack_limit: int = 20,
+    ) -> None:
+        self._threshold = threshold
+        self._block_threshold = block_threshold
+        self._stack_limit = stack_limit
+
+        self._profiles: dict[str, RouteProfile] = {}
+        self._running: dict[asyncio.Task, _RunningCallback] = {}
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._heartbeat = 0.0
+        self._heartbeat_handle: asyncio.TimerHandle | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    @contextmanager
+    def track(self, route: str, topic: str) -> Iterator[None]:
+        task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        sample_handle = None
+        if task is not None:
+            self._running[task] = _RunningCallback(route, topic, started)
+            sample_handle = loop.call_later(self._threshold, self._sample_task, task)
+
+        profile = self._get_profile(route)
+        try:
+            yield
+        except TimeoutError:
+            profile.timeouts += 1
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            if sample_handle is not None:
+                sample_handle.cancel()
+            if task is not None:
+                self._running.pop(task, None)
+
+            profile.calls += 1
+            profile.total_time += duration
+            profile.max_time = max(profile.max_time, duration)
+            if duration >= self._threshold:
+                profile.slow_calls += 1
+                profile.last_topic = topic
+                log.warning(f"Slow callback {route} took {duration:.3f}s ({topic})")
+
+    def report(self, n: int = 10, sort_by: str = "total_time") -> list[RouteProfile]:
+        """Top ``n`` routes ordered by a RouteProfile attribute."""
+        profiles = sorted(self._profiles.values(), key=lambda p: getattr(p, sort_by), reverse=True)
+        return profiles[:n]
+
+    def dump(self, n: int = 10, sort_by: str = "total_time") -> str:
+        lines = [
+            f"{'route':<50} {'calls':>8} {'slow':>6} {'timeout':>7} {'blocked':>7} "
+            f"{'avg ms':>9} {'max ms':>9}"
+        ]
+        stacks = []
+        for profile in self.report(n, sort_by):
+            lines.append(
+                f"{profile.route:<50} {profile.calls:>8} {profile.slow_calls:>6} "
+                f"{profile.timeouts:>7} {profile.blocked:>7} "
+                f"{profile.avg_time * 1000:>9.2f} {profile.max_time * 1000:>9.2f}"
+            )
+            if profile.last_stack is not None:
+                stacks.append(f"{profile.route} ({profile.last_topic}):\n{profile.last_stack}")
+
+        return "\n".join(lines + stacks)
+
+    def reset(self) -> None:
+        self._profiles.clear()
+
+    def dump_on_signal(self, signum: int = signal.SIGUSR1) -> None:
+        """Log the report whenever the process receives ``signum`` (Unix only)."""
+        asyncio.get_running_loop().add_signal_handler(
+            signum, lambda: log.warning(f"Callback profile:\n{self.dump()}")
+        )
+
+    def start(self) -> None:
+        if self._watchdog is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._beat(loop)
+        self._watchdog = threading.Thread(
+            target=self._watch, name="fastmqtt-profiler", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        if self._watchdog is None:
+            return
+
+        self._stopped.set()
+        self._watchdog.join()
+        self._watchdog = None
+        if self._heartbeat_handle is not None:
+            self._heartbeat_handle.cancel()
+            self._heartbeat_handle = None
+
+    def _get_profile(self, route: str) -> RouteProfile:
+        profile = self._profiles.get(route)
+        if profile is None:
+            profile = self._profiles[route] = RouteProfile(route)
+        return profile
+
+    def _sample_task(self, task: asyncio.Task) -> None:
+        running = self._running.get(task)
+        if running is None:
+            return
+
+        # Task.get_stack() only has the outermost coroutine of a suspended task, follow the
+        # chain of awaited coroutines to the one that is actually waiting
+        frames = []
+        coro: Any = task.get_coro()
+        while coro is not None:
+            frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+            if frame is None:
+                break
+            frames.append(frame)
+            coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+
+        profile = self._get_profile(running.route)
+        profile.last_topic = running.topic
+        stack = traceback.StackSummary.extract(
+            (frame, frame.f_lineno) for frame in frames[-self._stack_limit :]
+        )
+        profile.last_stack = "".join(stack.format())
+
+    def _beat(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._heartbeat = time.monotonic()
+        self._heartbeat_handle = loop.call_later(self._block_threshold / 2, self._beat, loop)
+
+    def _watch(self) -> None:
+        reported = 0.0
+        while not self._stopped.wait(self._block_threshold / 2):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat
+            if blocked_for < self._block_threshold or heartbeat == reported:
+                continue
+
+            reported = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore[arg-type]
+            task = asyncio.current_task(self._loop)
+            running = self._running.get(task) if task is not None else None
+            route = running.route if running is not None else "<event loop>"
+
+            profile = self._get_profile(route)
+            profile.blocked += 1
+            if running is not None:
+                profile.last_topic = running.topic
+            if frame is not None:
+                profile.last_stack = "".join(
+                    traceback.format_stack(frame, limit=self._stack_limit)
+                )
+
+            log.warning(f"Event loop blocked for more than {blocked_for:.3f}s in {route}")
@@ -0,0 +1,339 @@
+import asyncio
+import dataclasses
+import itertools
+import logging
+import struct
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, BinaryIO, Iterator
+
+from .properties import PublishProperties
+from .types import RawMessage
+
+if TYPE_CHECKING:
+    from .fastmqtt import FastMQTT
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"FMQR\x01"
+SEGMENT_SUFFIX = ".fmqr"
+
+# timestamp, qos | retain << 2, topic length, payload length, properties length
+_RECORD = struct.Struct("<dBHII")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+
+_INT, _STR, _BYTES, _INT_LIST, _STR_PAIRS = range(5)
+
+# Records read in a thread at a time by Replayer
+REPLAY_BATCH = 1000
+
+# Property names are written once in the header of each segment, records refer to them by index
+_PROPERTY_NAMES = [field.name for field in dataclasses.fields(PublishProperties)]
+
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode()
+    return _U16.pack(len(data)) + data
+
+
+def _pack_property(value: Any) -> bytes:
+    if isinstance(value, bool | int):
+        return bytes([_INT]) + _I64.pack(value)
+    if isinstance(value, str):
+        return bytes([_STR]) + _pack_str(value)
+    if isinstance(value, bytes | bytearray):
+        return bytes([_BYTES]) + _U32.pack(len(value)) + value
+
+    items = list(value)
+    if all(isinstance(item, int) for item in items):
+        return bytes([_INT_LIST]) + _U16.pack(len(items)) + b"".join(map(_U32.pack, items))
+    return (
+        bytes([_STR_PAIRS])
+        + _U16.pack(len(items))
+        + b"".join(_pack_str(key) + _pack_str(val) for key, val in items)
+    )
+
+
+def pack_properties(properties: PublishProperties) -> bytes:
+    parts = []
+    for index, name in enumerate(_PROPERTY_NAMES):
+        value = getattr(properties, name)
+        if value is None or value == []:
+            continue
+        parts.append(bytes([index]) + _pack_property(value))
+    return b"".join(parts)
+
+
+class _Reader:
+    __slots__ = ("data", "offset")
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.offset = 0
+
+    def take(self, size: int) -> bytes:
+        value = self.data[self.offset : self.offset + size]
+        self.offset += size
+        return value
+
+    def unpack(self, struct_: struct.Struct) -> Any:
+        (value,) = struct_.unpack_from(self.data, self.offset)
+        self.offset += struct_.size
+        return value
+
+    def str(self) -> str:
+        return self.take(self.unpack(_U16)).decode()
+
+
+def _unpack_property(reader: _Reader) -> Any:
+    kind = reader.take(1)[0]
+    if kind == _INT:
+        return reader.unpack(_I64)
+    if kind == _STR:
+        return reader.str()
+    if kind == _BYTES:
+        return reader.take(reader.unpack(_U32))
+    if kind == _INT_LIST:
+        return [reader.unpack(_U32) for _ in range(reader.unpack(_U16))]
+    return [(reader.str(), reader.str()) for _ in range(reader.unpack(_U16))]
+
+
+def unpack_properties(data: bytes, names: list[str]) -> PublishProperties:
+    reader = _Reader(data)
+    values = {}
+    while reader.offset < len(data):
+        name = names[reader.take(1)[0]]
+        values[name] = _unpack_property(reader)
+
+    known = {name: value for name, value in values.items() if name in _PROPERTY_NAMES}
+    return PublishProperties(**known)
+
+
+class Recorder:
+    """Appends received messages to segment files in ``directory``.
+
+    Records are buffered and written every ``flush_interval`` seconds, in a thread. A new
+    segment is started once the current one reaches ``segment_size`` bytes. Register it with
+    ``recorder.attach(fastmqtt)`` (or ``fastmqtt.add_message_callback(recorder)``) and
+    ``await recorder.close()`` to write the last records.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        segment_size: int = 64 * 1024 * 1024,
+        prefix: str = "messages",
+        flush_interval: float = 1.0,
+    ) -> None:
+        self._directory = Path(directory)
+        self._segment_size = segment_size
+        self._prefix = prefix
+        self._flush_interval = flush_interval
+        # Only used by _write, in a thread
+        self._file: BinaryIO | None = None
+        self._size = 0
+        self._segment = self._last_segment()
+        self._buffer: list[bytes] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._writing: asyncio.Future | None = None
+        self.recorded = 0
+
+    def attach(self, fastmqtt: "FastMQTT") -> None:
+        fastmqtt.add_message_callback(self)
+
+    async def __call__(self, message: RawMessage) -> None:
+        self.record(message)
+
+    def record(self, message: RawMessage, timestamp: float | None = None) -> None:
+        topic = message.topic.encode()
+        properties = pack_properties(message.properties)
+        self._buffer.append(
+            _RECORD.pack(
+                time.time() if timestamp is None else timestamp,
+                message.qos | (message.retain << 2),
+                len(topic),
+                len(message.payload),
+                len(properties),
+            )
+            + topic
+            + message.payload
+            + properties
+        )
+        self.recorded += 1
+        self._schedule_flush()
+
+    async def close(self) -> None:
+        """Write the buffered records and close the segment."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._writing is not None:
+            await asyncio.wait([self._writing])
+        if self._buffer:
+            self._flush()
+            await asyncio.wait([self._writing])  # type: ignore[list-item]
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is None and self._writing is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self._flush_interval, self._flush
+            )
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        records = self._buffer
+        self._buffer = []
+        # One write at a time, the next flush is scheduled once it is done
+        self._writing = asyncio.get_running_loop().run_in_executor(None, self._write, records)
+        self._writing.add_done_callback(self._written)
+
+    def _written(self, future: asyncio.Future) -> None:
+        self._writing = None
+        if not future.cancelled() and (exception := future.exception()) is not None:
+            log.error(f"Failed to write recorded messages: {exception!r}")
+        if self._buffer:
+            self._schedule_flush()
+
+    def _write(self, records: list[bytes]) -> None:
+        # Runs in a thread
+        file = self._file
+        for record in records:
+            if file is None or self._size + len(record) > self._segment_size:
+                file = self._open_segment()
+            file.write(record)
+            self._size += len(record)
+        if file is not None:
+            file.flush()
+
+    def _last_segment(self) -> int:
+        segments = sorted(self._directory.glob(f"{self._prefix}-*{SEGMENT_SUFFIX}"))
+        if not segments:
+            return 0
+        return int(segments[-1].stem.rsplit("-", 1)[1])
+
+    def _open_segment(self) -> BinaryIO:
+        if self._file is not None:
+            self._file.close()
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._segment += 1
+        path = self._directory / f"{self._prefix}-{self._segment:06d}{SEGMENT_SUFFIX}"
+        file = self._file = path.open("xb")
+
+        header = (
+            MAGIC + _U16.pack(len(_PROPERTY_NAMES)) + b"".join(map(_pack_str, _PROPERTY_NAMES))
+        )
+        file.write(header)
+        self._size = len(header)
+        return file
+
+
+def _read_str(file: BinaryIO) -> str:
+    (size,) = _U16.unpack(file.read(_U16.size))
+    return file.read(size).decode()
+
+
+def _read_segment(path: Path) -> Iterator[tuple[float, RawMessage]]:
+    # Record by record, a segment is not loaded whole
+    with path.open("rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a fastmqtt recording")
+        (count,) = _U16.unpack(file.read(_U16.size))
+        names = [_read_str(file) for _ in range(count)]
+
+        while head := file.read(_RECORD.size):
+            if len(head) == _RECORD.size:
+                timestamp, flags, topic_size, payload_size, properties_size = _RECORD.unpack(head)
+                size = topic_size + payload_size + properties_size
+                body = file.read(size)
+            if len(head) < _RECORD.size or len(body) < size:
+                log.warning(f"Truncated record at the end of {path}")
+                return
+
+            reader = _Reader(body)
+            topic = reader.take(topic_size).decode()
+            payload = reader.take(payload_size)
+            properties = unpack_properties(reader.take(properties_size), names)
+            yield (
+                timestamp,
+                RawMessage(
+                    topic=topic,
+                    payload=payload,
+                    qos=flags & 0b11,
+                    retain=bool(flags & 0b100),
+                    mid=0,
+                    properties=properties,
+                ),
+            )
+
+
+def read_recording(
+    directory: str | Path, prefix: str = "messages"
+) -> Iterator[tuple[float, RawMessage]]:
+    """Yield ``(timestamp, message)`` for every recorded message, in order."""
+    for path in sorted(Path(directory).glob(f"{prefix}-*{SEGMENT_SUFFIX}")):
+        yield from _read_segment(path)
+
+
+class Replayer:
+    """Feeds a recording into an application through its normal dispatch path.
+
+    ``speed`` scales the original timing (2.0 replays twice as fast), ``None`` replays as fast
+    as the callbacks allow. Subscription identifiers are matched again against the
+    subscriptions of the application, which does not need to be connected (see
+    ``FastMQTT.subscribe_offline``).
+    """
+
+    def __init__(self, directory: str | Path, prefix: str = "messages") -> None:
+        self._directory = directory
+        self._prefix = prefix
+
+    async def replay(self, fastmqtt: "FastMQTT", speed: float | None = 1.0) -> int:
+        loop = asyncio.get_running_loop()
+        identifiers: dict[str, list[int]] = {}
+        start: float | None = None
+        first_timestamp = 0.0
+        count = 0
+
+        async for timestamp, message in self._read():
+            if start is None:
+                start, first_timestamp = loop.time(), timestamp
+            elif speed is not None:
+                delay = (timestamp - first_timestamp) / speed - (loop.time() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            ids = identifiers.get(message.topic)
+            if ids is None:
+                ids = identifiers[message.topic] = [
+                    subscription.id for subscription in fastmqtt.match_subscriptions(message.topic)
+                ]
+            if not ids:
+                continue
+
+            message = dataclasses.replace(
+                message,
+                properties=dataclasses.replace(
+                    message.properties,
+                    subscription_identifier=ids,  # type: ignore[arg-type]
+                ),
+            )
+            # At maximum speed wait for the callbacks, otherwise tasks would pile up
+            await fastmqtt.dispatch(message, wait=speed is None)
+            count += 1
+
+        return count
+
+    async def _read(self) -> AsyncIterator[tuple[float, RawMessage]]:
+        # The files are read in a thread, a batch of records at a time
+        records = read_recording(self._directory, self._prefix)
+        try:
+            while batch := await asyncio.to_thread(list, itertools.islice(records, REPLAY_BATCH)):
+                for record in batch:
+                    yield record
+        finally:
+            records.close()
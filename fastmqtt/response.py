@@ -1,11 +1,17 @@
 import asyncio
 import itertools
 import logging
-from typing import TYPE_CHECKING, Any, Callable
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Hashable
 
 from .exceptions import FastMQTTError
 from .properties import PublishProperties
+from .singleflight import coalesce
 from .subscription_manager import SubscriptionWithId
+from .tracing import SpanKind
 from .types import Message, RetainHandling
 
 if TYPE_CHECKING:
@@ -23,6 +29,93 @@ class CorrelationIntGenerator:
         return val.to_bytes((val.bit_length() + 7) // 8, "big")
 
 
+@dataclass
+class ResponseCacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / total if total else 0.0
+
+
+class ResponseCache:
+    """Responses of ``ResponseContext.request`` by topic and encoded payload.
+
+    Responses are kept for ``ttl`` seconds, the responder can override it per response with the
+    ``ttl_property`` user property (in seconds, ``0`` to not cache it). At most ``maxsize``
+    responses are kept, the least recently used are evicted first. Concurrent requests for the
+    same key share one round trip.
+    """
+
+    def __init__(
+        self, ttl: float = 60.0, maxsize: int = 1024, ttl_property: str = "cache-ttl"
+    ) -> None:
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._ttl_property = ttl_property
+        self._entries: OrderedDict[Hashable, tuple[float, Message]] = OrderedDict()
+        self._in_flight: dict[Hashable, asyncio.Future[Message]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> ResponseCacheStats:
+        return ResponseCacheStats(self.hits, self.misses, self.coalesced, len(self._entries))
+
+    async def get(self, key: Hashable, request: Callable[[], Awaitable[Message]]) -> Message:
+        """The cached response for ``key``, or the response of ``request()``."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        if key in self._in_flight:
+            self.coalesced += 1
+
+        async def fetch() -> Message:
+            self.misses += 1
+            response = await request()
+            self._store(key, response)
+            return response
+
+        # A cancelled request is sent again by the next waiting one
+        return await coalesce(self._in_flight, key, fetch)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _store(self, key: Hashable, response: Message) -> None:
+        ttl = self._ttl
+        for name, value in response.properties.user_property:
+            if name == self._ttl_property:
+                try:
+                    ttl = float(value)
+                except ValueError:
+                    log.warning(f"Invalid {self._ttl_property} {value!r} ({response.topic})")
+                break
+
+        if ttl <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+
 class ResponseContext:
     def __init__(
         self,
@@ -32,6 +125,7 @@ class ResponseContext:
         default_timeout: float | None = 60,
         correlation_generator: Callable[[], bytes] = CorrelationIntGenerator(),
         payload_encoder: Callable[[Any], bytes] = lambda x: x,
+        cache: ResponseCache | None = None,
     ):
         self._fastmqtt = fastmqtt
         self._response_topic = response_topic
@@ -40,6 +134,11 @@ class ResponseContext:
         self._futures: dict[bytes, asyncio.Future[Message]] = {}
         self._subscription: SubscriptionWithId | None = None
         self._correlation_generator = correlation_generator
+        self._cache = cache
+
+    @property
+    def cache(self) -> ResponseCache | None:
+        return self._cache
 
     async def subscribe(self) -> None:
         self._subscription = await self._fastmqtt.subscribe(
@@ -86,6 +185,25 @@ class ResponseContext:
         retain: bool = False,
         properties: PublishProperties | None = None,
         timeout: float | None = None,
+        use_cache: bool = True,
+    ) -> Message:
+        if self._cache is None or not use_cache:
+            return await self._request(topic, payload, qos, retain, properties, timeout)
+
+        # Keyed by the encoded payload, equal payloads (e.g. dicts) are not always hashable
+        key = (topic, self._fastmqtt.payload_encoder(payload))
+        return await self._cache.get(
+            key, lambda: self._request(topic, payload, qos, retain, properties, timeout)
+        )
+
+    async def _request(
+        self,
+        topic: str,
+        payload: Any,
+        qos: int,
+        retain: bool,
+        properties: PublishProperties | None,
+        timeout: float | None,
     ) -> Message:
         correlation_data = self._correlation_generator()
         if correlation_data in self._futures:
@@ -105,16 +223,27 @@ class ResponseContext:
 
         future = asyncio.Future[Message]()
         self._futures[correlation_data] = future
+        tracer = self._fastmqtt.tracer
+        span = (
+            tracer.start_span(
+                f"{topic} request",
+                kind=SpanKind.CLIENT,
+                attributes={"messaging.destination.name": topic},
+            )
+            if tracer is not None
+            else nullcontext()
+        )
         try:
-            async with asyncio.timeout(timeout or self._default_timeout):
-                await self._fastmqtt.publish(
-                    topic=topic,
-                    payload=payload,
-                    qos=qos,
-                    retain=retain,
-                    properties=properties,
-                )
-                return await future
+            with span:
+                async with asyncio.timeout(timeout or self._default_timeout):
+                    await self._fastmqtt.publish(
+                        topic=topic,
+                        payload=payload,
+                        qos=qos,
+                        retain=retain,
+                        properties=properties,
+                    )
+                    return await future
 
         finally:
             self._futures.pop(correlation_data, None)
@@ -1,8 +1,12 @@
 import logging
 from typing import Any, Callable
 
+from .admission import ShedPolicy
 from .exceptions import FastMQTTError
-from .types import CallbackType, RetainHandling, SubscribeOptions, Subscription
+from .handler import Handler
+from .singleflight import SingleFlight
+from .topic import parse_template
+from .types import CallbackType, Middleware, RetainHandling, SubscribeOptions, Subscription
 
 log = logging.getLogger(__name__)
 
@@ -16,8 +20,12 @@ def merge_default_subscribe_options(
 ) -> SubscribeOptions:
     return SubscribeOptions(
         qos=new_qos or default_options.qos,
-        no_local=new_no_local or default_options.no_local,
-        retain_as_published=new_retain_as_published or default_options.retain_as_published,
+        no_local=default_options.no_local if new_no_local is None else new_no_local,
+        retain_as_published=(
+            default_options.retain_as_published
+            if new_retain_as_published is None
+            else new_retain_as_published
+        ),
         retain_handling=new_retain_handling or default_options.retain_handling,
     )
 
@@ -37,15 +45,30 @@ def merge_subscribe_options(
 
 
 class MQTTRouter:
-    def __init__(self, default_subscribe_options: SubscribeOptions | None = None):
+    def __init__(
+        self,
+        default_subscribe_options: SubscribeOptions | None = None,
+        priority: int = 0,
+    ):
         if default_subscribe_options is None:
             default_subscribe_options = SubscribeOptions()
 
         self._default_subscribe_options = default_subscribe_options
-        self._subscriptions: list[Subscription] = []
+        self._default_priority = priority
+        self._middlewares: list[Middleware] = []
+        self._subscriptions: dict[str, Subscription] = {}
         self._included = False
 
-    def _register(
+    @property
+    def middlewares(self) -> list[Middleware]:
+        return self._middlewares
+
+    def add_middleware(self, middleware: Middleware) -> None:
+        """Wrap every callback of this router: ``async def middleware(message, call_next)``.
+        The chain is built when the application connects."""
+        self._middlewares.append(middleware)
+
+    def _new_subscription(
         self,
         callback: CallbackType,
         topic: str,
@@ -53,6 +76,10 @@ class MQTTRouter:
         no_local: bool | None = None,
         retain_as_published: bool | None = None,
         retain_handling: RetainHandling | None = None,
+        timeout: float | None = None,
+        priority: int | None = None,
+        single_flight: SingleFlight | bool = False,
+        shed_policy: ShedPolicy | str | None = None,
     ) -> Subscription:
         subscribe_options = merge_default_subscribe_options(
             self._default_subscribe_options,
@@ -61,22 +88,64 @@ class MQTTRouter:
             retain_as_published,
             retain_handling,
         )
+        # sensors/{device_id}/temperature subscribes to sensors/+/temperature
+        template = parse_template(topic)
+        if template is not None:
+            topic = template.filter
+
+        if not isinstance(callback, Handler):
+            callback = Handler(
+                callback,
+                timeout=timeout,
+                priority=self._default_priority if priority is None else priority,
+                template=template,
+                # True for a default SingleFlight of its own
+                single_flight=SingleFlight() if single_flight is True else single_flight or None,
+                shed_policy=shed_policy,
+            )
+            callback.routers.append(self)
 
-        for subscription in self._subscriptions:
-            if str(subscription.topic) == topic:
-                subscription.callbacks.append(callback)
-                merge_subscribe_options(subscription.options, subscribe_options)
-                return subscription
-
-        subscription = Subscription(
+        return Subscription(
             [callback],
             topic,
             subscribe_options,
         )
 
-        self._subscriptions.append(subscription)
+    def _register(
+        self,
+        callback: CallbackType,
+        topic: str,
+        qos: int | None = None,
+        no_local: bool | None = None,
+        retain_as_published: bool | None = None,
+        retain_handling: RetainHandling | None = None,
+        timeout: float | None = None,
+        priority: int | None = None,
+        single_flight: SingleFlight | bool = False,
+        shed_policy: ShedPolicy | str | None = None,
+    ) -> Subscription:
+        new_subscription = self._new_subscription(
+            callback=callback,
+            topic=topic,
+            qos=qos,
+            no_local=no_local,
+            retain_as_published=retain_as_published,
+            retain_handling=retain_handling,
+            timeout=timeout,
+            priority=priority,
+            single_flight=single_flight,
+            shed_policy=shed_policy,
+        )
 
-        return subscription
+        subscription = self._subscriptions.get(new_subscription.topic)
+        if subscription is not None:
+            subscription.callbacks.extend(new_subscription.callbacks)
+            merge_subscribe_options(subscription.options, new_subscription.options)
+            return subscription
+
+        self._subscriptions[new_subscription.topic] = new_subscription
+
+        return new_subscription
 
     def register(
         self,
@@ -86,6 +155,10 @@ class MQTTRouter:
         no_local: bool | None = None,
         retain_as_published: bool | None = None,
         retain_handling: RetainHandling | None = None,
+        timeout: float | None = None,
+        priority: int | None = None,
+        single_flight: SingleFlight | bool = False,
+        shed_policy: ShedPolicy | str | None = None,
     ) -> Subscription:
         if self._included:
             raise FastMQTTError(
@@ -100,6 +173,10 @@ class MQTTRouter:
             no_local=no_local,
             retain_as_published=retain_as_published,
             retain_handling=retain_handling,
+            timeout=timeout,
+            priority=priority,
+            single_flight=single_flight,
+            shed_policy=shed_policy,
         )
 
     def on_message(
@@ -109,6 +186,10 @@ class MQTTRouter:
         no_local: bool | None = None,
         retain_as_published: bool | None = None,
         retain_handling: RetainHandling | None = None,
+        timeout: float | None = None,
+        priority: int | None = None,
+        single_flight: SingleFlight | bool = False,
+        shed_policy: ShedPolicy | str | None = None,
     ) -> Callable[..., Any]:
         def wrapper(func: CallbackType) -> CallbackType:
             self.register(
@@ -118,6 +199,10 @@ class MQTTRouter:
                 no_local=no_local,
                 retain_as_published=retain_as_published,
                 retain_handling=retain_handling,
+                timeout=timeout,
+                priority=priority,
+                single_flight=single_flight,
+                shed_policy=shed_policy,
             )
             return func
 
@@ -127,14 +212,16 @@ class MQTTRouter:
         if router._default_subscribe_options is None:
             router._default_subscribe_options = self._default_subscribe_options
 
-        subs = self._subscriptions.copy()
-        for router_sub in router._subscriptions:
-            for sub in subs:
-                if sub.topic == router_sub.topic:
-                    merge_subscribe_options(sub.options, router_sub.options)
-                    sub.callbacks.extend(router_sub.callbacks)
-                    break
+        for topic, router_sub in router._subscriptions.items():
+            for callback in router_sub.callbacks:
+                if isinstance(callback, Handler):
+                    callback.routers.insert(0, self)
+
+            sub = self._subscriptions.get(topic)
+            if sub is None:
+                self._subscriptions[topic] = router_sub
             else:
-                self._subscriptions.append(router_sub)
+                merge_subscribe_options(sub.options, router_sub.options)
+                sub.callbacks.extend(router_sub.callbacks)
 
         router._included = True
@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PriorityStats:
+    queued: int = 0
+    running: int = 0
+    submitted: int = 0
+    completed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def avg_wait(self) -> float:
+        started = self.completed + self.running
+        return self.total_wait / started if started else 0.0
+
+
+class _Job:
+    __slots__ = ("priority", "func", "future", "context", "enqueued")
+
+    def __init__(
+        self, priority: int, func: Callable[[], Awaitable[Any]], future: asyncio.Future
+    ) -> None:
+        self.priority = priority
+        self.func = func
+        self.future = future
+        self.context = contextvars.copy_context()
+        self.enqueued = time.monotonic()
+
+
+class PriorityScheduler:
+    """Runs callbacks with at most ``concurrency`` of them at a time, higher priority first.
+
+    Messages of the same priority are served in arrival order. A queued message gains one
+    priority level for every ``aging`` seconds it waits, so lower priorities are delayed during
+    a burst but never starved.
+    """
+
+    def __init__(self, concurrency: int = 64, aging: float = 1.0) -> None:
+        self._concurrency = concurrency
+        self._aging = aging
+        self._queues: dict[int, deque[_Job]] = {}
+        self._stats: dict[int, PriorityStats] = {}
+        self._running = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def submit(self, priority: int, func: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Queue ``func`` and return a future for its result."""
+        job = _Job(priority, func, asyncio.get_running_loop().create_future())
+        stats = self._stats.get(priority)
+        if stats is None:
+            stats = self._stats[priority] = PriorityStats()
+
+        stats.submitted += 1
+        stats.queued += 1
+        self._queues.setdefault(priority, deque()).append(job)
+        self._run_next()
+        return job.future
+
+    def stats(self) -> dict[int, PriorityStats]:
+        return {
+            priority: PriorityStats(**vars(stats))
+            for priority, stats in sorted(self._stats.items(), reverse=True)
+        }
+
+    def _pop_next(self) -> _Job | None:
+        now = time.monotonic()
+        best_queue = None
+        best_priority = 0.0
+        for priority, queue in self._queues.items():
+            # The head of a queue is its oldest job
+            while queue and queue[0].future.done():
+                self._stats[priority].queued -= 1
+                queue.popleft()
+            if not queue:
+                continue
+
+            effective = priority + (now - queue[0].enqueued) / self._aging
+            if best_queue is None or effective > best_priority:
+                best_queue, best_priority = queue, effective
+
+        return None if best_queue is None else best_queue.popleft()
+
+    def _run_next(self) -> None:
+        while self._running < self._concurrency:
+            job = self._pop_next()
+            if job is None:
+                return
+
+            stats = self._stats[job.priority]
+            wait = time.monotonic() - job.enqueued
+            stats.queued -= 1
+            stats.running += 1
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
+
+            self._running += 1
+            task = asyncio.create_task(job.func(), context=job.context)
+            task.add_done_callback(lambda task, job=job: self._on_done(job, task))
+            job.future.add_done_callback(lambda future, task=task: task.cancel())
+
+    def _on_done(self, job: _Job, task: asyncio.Task) -> None:
+        self._running -= 1
+        stats = self._stats[job.priority]
+        stats.running -= 1
+        stats.completed += 1
+
+        if not job.future.done():
+            if task.cancelled():
+                job.future.cancel()
+            elif (exception := task.exception()) is not None:
+                job.future.set_exception(exception)
+            else:
+                job.future.set_result(task.result())
+
+        self._run_next()
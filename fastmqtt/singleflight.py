@@ -0,0 +1,109 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from .types import Message
+
+T = TypeVar("T")
+
+# Result of a call whose caller was cancelled, a waiting caller runs it instead
+_ABANDONED: Any = object()
+
+
+def default_key(message: Message) -> Hashable:
+    return message.topic, message.payload.raw()
+
+
+async def coalesce(
+    futures: dict[Any, asyncio.Future],
+    key: Hashable,
+    call: Callable[[], Awaitable[T]],
+    keep: bool = False,
+) -> T:
+    """Run ``call()`` once for concurrent callers with the same ``key``, ``futures`` holds the
+    running calls. An exception is shared with the waiting callers, a cancellation is not: the
+    next waiting caller runs the call itself. With ``keep`` the future of a successful call
+    stays in ``futures`` and later callers get its result."""
+    while (future := futures.get(key)) is not None:
+        result = await asyncio.shield(future)
+        if result is not _ABANDONED:
+            return result
+
+    future = futures[key] = asyncio.get_running_loop().create_future()
+    try:
+        result = await call()
+    except Exception as e:
+        del futures[key]
+        future.set_exception(e)
+        future.exception()  # Retrieved, the waiting callers get it from the await
+        raise
+    except BaseException:
+        del futures[key]
+        future.set_result(_ABANDONED)
+        raise
+
+    future.set_result(result)
+    if not keep:
+        del futures[key]
+    return result
+
+
+class SingleFlight:
+    """Coalesces concurrent calls of a route with the same key into one execution.
+
+    Pass it to a route, ``@fastmqtt.on_message("stats/get", single_flight=SingleFlight())``:
+    requests arriving while the callback runs for an equal key (topic and raw payload by
+    default) wait for that run, and each of them still gets its own response. With ``ttl``
+    results are also reused for that many seconds, at most ``maxsize`` of them. Use one
+    instance per route.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 0.0,
+        key: Callable[[Message], Hashable] = default_key,
+        maxsize: int = 1024,
+    ) -> None:
+        self._ttl = ttl
+        self._key = key
+        self._maxsize = maxsize
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self._results: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.executions = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def wrap(self, call: Callable[[Message], Any]) -> Callable[[Message], Any]:
+        async def single_flight(message: Message) -> Any:
+            key = self._key(message)
+            if self._ttl:
+                cached = self._results.get(key)
+                if cached is not None:
+                    if cached[0] > time.monotonic():
+                        self.cache_hits += 1
+                        return cached[1]
+                    del self._results[key]
+
+            if key in self._in_flight:
+                self.coalesced += 1
+
+            async def execute() -> Any:
+                self.executions += 1
+                result = await call(message)
+                if self._ttl:
+                    self._store(key, result)
+                return result
+
+            return await coalesce(self._in_flight, key, execute)
+
+        return single_flight
+
+    def clear(self) -> None:
+        self._results.clear()
+
+    def _store(self, key: Hashable, result: Any) -> None:
+        self._results[key] = (time.monotonic() + self._ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self._maxsize:
+            self._results.popitem(last=False)
@@ -1,71 +1,190 @@
 import asyncio
+import heapq
+from dataclasses import dataclass
 
 from .connectors import BaseConnector
 from .exceptions import FastMQTTError
 from .properties import SubscribeProperties
+from .topic import topic_matches
 from .types import CallbackType, Subscription, SubscriptionWithId
 
 
 class IdManager:
+    """Allocates subscription identifiers from a contiguous range.
+
+    Only released identifiers below the high-water mark are stored (in a min-heap, so the
+    lowest one is reused first), memory does not grow with the number of identifiers in use.
+    """
+
     def __init__(self, max_id: int = 268435455):
         self.max_id = max_id
         self.current_id = 0
-        self.available_ids = set()
-        self.used_ids = set()
+        self._released: list[int] = []
+        self._released_set: set[int] = set()
 
-    def get_id(self):
-        if self.available_ids:
-            return self.available_ids.pop()
+    def get_id(self) -> int:
+        while self._released:
+            id_ = heapq.heappop(self._released)
+            if id_ in self._released_set:
+                self._released_set.remove(id_)
+                return id_
 
         if self.current_id < self.max_id:
             self.current_id += 1
-            self.used_ids.add(self.current_id)
             return self.current_id
 
         raise ValueError("No more IDs available")
 
-    def put_back(self, id_: int):
-        if id_ in self.used_ids:
-            self.used_ids.remove(id_)
-            self.available_ids.add(id_)
-        else:
+    def put_back(self, id_: int) -> None:
+        if not 0 < id_ <= self.current_id or id_ in self._released_set:
             raise ValueError(f"ID {id_} is not in use")
 
-    def get_available_count(self):
-        return len(self.available_ids) + (self.max_id - self.current_id)
+        if id_ != self.current_id:
+            self._released_set.add(id_)
+            heapq.heappush(self._released, id_)
+            return
+
+        # Shrink the range instead of remembering the released tail
+        self.current_id -= 1
+        while self.current_id in self._released_set:
+            self._released_set.remove(self.current_id)
+            self.current_id -= 1
+
+        if not self._released_set:
+            self._released.clear()
+
+    def get_available_count(self) -> int:
+        return len(self._released_set) + (self.max_id - self.current_id)
 
-    def get_used_count(self):
-        return len(self.used_ids)
+    def get_used_count(self) -> int:
+        return self.current_id - len(self._released_set)
+
+
+@dataclass
+class _PendingChange:
+    subscription: SubscriptionWithId
+    future: asyncio.Future
+    # The broker already has a subscription for this topic with the same identifier
+    replaces_existing: bool = False
 
 
 class SubscriptionManager:
-    def __init__(self, connector: BaseConnector):
+    """Keeps track of subscriptions and their identifiers.
+
+    With a non-zero ``batch_window`` changes are queued for that many seconds before they are
+    sent: a subscribe and an unsubscribe of the same topic within the window cancel out, and
+    the queued unsubscribes go out as batched UNSUBSCRIBE packets. Every call still returns
+    only once the broker has acknowledged it (or once it was cancelled out).
+    """
+
+    def __init__(
+        self,
+        connector: BaseConnector,
+        batch_window: float = 0.0,
+        max_batch_size: int = 1000,
+    ):
         self._connector = connector
         self._id_manager = IdManager()
         self._id_to_subscription: dict[int, SubscriptionWithId] = {}
+        self._topic_to_subscription: dict[str, SubscriptionWithId] = {}
+        self._callback_to_ids: dict[CallbackType, set[int]] = {}
+
+        self._batch_window = batch_window
+        self._max_batch_size = max_batch_size
+        self._pending_subscribe: dict[str, _PendingChange] = {}
+        self._pending_unsubscribe: dict[str, _PendingChange] = {}
+        self._flush_task: asyncio.Task | None = None
 
     def get_subscription(self, identifier: int) -> SubscriptionWithId | None:
         return self._id_to_subscription.get(identifier)
 
-    async def subscribe(self, subscription: Subscription) -> SubscriptionWithId:
-        identifier = self._id_manager.get_id()
-        await self._connector.subscribe(
+    def get_subscription_by_topic(self, topic: str) -> SubscriptionWithId | None:
+        return self._topic_to_subscription.get(topic)
+
+    def match(self, topic: str) -> list[SubscriptionWithId]:
+        """Subscriptions whose topic filter matches ``topic``."""
+        return [
+            subscription
+            for topic_filter, subscription in self._topic_to_subscription.items()
+            if topic_matches(topic_filter, topic)
+        ]
+
+    def get_callback_subscriptions(self, callback: CallbackType) -> list[SubscriptionWithId]:
+        return [self._id_to_subscription[id_] for id_ in self._callback_to_ids.get(callback, ())]
+
+    def index_callback(self, subscription: SubscriptionWithId, callback: CallbackType) -> None:
+        self._callback_to_ids.setdefault(callback, set()).add(subscription.id)
+
+    def _unindex_callback(self, subscription: SubscriptionWithId, callback: CallbackType) -> None:
+        ids = self._callback_to_ids.get(callback)
+        if ids is None:
+            return
+
+        ids.discard(subscription.id)
+        if not ids:
+            del self._callback_to_ids[callback]
+
+    def _add(
+        self, subscription: Subscription, identifier: int | None = None
+    ) -> SubscriptionWithId:
+        subscription_with_id = SubscriptionWithId(
+            callbacks=subscription.callbacks,
             topic=subscription.topic,
             options=subscription.options,
-            properties=SubscribeProperties(
-                subscription_identifier=identifier,
-            ),
+            id=self._id_manager.get_id() if identifier is None else identifier,
         )
+        self._id_to_subscription[subscription_with_id.id] = subscription_with_id
+        self._index(subscription_with_id)
+        return subscription_with_id
 
-        subscription_with_id = SubscriptionWithId(
-            callbacks=subscription.callbacks,
+    def _index(self, subscription: SubscriptionWithId) -> None:
+        self._topic_to_subscription[subscription.topic] = subscription
+        for callback in subscription.callbacks:
+            self.index_callback(subscription, callback)
+
+    def _unindex(self, subscription: SubscriptionWithId) -> None:
+        if self._topic_to_subscription.get(subscription.topic) is subscription:
+            del self._topic_to_subscription[subscription.topic]
+        for callback in subscription.callbacks:
+            self._unindex_callback(subscription, callback)
+
+    def _release(self, subscription: SubscriptionWithId) -> None:
+        if self._id_to_subscription.get(subscription.id) is subscription:
+            del self._id_to_subscription[subscription.id]
+            self._id_manager.put_back(subscription.id)
+
+    async def _send_subscribe(self, subscription: SubscriptionWithId) -> None:
+        await self._connector.subscribe(
             topic=subscription.topic,
             options=subscription.options,
-            id=identifier,
+            properties=SubscribeProperties(
+                subscription_identifier=subscription.id,
+            ),
         )
-        self._id_to_subscription[identifier] = subscription_with_id
+
+    async def subscribe(self, subscription: Subscription) -> SubscriptionWithId:
+        if self._batch_window:
+            return await self._queue_subscribe(subscription)
+
+        # Registered before the SUBSCRIBE is sent, so concurrent subscribes to the same topic
+        # find it instead of sending a second SUBSCRIBE
+        subscription_with_id = self._add(subscription)
+        try:
+            await self._send_subscribe(subscription_with_id)
+        except BaseException:
+            self._unindex(subscription_with_id)
+            self._release(subscription_with_id)
+            raise
+
         return subscription_with_id
 
+    def add_local(self, subscription: Subscription) -> SubscriptionWithId:
+        """Register a subscription without sending a SUBSCRIBE."""
+        existing = self._topic_to_subscription.get(subscription.topic)
+        if existing is not None:
+            return existing
+        return self._add(subscription)
+
     async def subscribe_multiple(
         self, subscriptions: list[Subscription]
     ) -> list[SubscriptionWithId]:
@@ -77,33 +196,175 @@ class SubscriptionManager:
             *[self.subscribe(subscription) for subscription in subscriptions]
         )
 
+    async def resubscribe(self) -> None:
+        """Send the SUBSCRIBE packets again, with the current identifiers,
+        e.g. after reconnecting to a broker that did not keep the session."""
+        subscriptions = [
+            subscription
+            for topic, subscription in self._topic_to_subscription.items()
+            if topic not in self._pending_subscribe
+        ]
+        for i in range(0, len(subscriptions), self._max_batch_size):
+            await asyncio.gather(
+                *[
+                    self._send_subscribe(subscription)
+                    for subscription in subscriptions[i : i + self._max_batch_size]
+                ]
+            )
+
     async def unsubscribe(
         self,
         identifier: int | None = None,
         topic: str | None = None,
         subscription: SubscriptionWithId | None = None,
         callback: CallbackType | None = None,
-    ) -> None:
-        if len([arg for arg in [identifier, topic, subscription] if arg is not None]) != 1:
+    ) -> list[SubscriptionWithId]:
+        """Returns the subscriptions that were removed completely."""
+        subscriptions = self._lookup(identifier, topic, subscription, callback)
+        if not subscriptions:
+            raise FastMQTTError("Subscription not found")
+
+        removed = []
+        for subscription in subscriptions:
+            if callback is not None:
+                subscription.callbacks.remove(callback)
+                if callback not in subscription.callbacks:
+                    self._unindex_callback(subscription, callback)
+
+            if callback is None or not subscription.callbacks:
+                removed.append(subscription)
+
+        if self._batch_window:
+            await asyncio.gather(*[self._queue_unsubscribe(sub) for sub in removed])
+            return removed
+
+        for subscription in removed:
+            await self._connector.unsubscribe(topic=subscription.topic)
+            self._unindex(subscription)
+            self._release(subscription)
+
+        return removed
+
+    def _lookup(
+        self,
+        identifier: int | None,
+        topic: str | None,
+        subscription: SubscriptionWithId | None,
+        callback: CallbackType | None,
+    ) -> list[SubscriptionWithId]:
+        lookups = len([arg for arg in [identifier, topic, subscription] if arg is not None])
+        if lookups > 1 or (lookups == 0 and callback is None):
             raise ValueError(
-                "Exactly one of arguments (identifier, topic or subscription) must be provided"
+                "Exactly one of arguments (identifier, topic or subscription) "
+                "or only callback must be provided"
             )
 
+        if lookups == 0:
+            return self.get_callback_subscriptions(callback)  # type: ignore[arg-type]
+
         if identifier is not None:
             subscription = self._id_to_subscription.get(identifier)
         if topic is not None:
-            subscription = next(
-                (sub for sub in self._id_to_subscription.values() if sub.topic == topic),
-                None,
+            subscription = self._topic_to_subscription.get(topic)
+
+        return [] if subscription is None else [subscription]
+
+    def _queue_subscribe(self, subscription: Subscription) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+
+        pending = self._pending_unsubscribe.pop(subscription.topic, None)
+        if pending is None:
+            self._pending_subscribe[subscription.topic] = _PendingChange(
+                self._add(subscription), future
             )
+            self._schedule_flush()
+            return future
 
-        if subscription is None:
-            raise FastMQTTError("Subscription not found")
+        # The broker still has this topic, take over its identifier instead of sending
+        # an UNSUBSCRIBE followed by a SUBSCRIBE
+        pending.future.set_result(None)
+        subscription_with_id = self._add(subscription, identifier=pending.subscription.id)
+        if subscription.options == pending.subscription.options:
+            future.set_result(subscription_with_id)
+            return future
 
-        if callback is not None:
-            subscription.callbacks.remove(callback)
+        self._pending_subscribe[subscription.topic] = _PendingChange(
+            subscription_with_id, future, replaces_existing=True
+        )
+        self._schedule_flush()
+        return future
 
-        if callback is None or not subscription.callbacks:
-            await self._connector.unsubscribe(topic=subscription.topic)
-            self._id_to_subscription.pop(subscription.id, None)
-            self._id_manager.put_back(subscription.id)
+    def _queue_unsubscribe(self, subscription: SubscriptionWithId) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        # Stop resolving the topic right away, but keep routing messages by identifier
+        # until the broker acknowledges the UNSUBSCRIBE
+        self._unindex(subscription)
+
+        pending = self._pending_subscribe.pop(subscription.topic, None)
+        if pending is not None:
+            pending.future.set_result(pending.subscription)
+            if not pending.replaces_existing:
+                self._release(subscription)
+                future.set_result(None)
+                return future
+
+        self._pending_unsubscribe[subscription.topic] = _PendingChange(subscription, future)
+        self._schedule_flush()
+        return future
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None:
+            self._flush_task = self._connector.supervisor.spawn(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._batch_window)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Send all queued changes now."""
+        unsubscribes = list(self._pending_unsubscribe.values())
+        subscribes = list(self._pending_subscribe.values())
+        self._pending_unsubscribe.clear()
+        self._pending_subscribe.clear()
+
+        await asyncio.gather(
+            *[
+                self._flush_unsubscribes(unsubscribes[i : i + self._max_batch_size])
+                for i in range(0, len(unsubscribes), self._max_batch_size)
+            ],
+            *[self._flush_subscribe(change) for change in subscribes],
+        )
+
+    async def _flush_unsubscribes(self, changes: list[_PendingChange]) -> None:
+        try:
+            await self._connector.unsubscribe_multiple(
+                [change.subscription.topic for change in changes]
+            )
+        except Exception as e:
+            for change in changes:
+                self._index(change.subscription)
+                if not change.future.done():
+                    change.future.set_exception(e)
+            return
+
+        for change in changes:
+            self._release(change.subscription)
+            if not change.future.done():
+                change.future.set_result(None)
+
+    async def _flush_subscribe(self, change: _PendingChange) -> None:
+        # A SUBSCRIBE packet carries a single subscription identifier, so subscriptions
+        # are sent as separate (concurrent) packets
+        try:
+            await self._send_subscribe(change.subscription)
+        except Exception as e:
+            if not change.replaces_existing:
+                self._unindex(change.subscription)
+                self._release(change.subscription)
+            if not change.future.done():
+                change.future.set_exception(e)
+            return
+
+        if not change.future.done():
+            change.future.set_result(change.subscription)
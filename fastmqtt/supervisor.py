@@ -0,0 +1,137 @@
+import asyncio
+import contextvars
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine
+
+log = logging.getLogger(__name__)
+
+# The supervised futures the running code belongs to, drain() called from it does not wait for
+# them: a callback waits on the dispatch task that started it, which waits on the callback
+_running: contextvars.ContextVar[tuple[asyncio.Future, ...]] = contextvars.ContextVar(
+    "fastmqtt_supervised", default=()
+)
+
+
+def _describe(future: asyncio.Future) -> str:
+    if isinstance(future, asyncio.Task):
+        coro = future.get_coro()
+        return f"{future.get_name()} ({getattr(coro, '__qualname__', coro)})"
+    return repr(future)
+
+
+@dataclass(frozen=True)
+class DrainReport:
+    completed: int
+    cancelled: int
+    elapsed: float
+    # Descriptions of the tasks left, cancelled ones and held futures (see hold())
+    unfinished: list[str]
+
+
+class TaskSupervisor:
+    """Holds a reference to the background tasks of a client (dispatches, callbacks,
+    publishes waiting for their acknowledgement), so they are not garbage collected while
+    running, failures are logged and ``drain()`` can wait for them on shutdown.
+    """
+
+    def __init__(self) -> None:
+        # Future -> whether its exception is logged, the result of publishes is awaited
+        self._tasks: dict[asyncio.Future, bool] = {}
+        # Called when a drain starts, for tasks that run until they are told to stop
+        self._on_drain: dict[asyncio.Future, Callable[[], Any]] = {}
+        # Futures of work done by tasks the supervisor does not own, not cancelled by a drain
+        self._held: dict[asyncio.Future, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def spawn(
+        self,
+        coro: Coroutine[Any, Any, Any],
+        name: str | None = None,
+        log_errors: bool = True,
+        on_drain: Callable[[], Any] | None = None,
+    ) -> asyncio.Task:
+        context = contextvars.copy_context()
+        task = asyncio.create_task(coro, name=name, context=context)
+        # Set before the task runs its first step
+        context.run(_running.set, (*_running.get(), task))
+        self.track(task, log_errors, on_drain)
+        return task
+
+    def track(
+        self,
+        future: asyncio.Future,
+        log_errors: bool = True,
+        on_drain: Callable[[], Any] | None = None,
+    ) -> None:
+        self._tasks[future] = log_errors
+        if on_drain is not None:
+            self._on_drain[future] = on_drain
+        future.add_done_callback(self._done)
+
+    def hold(self, description: str) -> asyncio.Future[None]:
+        """A future for work done by the caller's own task (e.g. a publish waiting for its
+        acknowledgement), resolve it once done. A drain waits for it and reports it unfinished
+        after the timeout, but does not cancel the caller."""
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._held[future] = description
+        self.track(future, log_errors=False)
+        return future
+
+    def enter(self, future: asyncio.Future) -> None:
+        """Mark the running code as working for the tracked ``future``, which is not a task
+        created by ``spawn`` (e.g. the future of a scheduled job)."""
+        _running.set((*_running.get(), future))
+
+    async def drain(self, timeout: float) -> DrainReport:
+        """Wait up to ``timeout`` seconds for the tasks, tasks started meanwhile included, then
+        cancel the ones left, held futures excepted."""
+        start = time.monotonic()
+        deadline = start + timeout
+        for on_drain in list(self._on_drain.values()):
+            on_drain()
+
+        # disconnect() may be called from a callback, which must not wait for itself nor for
+        # the tasks waiting on it
+        running = {asyncio.current_task(), *_running.get()}
+        completed = 0
+        while True:
+            pending = [task for task in self._tasks if task not in running]
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            done, _ = await asyncio.wait(pending, timeout=remaining)
+            completed += len(done)
+
+        unfinished = [self._held.get(task) or _describe(task) for task in pending]
+        cancelled = [task for task in pending if task not in self._held]
+        for task in cancelled:
+            task.cancel()
+        if cancelled:
+            await asyncio.wait(cancelled)
+        if pending:
+            log.warning(
+                f"{len(pending)} tasks did not finish within {timeout}s, {len(cancelled)} were "
+                "cancelled: " + ", ".join(unfinished)
+            )
+
+        return DrainReport(
+            completed=completed,
+            cancelled=len(cancelled),
+            elapsed=time.monotonic() - start,
+            unfinished=unfinished,
+        )
+
+    def _done(self, future: asyncio.Future) -> None:
+        log_errors = self._tasks.pop(future, False)
+        self._on_drain.pop(future, None)
+        self._held.pop(future, None)
+        if future.cancelled():
+            return
+
+        exception = future.exception()
+        if exception is not None and log_errors:
+            log.error(f"Task {_describe(future)} failed", exc_info=exception)
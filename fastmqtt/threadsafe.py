@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import queue
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Any
+
+from .exceptions import FastMQTTError
+from .properties import PublishProperties
+
+if TYPE_CHECKING:
+    from .fastmqtt import FastMQTT
+
+log = logging.getLogger(__name__)
+
+_Item = tuple[str, Any, int, bool, PublishProperties | None]
+
+
+class ThreadSafePublisher:
+    """Publishes messages from threads other than the event loop's.
+
+    ``publish()`` appends to a deque (atomic, no lock) and wakes the loop only if it is not
+    already scheduled to drain the queue, so a burst of messages costs one wakeup. The loop
+    hands up to ``batch_size`` messages at a time to ``FastMQTT.publish``. With ``maxsize``
+    producers block (or raise ``queue.Full``) while that many messages are waiting.
+
+        async with ThreadSafePublisher(fastmqtt) as publisher:
+            threading.Thread(target=driver, args=(publisher,)).start()
+    """
+
+    def __init__(self, fastmqtt: "FastMQTT", maxsize: int = 10000, batch_size: int = 1000):
+        self._fastmqtt = fastmqtt
+        self._batch_size = batch_size
+        self._queue: deque[_Item] = deque()
+        self._slots = threading.Semaphore(maxsize) if maxsize > 0 else None
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup = asyncio.Event()
+        self._wakeup_scheduled = False
+        self._closed = False
+        self._task: asyncio.Task | None = None
+
+        self.published = 0
+        self.failed = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def publish(
+        self,
+        topic: str,
+        payload: Any = None,
+        qos: int = 0,
+        retain: bool = False,
+        properties: PublishProperties | None = None,
+        block: bool = True,
+        timeout: float | None = None,
+    ) -> None:
+        """Queue a message, can be called from any thread but the event loop's if it may
+        block."""
+        if self._closed or self._loop is None:
+            raise FastMQTTError("Publisher is not running")
+
+        if self._slots is not None and not self._slots.acquire(blocking=block, timeout=timeout):
+            raise queue.Full
+
+        self._queue.append((topic, payload, qos, retain, properties))
+        if not self._wakeup_scheduled:
+            self._wakeup_scheduled = True
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._closed = False
+        # A drain stops it like close(), then waits for the queued messages
+        self._task = self._fastmqtt.supervisor.spawn(self._run(), on_drain=self._stop)
+
+    async def close(self) -> None:
+        """Stop accepting messages and publish the queued ones."""
+        self._stop()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    def _stop(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+
+    async def __aenter__(self) -> "ThreadSafePublisher":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Cleared before draining: a message appended after this is either drained
+            # below or its producer schedules a new wakeup
+            self._wakeup_scheduled = False
+
+            while self._queue:
+                batch = [
+                    self._queue.popleft() for _ in range(min(self._batch_size, len(self._queue)))
+                ]
+                if self._slots is not None:
+                    self._slots.release(len(batch))
+                await self._publish_batch(batch)
+
+            if self._closed:
+                return
+
+    async def _publish_batch(self, batch: list[_Item]) -> None:
+        results = await asyncio.gather(
+            *[self._fastmqtt.publish(*item) for item in batch], return_exceptions=True
+        )
+        for (topic, *_), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                self.failed += 1
+                log.error(f"Failed to publish to {topic}: {result!r}")
+            else:
+                self.published += 1
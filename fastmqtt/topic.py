@@ -0,0 +1,103 @@
+import re
+from functools import lru_cache
+from typing import Callable
+
+from .exceptions import FastMQTTError
+
+SHARED_PREFIX = "$share/"
+
+
+def strip_shared_prefix(topic_filter: str) -> str:
+    if topic_filter.startswith(SHARED_PREFIX):
+        return topic_filter.split("/", 2)[2]
+
+    return topic_filter
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    filter_levels = strip_shared_prefix(topic_filter).split("/")
+    topic_levels = topic.split("/")
+
+    if topic.startswith("$") and filter_levels[0] in ("+", "#"):
+        return False
+
+    for index, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+
+        if index >= len(topic_levels):
+            return False
+
+        if level != "+" and level != topic_levels[index]:
+            return False
+
+    return len(filter_levels) == len(topic_levels)
+
+
+# A whole level naming a parameter: {name}, {name:+} or {name:#}
+_PARAMETER = re.compile(r"\{(\w+)(?::([+#]))?\}")
+
+
+@lru_cache(maxsize=4096)
+def split_topic(topic: str) -> tuple[str, ...]:
+    return tuple(topic.split("/"))
+
+
+class TopicTemplate:
+    """A topic filter with named levels.
+
+    ``sensors/{device_id}/temperature`` subscribes to ``sensors/+/temperature`` and
+    ``logs/{path:#}`` to ``logs/#``, whose parameter is the rest of the topic. The parameters of
+    the last ``cache_size`` topics are cached.
+    """
+
+    def __init__(self, template: str, cache_size: int = 1024) -> None:
+        self.template = template
+        self.cache_size = cache_size
+        prefix = ""
+        if template.startswith(SHARED_PREFIX):
+            share, group, template = template.split("/", 2)
+            prefix = f"{share}/{group}/"
+
+        levels = template.split("/")
+        filter_levels = []
+        # Parameter name -> (level index, multi-level)
+        self.parameters: dict[str, tuple[int, bool]] = {}
+        for index, level in enumerate(levels):
+            match = _PARAMETER.fullmatch(level)
+            if match is None:
+                filter_levels.append(level)
+                continue
+
+            name, wildcard = match.groups()
+            if name in self.parameters:
+                raise FastMQTTError(f"Duplicate parameter {name!r} in {self.template!r}")
+            if wildcard == "#" and index != len(levels) - 1:
+                raise FastMQTTError(f"{{{name}:#}} must be the last level of {self.template!r}")
+
+            self.parameters[name] = (index, wildcard == "#")
+            filter_levels.append(wildcard or "+")
+
+        self.filter = prefix + "/".join(filter_levels)
+        self.extract: Callable[[str], dict[str, str]] = lru_cache(maxsize=cache_size)(
+            self._extract
+        )
+
+    def __repr__(self) -> str:
+        return f"TopicTemplate({self.template!r})"
+
+    def _extract(self, topic: str) -> dict[str, str]:
+        levels = topic.split("/")
+        return {
+            name: "/".join(levels[index:]) if multi_level else levels[index]
+            for name, (index, multi_level) in self.parameters.items()
+        }
+
+
+def parse_template(topic: str) -> TopicTemplate | None:
+    """The template of ``topic``, None if it has no parameters."""
+    if "{" not in topic:
+        return None
+
+    template = TopicTemplate(topic)
+    return template if template.parameters else None
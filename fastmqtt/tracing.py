@@ -0,0 +1,207 @@
+import enum
+import importlib
+import logging
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from typing import Any, ContextManager, Iterator
+
+from .properties import PublishProperties
+
+log = logging.getLogger(__name__)
+
+TRACEPARENT = "traceparent"
+
+
+class SpanKind(enum.Enum):
+    INTERNAL = "internal"
+    PRODUCER = "producer"
+    CONSUMER = "consumer"
+    CLIENT = "client"
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @classmethod
+    def from_traceparent(cls, value: str) -> "SpanContext | None":
+        parts = value.split("-")
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        return cls(trace_id=parts[1], span_id=parts[2])
+
+
+@dataclass
+class Span:
+    name: str
+    kind: SpanKind
+    context: SpanContext
+    parent: SpanContext | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    start: float = field(default_factory=time.perf_counter)
+    end: float | None = None
+    error: BaseException | None = None
+
+    @property
+    def duration(self) -> float | None:
+        return None if self.end is None else self.end - self.start
+
+
+_current_span: ContextVar[Span | None] = ContextVar("fastmqtt_current_span", default=None)
+
+
+def _get_user_property(properties: PublishProperties | None, key: str) -> str | None:
+    if properties is None:
+        return None
+
+    for name, value in properties.user_property:
+        if name == key:
+            return value
+    return None
+
+
+class Tracer:
+    """Propagates W3C trace context in the ``traceparent`` user property.
+
+    The current span follows the asyncio context: a message published from a callback carries
+    the callback's span as its parent. Override ``on_span_end`` to export the spans, by default
+    they are logged at debug level.
+    """
+
+    def inject(self, properties: PublishProperties | None) -> PublishProperties | None:
+        span = _current_span.get()
+        if span is None:
+            return properties
+
+        user_property = [(TRACEPARENT, span.context.to_traceparent())]
+        if properties is None:
+            return PublishProperties(user_property=user_property)
+
+        # Copied, the caller may reuse its properties for other messages
+        return replace(
+            properties,
+            user_property=[
+                *(item for item in properties.user_property if item[0] != TRACEPARENT),
+                *user_property,
+            ],
+        )
+
+    def extract(self, properties: PublishProperties | None) -> Any:
+        traceparent = _get_user_property(properties, TRACEPARENT)
+        return None if traceparent is None else SpanContext.from_traceparent(traceparent)
+
+    def current_context(self) -> Any:
+        """The context of the current span, to pass as ``parent`` to a span started in
+        another task."""
+        span = _current_span.get()
+        return None if span is None else span.context
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        kind: SpanKind = SpanKind.INTERNAL,
+        parent: Any = None,
+        attributes: dict[str, Any] | None = None,
+    ) -> Iterator[Span]:
+        if parent is None and (current := _current_span.get()) is not None:
+            parent = current.context
+
+        span = Span(
+            name=name,
+            kind=kind,
+            context=SpanContext(
+                trace_id=parent.trace_id if parent is not None else secrets.token_hex(16),
+                span_id=secrets.token_hex(8),
+            ),
+            parent=parent,
+            attributes=attributes or {},
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = e
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+            self.on_span_end(span)
+
+    def on_span_end(self, span: Span) -> None:
+        log.debug(
+            f"Span {span.name} ({span.kind.value}) trace={span.context.trace_id} "
+            f"span={span.context.span_id} took {span.duration:.6f}s"
+        )
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+class OpenTelemetryTracer(Tracer):
+    """Creates OpenTelemetry spans and uses the configured OpenTelemetry propagator."""
+
+    def __init__(self, tracer_provider: Any = None) -> None:
+        try:
+            context = importlib.import_module("opentelemetry.context")
+            propagate = importlib.import_module("opentelemetry.propagate")
+            trace = importlib.import_module("opentelemetry.trace")
+        except ImportError as e:
+            raise ImportError(
+                "opentelemetry is required for OpenTelemetryTracer, "
+                "install it with `pip install opentelemetry-api`"
+            ) from e
+
+        self._context = context
+        self._propagate = propagate
+        self._tracer = trace.get_tracer("fastmqtt", tracer_provider=tracer_provider)
+        self._kinds = {
+            SpanKind.INTERNAL: trace.SpanKind.INTERNAL,
+            SpanKind.PRODUCER: trace.SpanKind.PRODUCER,
+            SpanKind.CONSUMER: trace.SpanKind.CONSUMER,
+            SpanKind.CLIENT: trace.SpanKind.CLIENT,
+        }
+
+    def inject(self, properties: PublishProperties | None) -> PublishProperties | None:
+        carrier: dict[str, str] = {}
+        self._propagate.inject(carrier)
+        if not carrier:
+            return properties
+
+        if properties is None:
+            return PublishProperties(user_property=list(carrier.items()))
+
+        return replace(
+            properties,
+            user_property=[
+                *(item for item in properties.user_property if item[0] not in carrier),
+                *carrier.items(),
+            ],
+        )
+
+    def extract(self, properties: PublishProperties | None) -> Any:
+        if properties is None or not properties.user_property:
+            return None
+        return self._propagate.extract(dict(properties.user_property))
+
+    def current_context(self) -> Any:
+        return self._context.get_current()
+
+    def start_span(
+        self,
+        name: str,
+        kind: SpanKind = SpanKind.INTERNAL,
+        parent: Any = None,
+        attributes: dict[str, Any] | None = None,
+    ) -> ContextManager[Any]:
+        return self._tracer.start_as_current_span(
+            name, context=parent, kind=self._kinds[kind], attributes=attributes
+        )
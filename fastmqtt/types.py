@@ -1,5 +1,5 @@
 import enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import TYPE_CHECKING, Any, Callable, Coroutine
 
 from .properties import PublishProperties
@@ -48,13 +48,54 @@ class RawMessage:
     properties: PublishProperties
 
 
+class Acknowledgement:
+    """Sends the PUBACK/PUBCOMP of a message received in manual acknowledgement mode, once."""
+
+    def __init__(self, callback: Callable[[], None]) -> None:
+        self._callback = callback
+        self.done = False
+
+    def __call__(self) -> None:
+        if self.done:
+            return
+
+        self.done = True
+        self._callback()
+
+
 @dataclass(frozen=True)
 class Message(RawMessage):
     payload: Payload
     client: "FastMQTT"
+    acknowledgement: Acknowledgement | None = field(default=None, repr=False, compare=False)
+    # Results of the dependencies of its callbacks, see fastmqtt.dependencies.Depends
+    dependency_cache: dict[Any, Any] = field(default_factory=dict, repr=False, compare=False)
+    # Context of the receive span, the parent of the callback spans (see fastmqtt.tracing)
+    trace_context: Any = field(default=None, repr=False, compare=False)
+
+    def ack(self) -> None:
+        """Acknowledge the message now instead of after all callbacks have finished.
+        Does nothing unless manual acknowledgement is enabled and the message has QoS > 0."""
+        if self.acknowledgement is not None:
+            self.acknowledgement()
 
 
 CallbackType = Callable[[Message], Coroutine[None, None, Any]]
+# middleware(message, call_next), awaits call_next(message) to run the rest of the chain
+Middleware = Callable[[Message, CallbackType], Coroutine[None, None, Any]]
+
+
+@dataclass
+class OutgoingMessage:
+    topic: str
+    payload: Any = None
+    qos: int = 0
+    retain: bool = False
+    properties: PublishProperties | None = None
+
+
+PublishCallbackType = Callable[[OutgoingMessage], Coroutine[None, None, None]]
+PublishMiddleware = Callable[[OutgoingMessage, PublishCallbackType], Coroutine[None, None, None]]
 
 
 @dataclass
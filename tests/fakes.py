@@ -0,0 +1,77 @@
+import asyncio
+
+from fastmqtt.connectors.base import BaseConnector
+from fastmqtt.properties import PublishProperties
+from fastmqtt.types import PayloadType, RawMessage
+
+
+class FakeConnector(BaseConnector):
+    """Records the packets it would send, publishes take ``latency`` seconds."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.latency = 0.0
+        self.published: list[tuple[str, PayloadType, int, PublishProperties | None]] = []
+        self.subscribed: list[str] = []
+        self.acked: list[int] = []
+
+    async def subscribe(self, topic, options=None, properties=None) -> None:
+        self.subscribed.append(topic)
+
+    async def subscribe_multiple(self, topics, properties=None) -> None:
+        self.subscribed.extend(topic for topic, _ in topics)
+
+    async def unsubscribe(self, topic, properties=None) -> None:
+        self.subscribed.remove(topic)
+
+    async def unsubscribe_multiple(self, topics, properties=None) -> None:
+        for topic in topics:
+            self.subscribed.remove(topic)
+
+    async def publish(self, topic, payload=None, qos=0, retain=False, properties=None) -> None:
+        await asyncio.sleep(self.latency)
+        self.published.append((topic, payload, qos, properties))
+
+    def ack(self, message: RawMessage) -> None:
+        self.acked.append(message.mid)
+
+    async def connect(self) -> None:
+        self.connected_event.set()
+        self.disconnected_event.clear()
+        callbacks = self._connect_callbacks
+        if not self._first_connect:
+            callbacks = callbacks + self._reconnect_callbacks
+        self._first_connect = False
+        for callback in callbacks:
+            await callback()
+
+    async def disconnect(self) -> None:
+        self.connected_event.clear()
+        self.disconnected_event.set()
+
+    def deliver(self, *args, **kwargs) -> RawMessage:
+        """Hand a message to the message callbacks, as the connector does with a received one."""
+        message = make_message(*args, **kwargs)
+        for callback in self._message_callbacks:
+            self.supervisor.spawn(callback(message))
+        return message
+
+
+def make_message(
+    topic: str,
+    payload: bytes = b"",
+    subscription_identifier: list[int] | None = None,
+    qos: int = 0,
+    mid: int = 1,
+    **properties,
+) -> RawMessage:
+    return RawMessage(
+        topic=topic,
+        payload=payload,
+        qos=qos,
+        retain=False,
+        mid=mid,
+        properties=PublishProperties(
+            subscription_identifier=subscription_identifier or [1], **properties
+        ),
+    )
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from fastmqtt import AdmissionController, FastMQTT
+from fastmqtt.connectors import get_connector
+from tests.fakes import FakeConnector, make_message
+
+
+def _run(controller: AdmissionController, shed_policy: str, count: int) -> list[int]:
+    """Dispatches ``count`` messages to a callback that runs until all of them arrived,
+    returns the mids it finished."""
+    app = FastMQTT("localhost", connector_type=FakeConnector, admission_controller=controller)
+    finished = []
+    release = None
+
+    @app.on_message("a", shed_policy=shed_policy)
+    async def callback(message) -> None:
+        await release.wait()
+        finished.append(message.mid)
+
+    async def main() -> None:
+        nonlocal release
+        release = asyncio.Event()
+        [subscription] = app.subscribe_offline()
+        tasks = [
+            asyncio.create_task(
+                app.dispatch(make_message("a", subscription_identifier=[subscription.id], mid=mid))
+            )
+            for mid in range(count)
+        ]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*tasks)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    return sorted(finished)
+
+
+def test_drop_newest() -> None:
+    controller = AdmissionController(max_pending=2)
+    assert _run(controller, "drop_newest", 5) == [0, 1]
+    stats = controller.stats()
+    assert stats.shed == 3
+    assert not stats.paused
+
+
+def test_drop_oldest() -> None:
+    controller = AdmissionController(max_pending=2)
+    assert _run(controller, "drop_oldest", 5) == [3, 4]
+    assert controller.stats().shed == 3
+
+
+def test_sample() -> None:
+    controller = AdmissionController(max_pending=2, sample_rate=0.5)
+    # Every second message over the limit
+    assert _run(controller, "sample", 6) == [0, 1, 3, 5]
+    assert controller.stats().shed == 2
+
+
+def test_block_pauses_until_the_backlog_drains() -> None:
+    controller = AdmissionController(max_pending=2, resume_ratio=0.5)
+    assert _run(controller, "block", 3) == [0, 1, 2]
+    stats = controller.stats()
+    assert (stats.shed, stats.pauses, stats.paused) == (0, 1, False)
+    assert controller.receiving_event.is_set()
+
+
+def test_paused_client_drops_qos0_over_the_backlog() -> None:
+    controller = AdmissionController(max_backlog=3)
+    assert controller.accept(0, 10)
+    controller._pause()
+    assert controller.accept(0, 2)
+    assert controller.accept(1, 10)
+    assert not controller.accept(0, 3)
+    assert controller.stats().dropped_backlog == 1
+
+
+def test_paused_connector_bounds_its_queue() -> None:
+    mqttools = pytest.importorskip("mqttools")
+    connector_type = get_connector("aiomqtt")
+    controller = AdmissionController(max_backlog=5)
+    received = []
+
+    async def on_message(message) -> None:
+        received.append(message.payload)
+
+    async def main() -> None:
+        broker = mqttools.Broker(("127.0.0.1", 18884))
+        broker_task = asyncio.create_task(broker.serve_forever())
+        await broker.getsockname()
+        receiver = connector_type("127.0.0.1", 18884, client_id="admission-receiver")
+        sender = connector_type("127.0.0.1", 18884, client_id="admission-sender")
+        receiver.admission_controller = controller
+        receiver.add_message_callback(on_message)
+        try:
+            await receiver.connect()
+            await sender.connect()
+            await receiver.subscribe("a")
+            controller._pause()
+            for index in range(50):
+                await sender.publish("a", str(index).encode())
+            await asyncio.sleep(0.2)
+            controller._resume()
+            await asyncio.sleep(0.2)
+        finally:
+            await sender.disconnect()
+            await receiver.disconnect()
+            broker_task.cancel()
+
+    asyncio.run(main())
+    # The one taken before the pause was seen and the ones queued meanwhile
+    assert controller.stats().dropped_backlog == 50 - len(received)
+    assert len(received) <= 1 + 5
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from fastmqtt.bench import BenchConfig, _topic_filter, run_bench
+
+
+@pytest.mark.parametrize(
+    ("topic", "expected"),
+    [
+        ("fastmqtt/bench/{client}", "fastmqtt/bench/+"),
+        ("dev{client}/x", "+/x"),
+        ("devices/{client}/{seq}", "devices/+/+"),
+        ("static/topic", "static/topic"),
+    ],
+)
+def test_topic_filter(topic: str, expected: str) -> None:
+    assert _topic_filter(topic) == expected
+
+
+def test_embedded_broker() -> None:
+    pytest.importorskip("mqttools")
+    config = BenchConfig(
+        port=18883, clients=5, rate=20, duration=0.5, topic="dev{client}/x", embedded_broker=True
+    )
+
+    result = asyncio.run(run_bench(config))
+
+    assert result.errors == 0
+    assert result.sent > 0
+    assert result.received == result.sent
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from fastmqtt import FastMQTT
+from fastmqtt.cache import LastValueCache
+from tests.fakes import FakeConnector, make_message
+
+
+def _app(cache: LastValueCache) -> FastMQTT:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    app.register(cache, "plant/#")
+    return app
+
+
+async def _deliver(app: FastMQTT, topic: str, payload: bytes) -> None:
+    [subscription] = app.match_subscriptions(topic)
+    message = make_message(topic, payload, subscription_identifier=[subscription.id])
+    await app.dispatch(message, wait=True)
+
+
+def test_last_value_and_wildcards() -> None:
+    cache = LastValueCache()
+    app = _app(cache)
+
+    async def main() -> None:
+        app.subscribe_offline()
+        for topic, payload in [
+            ("plant/1/temp", b"20"),
+            ("plant/1/temp", b"21"),
+            ("plant/1/pressure", b"1"),
+            ("plant/2/temp", b"19"),
+        ]:
+            await _deliver(app, topic, payload)
+
+    asyncio.run(main())
+    assert len(cache) == 3
+    assert cache["plant/1/temp"].payload.raw() == b"21"
+    assert set(cache.match("plant/+/temp")) == {"plant/1/temp", "plant/2/temp"}
+    assert set(cache.match("plant/1/#")) == {"plant/1/temp", "plant/1/pressure"}
+    assert set(cache.match("$share/group/plant/2/temp")) == {"plant/2/temp"}
+    assert cache.match("plant/3/temp") == {}
+
+
+def test_empty_payload_deletes() -> None:
+    cache = LastValueCache()
+    app = _app(cache)
+
+    async def main() -> None:
+        app.subscribe_offline()
+        await _deliver(app, "plant/1/temp", b"20")
+        await _deliver(app, "plant/1/temp", b"")
+
+    asyncio.run(main())
+    assert "plant/1/temp" not in cache
+    assert cache.match("plant/#") == {}
+    # The empty branch is pruned
+    assert cache._root.children == {}
+
+
+def test_snapshot_waits_for_the_burst_to_settle() -> None:
+    cache = LastValueCache()
+    app = _app(cache)
+
+    async def main() -> None:
+        app.subscribe_offline()
+
+        async def burst() -> None:
+            for index in range(5):
+                await _deliver(app, f"plant/{index}/temp", b"1")
+                await asyncio.sleep(0.02)
+
+        task = asyncio.create_task(burst())
+        snapshot = await cache.snapshot("plant/#", quiet_period=0.05)
+        assert task.done()
+        assert len(snapshot) == 5
+        assert cache._waiters == []
+
+    asyncio.run(main())
+
+
+def test_snapshot_timeout() -> None:
+    cache = LastValueCache()
+    app = _app(cache)
+
+    async def main() -> None:
+        app.subscribe_offline()
+
+        async def stream() -> None:
+            while True:
+                await _deliver(app, "plant/1/temp", b"1")
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(stream())
+        try:
+            with pytest.raises(TimeoutError):
+                await cache.snapshot("plant/#", quiet_period=0.05, timeout=0.1)
+        finally:
+            task.cancel()
+        assert cache._waiters == []
+
+    asyncio.run(main())
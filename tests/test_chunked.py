@@ -0,0 +1,128 @@
+import asyncio
+
+from fastmqtt import FastMQTT
+from fastmqtt.chunked import ChunkedReceiver, Transfer, publish_chunked
+from fastmqtt.encoders import NoneDecoder
+from fastmqtt.types import Message, Payload
+from tests.fakes import FakeConnector, make_message
+
+
+def _to_message(app: FastMQTT, published: tuple) -> Message:
+    topic, payload, qos, properties = published
+    raw = make_message(topic, payload, qos=qos, user_property=properties.user_property)
+    return Message(
+        topic=raw.topic,
+        payload=Payload(raw.payload, NoneDecoder()),
+        qos=raw.qos,
+        retain=raw.retain,
+        mid=raw.mid,
+        properties=raw.properties,
+        client=app,
+    )
+
+
+def test_file_round_trip(tmp_path) -> None:
+    content = bytes(range(256)) * 40
+    path = tmp_path / "firmware.bin"
+    path.write_bytes(content)
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    received = []
+
+    async def on_transfer(transfer: Transfer) -> None:
+        received.append(await transfer.read())
+
+    async def main() -> None:
+        await app.connect()
+        await publish_chunked(app, "firmware", path, qos=0, chunk_size=1000)
+        receiver = ChunkedReceiver(on_transfer)
+        messages = [_to_message(app, published) for published in app.connector.published]
+        # Out of order and duplicated
+        for message in [messages[1], *messages, messages[3]]:
+            await receiver(message)
+        await receiver.close()
+
+    asyncio.run(main())
+    assert received == [content]
+
+
+def test_write_cancelled_while_waiting_for_space() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    received = []
+
+    async def main() -> None:
+        start_reading = asyncio.Event()
+
+        async def on_transfer(transfer: Transfer) -> None:
+            await start_reading.wait()
+            received.append(await transfer.read())
+
+        await app.connect()
+        await publish_chunked(app, "firmware", b"abcdef", qos=0, chunk_size=2)
+        receiver = ChunkedReceiver(on_transfer, stream=True, max_pending=1)
+        first, second, third = [
+            _to_message(app, published) for published in app.connector.published
+        ]
+
+        await receiver(first)
+        # No space until the callback reads, cancelled like a drained message handler
+        blocked = asyncio.create_task(receiver(second))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        blocked.cancel()
+        await asyncio.gather(blocked, return_exceptions=True)
+        assert receiver.received(first.properties.user_property[0][1]) == 2
+
+        start_reading.set()
+        # Redelivered, as the cancelled message was not acknowledged
+        for message in [second, third]:
+            await receiver(message)
+        await receiver.close()
+
+    asyncio.run(main())
+    assert received == [b"abcdef"]
+
+
+def test_spooled_to_disk() -> None:
+    content = bytes(range(256)) * 40
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    received = []
+
+    async def on_transfer(transfer: Transfer) -> None:
+        assert transfer.file._rolled
+        received.append(await transfer.read())
+
+    async def main() -> None:
+        await app.connect()
+        await publish_chunked(app, "firmware", content, qos=0, chunk_size=1000)
+        receiver = ChunkedReceiver(on_transfer, max_memory=2000)
+        for published in app.connector.published:
+            await receiver(_to_message(app, published))
+        await receiver.close()
+
+    asyncio.run(main())
+    assert received == [content]
+
+
+def test_too_many_out_of_order_chunks_fail_the_transfer() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    called = []
+
+    async def on_transfer(transfer: Transfer) -> None:
+        called.append(transfer)
+
+    async def main() -> None:
+        await app.connect()
+        transfer_id = await publish_chunked(app, "firmware", b"abcdef", qos=0, chunk_size=1)
+        receiver = ChunkedReceiver(on_transfer, max_pending=2)
+        messages = [_to_message(app, published) for published in app.connector.published]
+        await receiver(messages[0])
+        for message in messages[2:5]:
+            await receiver(message)
+        # Dropped right away instead of waiting for the timeout
+        assert receiver.received(transfer_id) is None
+        for message in messages:
+            await receiver(message)
+        await receiver.close()
+
+    asyncio.run(main())
+    assert called == []
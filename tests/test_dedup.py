@@ -0,0 +1,116 @@
+import asyncio
+
+from fastmqtt import Deduplicator, FastMQTT
+from tests.fakes import FakeConnector, make_message
+
+
+def _app(deduplicator: Deduplicator) -> FastMQTT:
+    return FastMQTT(
+        "localhost", connector_type=FakeConnector, manual_ack=True, deduplicator=deduplicator
+    )
+
+
+def _message(app: FastMQTT, payload: bytes = b"", message_id: str | None = "1", mid: int = 1):
+    [subscription] = app.subscribe_offline()
+    user_property = [("message-id", message_id)] if message_id is not None else []
+    return make_message(
+        "a",
+        payload,
+        subscription_identifier=[subscription.id],
+        qos=1,
+        mid=mid,
+        user_property=user_property,
+    )
+
+
+def test_only_the_message_id_identifies_a_message_by_default() -> None:
+    deduplicator = Deduplicator()
+    app = _app(deduplicator)
+    received = []
+
+    @app.on_message("a")
+    async def callback(message) -> None:
+        received.append(message.mid)
+
+    async def main() -> None:
+        # The same reading twice, without a message-id
+        await app.dispatch(_message(app, b"20", message_id=None, mid=1), wait=True)
+        await app.dispatch(_message(app, b"20", message_id=None, mid=2), wait=True)
+        await app.dispatch(_message(app, b"20", mid=3), wait=True)
+        await app.dispatch(_message(app, b"20", mid=4), wait=True)
+
+    asyncio.run(main())
+    assert received == [1, 2, 3]
+    # The duplicate is acknowledged anyway
+    assert app.connector.acked == [1, 2, 3, 4]
+    assert deduplicator.stats().hits == 1
+
+
+def test_failed_message_is_handled_again() -> None:
+    app = _app(Deduplicator())
+    attempts = []
+
+    @app.on_message("a")
+    async def callback(message) -> None:
+        attempts.append(message.mid)
+        if len(attempts) == 1:
+            raise ValueError("failed")
+
+    async def main() -> None:
+        for mid in (1, 2, 3):
+            await app.dispatch(_message(app, mid=mid), wait=True)
+
+    asyncio.run(main())
+    assert attempts == [1, 2]
+
+
+def test_duplicate_waits_for_the_copy_being_handled() -> None:
+    app = _app(Deduplicator())
+    attempts = []
+    release = None
+
+    @app.on_message("a")
+    async def callback(message) -> None:
+        attempts.append(message.mid)
+        await release.wait()
+
+    async def main() -> None:
+        nonlocal release
+        release = asyncio.Event()
+        first = asyncio.create_task(app.dispatch(_message(app, mid=1), wait=True))
+        await asyncio.sleep(0)
+        duplicate = asyncio.create_task(app.dispatch(_message(app, mid=2), wait=True))
+        await asyncio.sleep(0.01)
+        assert attempts == [1]
+
+        # Cancelled like a drain would, the duplicate is handled instead
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert attempts == [1, 2]
+        release.set()
+        await duplicate
+
+    asyncio.run(main())
+    assert app.connector.acked == [2]
+
+
+def test_keys_are_loaded_again(tmp_path) -> None:
+    path = tmp_path / "dedup.bin"
+    received = []
+
+    async def run(deduplicator: Deduplicator) -> None:
+        app = _app(deduplicator)
+
+        @app.on_message("a")
+        async def callback(message) -> None:
+            received.append(message.mid)
+
+        await app.connect()
+        await app.dispatch(_message(app, mid=1), wait=True)
+        await app.disconnect()
+
+    asyncio.run(run(Deduplicator(path=path, flush_interval=10)))
+    assert path.stat().st_size > 0
+    asyncio.run(run(Deduplicator(path=path)))
+    assert received == [1]
@@ -0,0 +1,56 @@
+import asyncio
+
+from fastmqtt import FastMQTT
+from fastmqtt.encoders import JsonDecoder
+from tests.fakes import FakeConnector, make_message
+
+
+def test_decode_returns_a_new_value_for_each_callback() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector, payload_decoder=JsonDecoder())
+    seen = []
+
+    @app.on_message("a")
+    async def first(message) -> None:
+        message.payload.decode()["changed"] = True
+
+    @app.on_message("a")
+    async def second(message) -> None:
+        await asyncio.sleep(0)
+        seen.append(message.payload.decode())
+
+    async def main() -> None:
+        [subscription] = app.subscribe_offline()
+        message = make_message("a", b'{"value": 1}', subscription_identifier=[subscription.id])
+        await app.dispatch(message, wait=True)
+
+    asyncio.run(main())
+    assert seen == [{"value": 1}]
+
+
+def test_payload_parameter_is_decoded_once_per_message() -> None:
+    decoded = []
+
+    class CountingDecoder(JsonDecoder):
+        def __call__(self, payload: bytes):
+            decoded.append(payload)
+            return super().__call__(payload)
+
+    app = FastMQTT("localhost", connector_type=FakeConnector, payload_decoder=CountingDecoder())
+    received = []
+
+    @app.on_message("a")
+    async def first(payload: dict) -> None:
+        received.append(payload)
+
+    @app.on_message("a")
+    async def second(payload: dict) -> None:
+        received.append(payload)
+
+    async def main() -> None:
+        [subscription] = app.subscribe_offline()
+        message = make_message("a", b'{"value": 1}', subscription_identifier=[subscription.id])
+        await app.dispatch(message, wait=True)
+
+    asyncio.run(main())
+    assert received == [{"value": 1}, {"value": 1}]
+    assert len(decoded) == 1
@@ -0,0 +1,106 @@
+import asyncio
+
+import paho.mqtt.client
+import pytest
+
+from fastmqtt.connectors import get_connector
+from fastmqtt.connectors.aiomqtt.connector import _Connection
+from fastmqtt.types import SubscribeOptions
+
+
+def test_standby_is_subscribed_and_takes_over_with_its_messages() -> None:
+    mqttools = pytest.importorskip("mqttools")
+    connector_type = get_connector("aiomqtt")
+    received = []
+
+    async def on_message(message) -> None:
+        received.append(message.payload)
+
+    async def main() -> None:
+        brokers = [mqttools.Broker(("127.0.0.1", port)) for port in (18885, 18886)]
+        tasks = [asyncio.create_task(broker.serve_forever()) for broker in brokers]
+        for broker in brokers:
+            await broker.getsockname()
+        connector = connector_type(
+            "127.0.0.1",
+            18885,
+            client_id="failover",
+            failover_brokers=[("127.0.0.1", 18886)],
+            standby=True,
+            reconnect_max_delay=0.1,
+        )
+        connector.add_message_callback(on_message)
+        sender = connector_type("127.0.0.1", 18886, client_id="failover-sender")
+        active_sender = connector_type("127.0.0.1", 18885, client_id="failover-active-sender")
+        try:
+            await connector.connect()
+            await sender.connect()
+            await active_sender.connect()
+            await connector.subscribe("a", SubscribeOptions())
+            for _ in range(50):
+                if connector._standby_connection is not None:
+                    break
+                await asyncio.sleep(0.02)
+            assert connector._standby_connection.subscribed
+            # The subscription reaches the standby after the active connection
+            await asyncio.sleep(0.1)
+
+            # Received by both connections, it is not dispatched again on takeover
+            await active_sender.publish("a", b"both")
+            await sender.publish("a", b"both")
+            # Only the standby is connected to the second broker
+            await sender.publish("a", b"missed")
+            await asyncio.sleep(0.1)
+            assert received == [b"both"]
+
+            await connector.reconnect()
+            await connector.connected_event.wait()
+            await asyncio.sleep(0.1)
+            assert connector.connection_stats.standby_takeovers == 1
+            assert connector.session_present
+            assert received == [b"both", b"missed"]
+
+            await sender.publish("a", b"after")
+            await asyncio.sleep(0.1)
+            assert received == [b"both", b"missed", b"after"]
+
+            # The next standby does not use the client_id, it would clear its session
+            for _ in range(50):
+                if connector._standby_connection is not None:
+                    break
+                await asyncio.sleep(0.02)
+            assert connector._standby_connection.identifier == "failover-standby-2"
+        finally:
+            await active_sender.disconnect()
+            await sender.disconnect()
+            await connector.disconnect()
+            for task in tasks:
+                task.cancel()
+
+    asyncio.run(main())
+
+
+def test_shared_subscriptions_are_not_mirrored() -> None:
+    """The standby would take its share of the group's messages."""
+    connector = get_connector("aiomqtt")("127.0.0.1", 1883, standby=True)
+    subscribed = []
+
+    class Client:
+        async def subscribe(self, topics, properties=None) -> None:
+            subscribed.extend(topic for topic, _ in topics)
+
+    async def main() -> None:
+        connector._standby_connection = _Connection(Client(), ("127.0.0.1", 1883), "standby")
+        connector._track_subscribe(
+            [
+                ("$share/group/a", paho.mqtt.client.SubscribeOptions()),
+                ("b", paho.mqtt.client.SubscribeOptions()),
+            ],
+            None,
+        )
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert list(connector._subscriptions) == ["$share/group/a", "b"]
+    assert subscribed == ["b"]
+    assert connector._standby_connection.topics == {"b"}
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from fastmqtt import FastMQTT
+from fastmqtt.flow_control import FlowController
+from fastmqtt.properties import ConnackProperties
+from tests.fakes import FakeConnector
+
+
+async def _acknowledge(controller: FlowController, latency, count: int) -> None:
+    """Keep the window full and acknowledge ``count`` publishes, ``latency(in_flight)`` each."""
+    for _ in range(count):
+        while controller.stats().in_flight < controller.window:
+            await controller.acquire()
+        controller.release(latency(controller.stats().in_flight))
+
+
+def test_distant_broker_keeps_the_window() -> None:
+    async def main() -> None:
+        controller = FlowController(initial_window=16)
+        controller.configure(100)
+        # A constant 300ms round trip is the broker's distance, not congestion
+        await _acknowledge(controller, lambda in_flight: 0.3, 500)
+
+        stats = controller.stats()
+        assert stats.window > 16
+        assert stats.baseline_latency == 0.3
+        assert stats.target_latency == 0.6
+
+    asyncio.run(main())
+
+
+def test_queueing_shrinks_the_window() -> None:
+    async def main() -> None:
+        controller = FlowController(initial_window=16)
+        controller.configure(100)
+        # The broker keeps up with 20 publishes in flight, latency grows with the queue above
+        await _acknowledge(
+            controller, lambda in_flight: 0.05 + max(0, in_flight - 20) * 0.01, 2000
+        )
+
+        assert 10 <= controller.window <= 40
+
+    asyncio.run(main())
+
+
+def test_fixed_target_latency() -> None:
+    async def main() -> None:
+        controller = FlowController(initial_window=16, target_latency=0.1)
+        controller.configure(100)
+        await _acknowledge(controller, lambda in_flight: 0.3, 100)
+
+        assert controller.window == 1
+
+    asyncio.run(main())
+
+
+def test_window_limited_by_receive_maximum() -> None:
+    async def main() -> None:
+        controller = FlowController(initial_window=16)
+        controller.configure(4)
+        await _acknowledge(controller, lambda in_flight: 0.01, 100)
+
+        assert controller.window == 4
+
+    asyncio.run(main())
+
+
+def test_publishes_to_a_slow_broker_are_not_serialized() -> None:
+    async def main() -> None:
+        app = FastMQTT("localhost", connector_type=FakeConnector)
+        app.connector.latency = 0.2
+        app.connector.connack_properties = ConnackProperties(receive_maximum=100)
+        await app.connect()
+
+        start = time.monotonic()
+        await asyncio.gather(*[app.publish("t", b"x", qos=1) for _ in range(64)])
+
+        # At least 16 in flight, one at a time would take 12.8s
+        assert time.monotonic() - start < 2
+        assert len(app.connector.published) == 64
+
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+import asyncio
+
+from fastmqtt import FastMQTT, HealthMonitor
+from tests.fakes import FakeConnector, make_message
+
+
+def test_probe_is_measured_by_its_subscription() -> None:
+    monitor = HealthMonitor(interval=10)
+    app = FastMQTT("localhost", connector_type=FakeConnector, health_monitor=monitor)
+
+    async def main() -> None:
+        await app.connect()
+        await asyncio.sleep(0.01)
+        [(topic, probe, qos, _)] = app.connector.published
+        assert topic == monitor.topic
+        subscription = app._subscription_manager.get_subscription_by_topic(topic)
+        # Sent back by the broker
+        await app.dispatch(
+            make_message(topic, probe, subscription_identifier=[subscription.id]), wait=True
+        )
+        await app.disconnect()
+
+    asyncio.run(main())
+    health = monitor.health()
+    assert health.last_round_trip is not None
+    assert (health.probes_sent, health.probes_lost) == (1, 0)
+    # Only the message handler, no callback of its own for every message
+    assert len(app.connector._message_callbacks) == 1
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import pytest
+
+from fastmqtt import FastMQTT
+from fastmqtt.connectors import get_connector
+from fastmqtt.connectors.aiomqtt.connector import AiomqttConnector
+from fastmqtt.encoders import JsonDecoder, JsonEncoder, MsgPackEncoder, get_encoder
+
+OPTIONAL = ["aiomqtt", "paho", "tenacity", "cbor2", "msgpack", "orjson", "ormsgpack"]
+
+
+def test_import_does_not_load_the_backends() -> None:
+    # A fresh interpreter, the test session has imported them already
+    code = (
+        "import sys, fastmqtt\n"
+        f"print(sorted({{m.split('.')[0] for m in sys.modules}} & set({OPTIONAL!r})))"
+    )
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "[]"
+
+
+def test_lookup_by_name() -> None:
+    assert get_connector("aiomqtt") is AiomqttConnector
+    with pytest.raises(ValueError):
+        get_connector("unknown")
+    with pytest.raises(ValueError):
+        get_encoder("unknown")
+
+    app = FastMQTT("localhost", payload_encoder="json", payload_decoder="json")
+    assert isinstance(app.connector, AiomqttConnector)
+    assert isinstance(app.payload_encoder, JsonEncoder)
+    assert isinstance(app._payload_decoder, JsonDecoder)
+
+
+def test_missing_codec(monkeypatch) -> None:
+    # A None entry makes the import fail as if the package was not installed
+    monkeypatch.setitem(sys.modules, "msgpack", None)
+    with pytest.raises(ImportError, match=r"fastmqtt\[msgpack\]"):
+        MsgPackEncoder()
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+
+import pytest
+
+from fastmqtt import FastMQTT
+from fastmqtt.scheduler import PriorityScheduler
+from fastmqtt.tracing import Span, SpanKind, Tracer
+from tests.fakes import FakeConnector, make_message
+
+
+async def _dispatch(app: FastMQTT, topic: str) -> None:
+    [subscription] = app.subscribe_offline()
+    await app.dispatch(make_message(topic, subscription_identifier=[subscription.id]), wait=True)
+
+
+def test_timeout_error_of_the_callback_is_an_error(caplog: pytest.LogCaptureFixture) -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector, tracer=Tracer())
+
+    @app.on_message("a")
+    async def handler(message) -> None:
+        raise TimeoutError("from the callback")
+
+    asyncio.run(_dispatch(app, "a"))
+
+    assert "Error in callback" in caplog.text
+    assert "timed out" not in caplog.text
+
+
+def test_callback_timeout(caplog: pytest.LogCaptureFixture) -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+
+    @app.on_message("a", timeout=0.01)
+    async def handler(message) -> None:
+        await asyncio.sleep(1)
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(_dispatch(app, "a"))
+
+    assert "timed out after 0.01s" in caplog.text
+    assert "Error in callback" not in caplog.text
+
+
+class _RecordingTracer(Tracer):
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def on_span_end(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+@pytest.mark.parametrize("scheduler", [None, PriorityScheduler()])
+def test_receive_span_covers_the_callbacks(scheduler: PriorityScheduler | None) -> None:
+    tracer = _RecordingTracer()
+    app = FastMQTT("localhost", connector_type=FakeConnector, tracer=tracer, scheduler=scheduler)
+
+    @app.on_message("a")
+    async def handler(message) -> None:
+        await asyncio.sleep(0.01)
+
+    asyncio.run(_dispatch(app, "a"))
+
+    callback, receive = tracer.spans
+    assert receive.kind is SpanKind.CONSUMER
+    assert callback.parent == receive.context
+    assert receive.end >= callback.end
+
+
+def test_manual_ack_after_every_callback() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector, manual_ack=True)
+    acked_when_done = []
+
+    @app.on_message("a")
+    async def fast(message) -> None:
+        acked_when_done.append(list(app.connector.acked))
+
+    @app.on_message("a")
+    async def failing(message) -> None:
+        await asyncio.sleep(0.01)
+        acked_when_done.append(list(app.connector.acked))
+        raise ValueError("fails")
+
+    async def main() -> None:
+        [subscription] = app.subscribe_offline()
+        connector = app.connector
+        connector.deliver("a", subscription_identifier=[subscription.id], qos=1, mid=7)
+        connector.deliver("a", subscription_identifier=[subscription.id], qos=0, mid=8)
+        # Matches no subscription, acknowledged so it does not hold the receive quota
+        connector.deliver("b", subscription_identifier=[99], qos=1, mid=9)
+        await asyncio.gather(*connector.supervisor._tasks)
+        assert sorted(connector.acked) == [7, 9]
+
+    asyncio.run(main())
+    # Neither callback saw the message acknowledged, though one of them failed
+    assert len(acked_when_done) == 4
+    assert all(7 not in acked for acked in acked_when_done)
+
+
+def test_manual_ack_from_the_callback() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector, manual_ack=True)
+    acked = []
+
+    @app.on_message("a")
+    async def handler(message) -> None:
+        message.ack()
+        message.ack()
+        acked.append(list(app.connector.acked))
+        await asyncio.sleep(0.01)
+
+    async def main() -> None:
+        [subscription] = app.subscribe_offline()
+        connector = app.connector
+        connector.deliver("a", subscription_identifier=[subscription.id], qos=1, mid=7)
+        await asyncio.gather(*connector.supervisor._tasks)
+        # Sent once, not again when the callback returns
+        assert connector.acked == [7]
+
+    asyncio.run(main())
+    assert acked == [[7]]
@@ -0,0 +1,98 @@
+import asyncio
+
+from fastmqtt import FastMQTT, MQTTRouter
+from tests.fakes import FakeConnector, make_message
+
+
+def _recording(calls: list[str], name: str, drop: bool = False):
+    async def middleware(message, call_next):
+        calls.append(f"{name} before")
+        if drop:
+            return None
+        result = await call_next(message)
+        calls.append(f"{name} after")
+        return result
+
+    return middleware
+
+
+def test_router_middleware_order() -> None:
+    calls: list[str] = []
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    router = MQTTRouter()
+    child = MQTTRouter()
+
+    @child.on_message("a")
+    async def handler(message) -> None:
+        calls.append("handler")
+
+    @app.on_message("b")
+    async def other(message) -> None:
+        calls.append("other")
+
+    child.add_middleware(_recording(calls, "child"))
+    router.add_middleware(_recording(calls, "router"))
+    router.include_router(child)
+    app.add_middleware(_recording(calls, "app"))
+    app.include_router(router)
+
+    async def main() -> None:
+        app.subscribe_offline()
+        for topic in ["a", "b"]:
+            [subscription] = app.match_subscriptions(topic)
+            message = make_message(topic, subscription_identifier=[subscription.id])
+            await app.dispatch(message, wait=True)
+
+    asyncio.run(main())
+    assert calls == [
+        "app before",
+        "router before",
+        "child before",
+        "handler",
+        "child after",
+        "router after",
+        "app after",
+        # Only the application middleware wraps its own callbacks
+        "app before",
+        "other",
+        "app after",
+    ]
+
+
+def test_middleware_added_after_connect() -> None:
+    calls: list[str] = []
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+
+    @app.on_message("a")
+    async def handler(message) -> None:
+        calls.append("handler")
+
+    async def main() -> None:
+        await app.connect()
+        # Recompiled, the dropping middleware never calls the handler
+        app.add_middleware(_recording(calls, "drop", drop=True))
+        [subscription] = app.match_subscriptions("a")
+        await app.dispatch(make_message("a", subscription_identifier=[subscription.id]), wait=True)
+
+    asyncio.run(main())
+    assert calls == ["drop before"]
+
+
+def test_publish_middleware() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    calls: list[str] = []
+
+    async def prefix(message, call_next) -> None:
+        message.topic = f"site-1/{message.topic}"
+        await call_next(message)
+
+    app.add_publish_middleware(prefix)
+    app.add_publish_middleware(_recording(calls, "inner"))
+
+    async def main() -> None:
+        await app.connect()
+        await app.publish("a", b"1", qos=1)
+
+    asyncio.run(main())
+    assert app.connector.published == [("site-1/a", b"1", 1, None)]
+    assert calls == ["inner before", "inner after"]
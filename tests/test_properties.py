@@ -0,0 +1,82 @@
+import asyncio
+from dataclasses import asdict
+
+import paho.mqtt.properties
+import pytest
+
+from fastmqtt import FastMQTT
+from fastmqtt.connectors.aiomqtt.convertors.properties import (
+    FASTMQTT_TO_PAHO_NAME_MAPPING,
+    FASTMQTT_TYPE_TO_PAHO_PACKET_TYPE_MAPPING,
+    fastmqtt_to_paho_properties,
+    paho_to_fastmqtt_properties,
+)
+from fastmqtt.properties import (
+    BaseProperties,
+    ConnectProperties,
+    PublishProperties,
+    SubscribeProperties,
+)
+from tests.fakes import FakeConnector
+
+PROPERTIES = [
+    PublishProperties(),
+    PublishProperties(
+        payload_format_indicator=1,
+        message_expiry_interval=60,
+        content_type="application/json",
+        response_topic="reply/1",
+        correlation_data=b"\x00id",
+        user_property=[("a", "1"), ("b", "2"), ("a", "3")],
+    ),
+    ConnectProperties(
+        session_expiry_interval=3600, receive_maximum=10, user_property=[("k", "v")]
+    ),
+    SubscribeProperties(subscription_identifier=268435455),
+]
+
+
+def _convert_with_asdict(properties: BaseProperties) -> paho.mqtt.properties.Properties:
+    # The conversion before the precomputed field lists
+    packet_type = FASTMQTT_TYPE_TO_PAHO_PACKET_TYPE_MAPPING[type(properties)]
+    paho_properties = paho.mqtt.properties.Properties(packet_type)
+    for attr, value in asdict(properties).items():
+        if value is not None:
+            setattr(paho_properties, FASTMQTT_TO_PAHO_NAME_MAPPING[attr], value)
+    return paho_properties
+
+
+@pytest.mark.parametrize("properties", PROPERTIES)
+def test_conversion_packs_like_asdict(properties: BaseProperties) -> None:
+    expected = _convert_with_asdict(properties).pack()
+    assert fastmqtt_to_paho_properties(properties).pack() == expected
+    # The copied empty instance is not changed by a conversion
+    assert fastmqtt_to_paho_properties(properties).pack() == expected
+
+
+@pytest.mark.parametrize("properties", PROPERTIES[:3])
+def test_round_trip(properties: BaseProperties) -> None:
+    assert paho_to_fastmqtt_properties(fastmqtt_to_paho_properties(properties)) == properties
+
+
+def test_prepared_publisher() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector, payload_encoder="json")
+    properties = PublishProperties(content_type="application/json")
+    prepared = app.prepare("a", qos=1, properties=properties)
+
+    async def add_prefix(message, call_next) -> None:
+        message.topic = f"site-1/{message.topic}"
+        await call_next(message)
+
+    async def main() -> None:
+        await app.connect()
+        await prepared.publish({"value": 1})
+        # Publish middlewares change each message, it goes through publish() then
+        app.add_publish_middleware(add_prefix)
+        await prepared.publish({"value": 2})
+
+    asyncio.run(main())
+    assert app.connector.published == [
+        ("a", b'{"value": 1}', 1, properties),
+        ("site-1/a", b'{"value": 2}', 1, properties),
+    ]
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from fastmqtt import FastMQTT
+from tests.fakes import FakeConnector
+
+
+@pytest.mark.parametrize("session_present", [True, False])
+def test_resubscribe_only_when_the_session_was_lost(session_present: bool) -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+
+    @app.on_message("a")
+    async def callback(message) -> None:
+        pass
+
+    async def main() -> None:
+        await app.connect()
+        [subscription] = app.match_subscriptions("a")
+        connector = app.connector
+        assert connector.subscribed == ["a"]
+
+        await connector.disconnect()
+        connector.session_present = session_present
+        await connector.connect()
+        assert connector.subscribed == (["a"] if session_present else ["a", "a"])
+        # Sent again with the same identifier, the callbacks are still found
+        assert app.match_subscriptions("a") == [subscription]
+
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+import asyncio
+
+from fastmqtt import FastMQTT, Recorder, Replayer
+from fastmqtt.recording import read_recording
+from tests.fakes import FakeConnector, make_message
+
+
+def _record(directory, messages, **kwargs) -> Recorder:
+    recorder = Recorder(directory, flush_interval=0.01, **kwargs)
+
+    async def main() -> None:
+        for message in messages:
+            recorder.record(message)
+        # Buffered until the flush
+        assert list(directory.iterdir()) == []
+        await recorder.close()
+
+    asyncio.run(main())
+    return recorder
+
+
+def test_round_trip(tmp_path) -> None:
+    message = make_message(
+        "a/b", b"payload", qos=1, correlation_data=b"id", user_property=[("key", "value")]
+    )
+    recorder = _record(tmp_path, [message])
+    assert recorder.recorded == 1
+
+    [(timestamp, recorded)] = read_recording(tmp_path)
+    assert timestamp > 0
+    assert (recorded.topic, recorded.payload, recorded.qos) == ("a/b", b"payload", 1)
+    assert recorded.properties == message.properties
+
+
+def test_segments_rotate(tmp_path) -> None:
+    messages = [make_message(f"t/{index}", b"x" * 1000) for index in range(10)]
+    _record(tmp_path, messages, segment_size=4000)
+    assert len(list(tmp_path.iterdir())) > 1
+    assert [message.topic for _, message in read_recording(tmp_path)] == [
+        message.topic for message in messages
+    ]
+
+
+def test_truncated_record_is_skipped(tmp_path) -> None:
+    _record(tmp_path, [make_message("a", b"1"), make_message("b", b"2")])
+    [segment] = tmp_path.iterdir()
+    segment.write_bytes(segment.read_bytes()[:-1])
+    assert [message.topic for _, message in read_recording(tmp_path)] == ["a"]
+
+
+def test_replay(tmp_path) -> None:
+    _record(tmp_path, [make_message(f"t/{index}", b"") for index in range(5)])
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    received = []
+
+    @app.on_message("t/#")
+    async def callback(message) -> None:
+        received.append(message.topic)
+
+    async def main() -> int:
+        app.subscribe_offline()
+        return await Replayer(tmp_path).replay(app, speed=None)
+
+    assert asyncio.run(main()) == 5
+    assert received == [f"t/{index}" for index in range(5)]
@@ -0,0 +1,33 @@
+import asyncio
+
+from fastmqtt.response import ResponseCache
+from tests.fakes import make_message
+
+
+def test_waiting_request_is_sent_when_the_first_one_is_cancelled() -> None:
+    cache = ResponseCache()
+    sent = []
+
+    def request(name: str):
+        async def send():
+            sent.append(name)
+            await asyncio.sleep(0.01)
+            return make_message("response", name.encode())
+
+        return send
+
+    async def main() -> None:
+        first = asyncio.create_task(cache.get("key", request("first")))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get("key", request("second")))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        assert (await second).payload == b"second"
+        # Cached for the next one
+        assert (await cache.get("key", request("third"))).payload == b"second"
+
+    asyncio.run(main())
+    assert sent == ["first", "second"]
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.coalesced) == (1, 2, 1)
@@ -0,0 +1,67 @@
+import asyncio
+
+from fastmqtt import PriorityScheduler
+
+
+def _run(scheduler: PriorityScheduler, jobs: list[tuple[int, str]], delay: float = 0.0) -> list:
+    """Submits ``jobs`` while a first job holds the only slot, returns the order they ran in."""
+    order = []
+
+    async def main() -> None:
+        release = asyncio.Event()
+        blocker = scheduler.submit(100, release.wait)
+        futures = []
+        for priority, name in jobs:
+
+            async def job(name: str = name) -> None:
+                order.append(name)
+
+            futures.append(scheduler.submit(priority, job))
+            await asyncio.sleep(delay)
+        release.set()
+        await asyncio.gather(blocker, *futures)
+
+    asyncio.run(main())
+    return order
+
+
+def test_higher_priority_first() -> None:
+    scheduler = PriorityScheduler(concurrency=1)
+    jobs = [(0, "low 1"), (0, "low 2"), (5, "high 1"), (1, "mid"), (5, "high 2")]
+    assert _run(scheduler, jobs) == ["high 1", "high 2", "mid", "low 1", "low 2"]
+
+    stats = scheduler.stats()
+    assert list(stats) == [100, 5, 1, 0]
+    assert stats[0].completed == 2
+    assert stats[0].queued == stats[0].running == 0
+    assert stats[0].max_wait >= stats[5].max_wait
+
+
+def test_aging() -> None:
+    # Waiting 0.05s is worth 5 levels, the old job overtakes the new one of priority 2
+    scheduler = PriorityScheduler(concurrency=1, aging=0.01)
+    assert _run(scheduler, [(0, "old"), (2, "new")], delay=0.05) == ["old", "new"]
+
+
+def test_cancelled_job_is_skipped() -> None:
+    scheduler = PriorityScheduler(concurrency=1)
+    ran = []
+
+    async def main() -> None:
+        release = asyncio.Event()
+        blocker = scheduler.submit(0, release.wait)
+
+        async def job() -> None:
+            ran.append(True)
+
+        future = scheduler.submit(0, job)
+        assert scheduler.queued == 1
+        future.cancel()
+        release.set()
+        await blocker
+        await asyncio.sleep(0)
+        assert scheduler.queued == 0
+        assert scheduler.running == 0
+
+    asyncio.run(main())
+    assert ran == []
@@ -0,0 +1,79 @@
+import asyncio
+
+from fastmqtt import FastMQTT
+from fastmqtt.dependencies import Depends
+from fastmqtt.singleflight import SingleFlight
+from tests.fakes import FakeConnector, make_message
+
+
+def test_waiting_call_runs_when_the_leader_is_cancelled() -> None:
+    single_flight = SingleFlight(key=lambda message: "key")
+    calls = []
+
+    async def compute(message) -> str:
+        calls.append(message)
+        await asyncio.sleep(0.01)
+        return f"result {message}"
+
+    call = single_flight.wrap(compute)
+
+    async def main() -> None:
+        leader = asyncio.create_task(call(1))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(call(2))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        # Not the CancelledError of the leader
+        assert await follower == "result 2"
+
+    asyncio.run(main())
+    assert calls == [1, 2]
+    assert (single_flight.executions, single_flight.coalesced) == (2, 1)
+
+
+def test_error_is_shared_with_the_waiting_calls() -> None:
+    single_flight = SingleFlight(key=lambda message: "key")
+    calls = []
+
+    async def compute(message) -> None:
+        calls.append(message)
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    call = single_flight.wrap(compute)
+
+    async def main() -> list:
+        return await asyncio.gather(call(1), call(2), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert calls == [1]
+
+
+def test_dependency_is_resolved_again_when_its_first_callback_times_out() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    calls = []
+    results = []
+
+    async def slow_dependency() -> str:
+        calls.append(len(calls))
+        await asyncio.sleep(0.05)
+        return "value"
+
+    @app.on_message("a", timeout=0.01)
+    async def impatient(value: str = Depends(slow_dependency)) -> None:
+        results.append(("impatient", value))
+
+    @app.on_message("a")
+    async def patient(value: str = Depends(slow_dependency)) -> None:
+        results.append(("patient", value))
+
+    async def main() -> None:
+        [subscription] = app.subscribe_offline()
+        message = make_message("a", subscription_identifier=[subscription.id])
+        await app.dispatch(message, wait=True)
+
+    asyncio.run(main())
+    assert results == [("patient", "value")]
+    assert calls == [0, 1]
@@ -0,0 +1,171 @@
+import asyncio
+
+import pytest
+
+from fastmqtt.exceptions import FastMQTTError
+from fastmqtt.router import MQTTRouter
+from fastmqtt.subscription_manager import IdManager, SubscriptionManager
+from fastmqtt.types import SubscribeOptions, Subscription
+from tests.fakes import FakeConnector
+
+
+async def first(message) -> None:
+    pass
+
+
+async def second(message) -> None:
+    pass
+
+
+def _subscription(topic: str, *callbacks) -> Subscription:
+    return Subscription(callbacks=list(callbacks), topic=topic, options=SubscribeOptions())
+
+
+def test_id_manager_reuses_the_lowest_released_id() -> None:
+    ids = IdManager()
+    assert [ids.get_id() for _ in range(5)] == [1, 2, 3, 4, 5]
+
+    ids.put_back(4)
+    ids.put_back(2)
+    assert ids.get_used_count() == 3
+    assert ids.get_id() == 2
+    assert ids.get_id() == 4
+    assert ids.get_id() == 6
+
+    with pytest.raises(ValueError):
+        ids.put_back(7)
+    ids.put_back(3)
+    with pytest.raises(ValueError):
+        ids.put_back(3)
+
+
+def test_id_manager_shrinks_when_the_tail_is_released() -> None:
+    ids = IdManager(max_id=3)
+    for _ in range(3):
+        ids.get_id()
+    with pytest.raises(ValueError):
+        ids.get_id()
+
+    ids.put_back(2)
+    ids.put_back(3)
+    # 3 was the high-water mark, 2 below it is folded in as well
+    assert ids.current_id == 1
+    assert ids._released == []
+    assert ids.get_available_count() == 2
+    assert ids.get_id() == 2
+
+
+def test_index_by_topic_and_callback() -> None:
+    connector = FakeConnector(hostname="localhost", port=1883)
+    manager = SubscriptionManager(connector)
+
+    async def main() -> None:
+        a = await manager.subscribe(_subscription("a/+", first, second))
+        b = await manager.subscribe(_subscription("b", first))
+        assert connector.subscribed == ["a/+", "b"]
+        assert manager.get_subscription_by_topic("a/+") is a
+        assert manager.get_subscription(b.id) is b
+        assert manager.match("a/1") == [a]
+        assert {sub.id for sub in manager.get_callback_subscriptions(first)} == {a.id, b.id}
+
+        # Removes the callback everywhere, b is left without callbacks and unsubscribed
+        removed = await manager.unsubscribe(callback=first)
+        assert removed == [b]
+        assert connector.subscribed == ["a/+"]
+        assert a.callbacks == [second]
+        assert manager.get_callback_subscriptions(first) == []
+        assert manager.get_subscription(b.id) is None
+
+        # The released identifier is reused
+        c = await manager.subscribe(_subscription("c", second))
+        assert c.id == b.id
+
+    asyncio.run(main())
+
+
+def test_router_merges_subscriptions_by_topic() -> None:
+    router = MQTTRouter()
+    child = MQTTRouter()
+    router.register(first, "a", qos=0)
+    child.register(second, "a", qos=1)
+    child.register(second, "b")
+    router.include_router(child)
+
+    assert list(router._subscriptions) == ["a", "b"]
+    subscription = router._subscriptions["a"]
+    assert [callback.callback for callback in subscription.callbacks] == [first, second]
+    assert subscription.options.qos == 1
+    with pytest.raises(FastMQTTError):
+        child.register(first, "c")
+
+
+class _CountingConnector(FakeConnector):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.packets: list[tuple[str, list[str]]] = []
+
+    async def subscribe(self, topic, options=None, properties=None) -> None:
+        self.packets.append(("subscribe", [topic]))
+        await super().subscribe(topic, options, properties)
+
+    async def unsubscribe_multiple(self, topics, properties=None) -> None:
+        self.packets.append(("unsubscribe", list(topics)))
+        await super().unsubscribe_multiple(topics, properties)
+
+
+def test_batched_unsubscribes_share_a_packet() -> None:
+    connector = _CountingConnector(hostname="localhost", port=1883)
+    manager = SubscriptionManager(connector, batch_window=0.01)
+
+    async def main() -> None:
+        subscriptions = await asyncio.gather(
+            *[manager.subscribe(_subscription(topic, first)) for topic in "abc"]
+        )
+        # One packet per subscription, each carries its own identifier
+        assert connector.packets == [("subscribe", [topic]) for topic in "abc"]
+        assert len({subscription.id for subscription in subscriptions}) == 3
+
+        connector.packets.clear()
+        await asyncio.gather(*[manager.unsubscribe(topic=topic) for topic in "abc"])
+        assert connector.packets == [("unsubscribe", ["a", "b", "c"])]
+        assert connector.subscribed == []
+
+    asyncio.run(main())
+
+
+def test_subscribe_and_unsubscribe_cancel_out() -> None:
+    connector = _CountingConnector(hostname="localhost", port=1883)
+    manager = SubscriptionManager(connector, batch_window=0.01)
+
+    async def main() -> None:
+        subscribe = asyncio.ensure_future(manager.subscribe(_subscription("a", first)))
+        await asyncio.sleep(0)
+        await manager.unsubscribe(topic="a")
+        await subscribe
+        # Neither was sent, the identifier is free again
+        await asyncio.sleep(0.02)
+        assert connector.packets == []
+        assert manager._id_manager.get_used_count() == 0
+
+    asyncio.run(main())
+
+
+def test_resubscribe_within_the_window_keeps_the_identifier() -> None:
+    connector = _CountingConnector(hostname="localhost", port=1883)
+    manager = SubscriptionManager(connector, batch_window=0.01)
+
+    async def main() -> None:
+        subscription = await manager.subscribe(_subscription("a", first))
+        connector.packets.clear()
+
+        unsubscribe = asyncio.ensure_future(manager.unsubscribe(topic="a"))
+        await asyncio.sleep(0)
+        again = await manager.subscribe(_subscription("a", second))
+        await unsubscribe
+        await asyncio.sleep(0.02)
+        # The broker kept the subscription all along
+        assert connector.packets == []
+        assert again.id == subscription.id
+        assert manager.get_subscription_by_topic("a") is again
+
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+import asyncio
+
+from fastmqtt import FastMQTT, PriorityScheduler
+from tests.fakes import FakeConnector
+
+
+def test_drain_waits_and_cancels() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+
+    async def main() -> None:
+        supervisor = app.supervisor
+        supervisor.spawn(asyncio.sleep(0.01))
+        slow = supervisor.spawn(asyncio.sleep(10))
+        report = await supervisor.drain(0.1)
+        assert report.completed == 1
+        assert report.cancelled == 1
+        assert slow.cancelled()
+        assert len(supervisor) == 0
+
+    asyncio.run(main())
+
+
+def _drain_from_callback(app: FastMQTT) -> None:
+    """A callback draining the supervisor must not wait for itself nor for the dispatch task
+    waiting on it."""
+    reports = []
+
+    @app.on_message("a")
+    async def callback(message) -> None:
+        reports.append(await app.supervisor.drain(5))
+
+    async def main() -> None:
+        [subscription] = app.subscribe_offline()
+        app.connector.deliver("a", subscription_identifier=[subscription.id], qos=1)
+        await asyncio.wait_for(asyncio.gather(*app.supervisor._tasks), 1)
+
+    asyncio.run(main())
+    [report] = reports
+    assert report.cancelled == 0
+    assert report.elapsed < 1
+
+
+def test_drain_from_callback() -> None:
+    _drain_from_callback(FastMQTT("localhost", connector_type=FakeConnector, manual_ack=True))
+
+
+def test_drain_from_scheduled_callback() -> None:
+    _drain_from_callback(
+        FastMQTT("localhost", connector_type=FakeConnector, scheduler=PriorityScheduler())
+    )
+
+
+def test_drain_waits_for_acknowledgement() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    app.connector.latency = 0.05
+
+    async def main() -> None:
+        await app.connect()
+        publish = asyncio.create_task(app.publish("a", b"1", qos=1))
+        await asyncio.sleep(0)
+        # Tracked without a task of its own
+        assert len(app.supervisor) == 1
+        assert len(asyncio.all_tasks()) == 2
+
+        report = await app.supervisor.drain(1)
+        assert report.completed == 1
+        assert publish.done()
+        assert app.connector.published == [("a", b"1", 1, None)]
+
+    asyncio.run(main())
+
+
+def test_drain_does_not_cancel_the_publishing_task() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    app.connector.latency = 10
+
+    async def main() -> None:
+        await app.connect()
+        publish = asyncio.create_task(app.publish("a", b"1", qos=1))
+        await asyncio.sleep(0)
+        report = await app.supervisor.drain(0.05)
+        # The task belongs to the application, it is reported but not cancelled
+        assert report.cancelled == 0
+        assert report.unfinished == ["publish to a"]
+        assert not publish.done()
+        publish.cancel()
+
+    asyncio.run(main())
+
+
+def test_drain_cancels_a_publishing_callback() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    app.connector.latency = 10
+
+    @app.on_message("a")
+    async def callback(message) -> None:
+        await app.publish("b", b"1", qos=1)
+
+    async def main() -> None:
+        [subscription] = app.subscribe_offline()
+        app.connector.deliver("a", subscription_identifier=[subscription.id])
+        await asyncio.sleep(0.01)
+        report = await app.supervisor.drain(0.05)
+        # The callback task is cancelled, which ends its publish
+        assert report.cancelled == 1
+        assert "publish to b" in report.unfinished
+        assert len(app.supervisor) == 0
+
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+import asyncio
+import queue
+
+import pytest
+
+from fastmqtt import FastMQTT, FastMQTTError, ThreadSafePublisher
+from tests.fakes import FakeConnector
+
+
+def test_publish_from_threads() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    publisher = ThreadSafePublisher(app, maxsize=10, batch_size=4)
+
+    def produce(thread: int) -> None:
+        for index in range(100):
+            publisher.publish(f"t/{thread}", str(index).encode(), qos=1)
+
+    async def main() -> None:
+        await app.connect()
+        async with publisher:
+            await asyncio.gather(*[asyncio.to_thread(produce, thread) for thread in range(4)])
+        with pytest.raises(FastMQTTError):
+            publisher.publish("t/0")
+
+    asyncio.run(main())
+    assert publisher.published == 400
+    assert publisher.failed == 0
+    assert publisher.queued == 0
+    for thread in range(4):
+        # The order of each producer is kept
+        payloads = [
+            payload for topic, payload, _, _ in app.connector.published if topic == f"t/{thread}"
+        ]
+        assert payloads == [str(index).encode() for index in range(100)]
+
+
+def test_queue_full() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    publisher = ThreadSafePublisher(app, maxsize=2)
+    with pytest.raises(FastMQTTError):
+        publisher.publish("a")
+
+    async def main() -> None:
+        await app.connect()
+        async with publisher:
+            # The loop cannot drain the queue before the next await
+            publisher.publish("a", block=False)
+            publisher.publish("a", block=False)
+            with pytest.raises(queue.Full):
+                publisher.publish("a", block=False)
+            await asyncio.sleep(0.01)
+            publisher.publish("a", block=False)
+
+    asyncio.run(main())
+    assert publisher.published == 3
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from fastmqtt import Depends, FastMQTT, FastMQTTError
+from fastmqtt.topic import parse_template
+from tests.fakes import FakeConnector, make_message
+
+
+def test_template_filter_and_extraction() -> None:
+    template = parse_template("sensors/{device_id}/{kind:+}/{rest:#}")
+    assert template is not None
+    assert template.filter == "sensors/+/+/#"
+    assert template.extract("sensors/7/temp/a/b") == {
+        "device_id": "7",
+        "kind": "temp",
+        "rest": "a/b",
+    }
+    # "#" also matches the parent level
+    assert template.extract("sensors/7/temp")["rest"] == ""
+
+    shared = parse_template("$share/group/sensors/{device_id}")
+    assert shared is not None
+    assert shared.filter == "$share/group/sensors/+"
+    assert shared.extract("sensors/7") == {"device_id": "7"}
+
+    # Braces inside a level are not a parameter
+    assert parse_template("sensors/+/temperature") is None
+    assert parse_template("sensors/{a}b") is None
+
+
+@pytest.mark.parametrize("topic", ["a/{x}/{x}", "a/{x:#}/b"])
+def test_invalid_template(topic: str) -> None:
+    with pytest.raises(FastMQTTError):
+        parse_template(topic)
+
+
+def test_extraction_is_cached() -> None:
+    template = parse_template("sensors/{device_id}")
+    assert template is not None
+    assert template.extract("sensors/1") is template.extract("sensors/1")
+
+
+def test_handler_parameters() -> None:
+    app = FastMQTT("localhost", connector_type=FakeConnector)
+    received = []
+
+    def site(site: str) -> str:
+        return site.upper()
+
+    @app.on_message("{site}/sensors/{device_id}/temperature")
+    async def handler(device_id: int, name: str = Depends(site)) -> None:
+        received.append((device_id, name))
+
+    async def main() -> None:
+        await app.connect()
+        assert app.connector.subscribed == ["+/sensors/+/temperature"]
+        [subscription] = app.match_subscriptions("plant/sensors/1/temperature")
+        for device_id in ["1", "42", "42"]:
+            topic = f"plant/sensors/{device_id}/temperature"
+            message = make_message(topic, subscription_identifier=[subscription.id])
+            await app.dispatch(message, wait=True)
+
+        # Unsubscribed by the template as well
+        await app.unsubscribe(topic="{site}/sensors/{device_id}/temperature")
+        assert app.connector.subscribed == []
+
+    asyncio.run(main())
+    assert received == [(1, "PLANT"), (42, "PLANT"), (42, "PLANT")]